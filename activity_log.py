@@ -0,0 +1,329 @@
+"""
+Structured JSONL activity log for the travel engagement bot.
+Each reply is one JSON record, so comment text can't break the format. The
+log is split into segments that rotate by size or age, a small sidecar index
+lists the segments with their offsets, and the newest records are read by
+seeking backward from the end instead of reading whole files.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from datetime import datetime
+
+from advanced_config import ACTIVITY_LOG, TRACKING_SETTINGS
+from reply_store import ReplyStore, is_valid_comment_id, parse_history_line
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'activity-'
+SEGMENT_SUFFIX = '.jsonl'
+INDEX_FILE = 'index.json'
+
+# Records are written with the ID first, so it can be sliced out without decoding the whole line
+ID_PREFIX = b'{"id":"'
+
+
+def format_record(record):
+    """
+    One JSONL line for `record` (which must contain 'id'), with the ID as the first key.
+    """
+    record = dict(record)
+    ordered = {'id': record.pop('id')}
+    ordered.update(record)
+    return json.dumps(ordered, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def read_record_id(raw):
+    """
+    Comment ID of a JSONL record line (bytes), reading only the leading "id" field when possible.
+    Returns None for blank or malformed lines.
+    """
+    if raw.startswith(ID_PREFIX):
+        end = raw.find(b'"', len(ID_PREFIX))
+        comment_id = raw[len(ID_PREFIX):end].decode('ascii', errors='replace') if end > 0 else ''
+        if is_valid_comment_id(comment_id):
+            return comment_id
+    # Not written by format_record (e.g. edited by hand): fall back to a full parse
+    try:
+        comment_id = str(json.loads(raw).get('id', ''))
+    except (ValueError, AttributeError):
+        return None
+    return comment_id if is_valid_comment_id(comment_id) else None
+
+
+def format_entry(record):
+    """
+    One-line, human-readable rendering of a record.
+    """
+    return (f"{record.get('ts', '')}  {record.get('id', '')}  r/{record.get('subreddit', '')}  "
+            f"{record.get('excerpt', '')!r}")
+
+
+def tail_lines(file_path, count, block_size=8192):
+    """
+    Last `count` non-empty lines of a file (oldest first), read backward from the end in blocks.
+    """
+    if count <= 0 or not os.path.isfile(file_path):
+        return []
+    lines = []
+    with open(file_path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b''
+        while position > 0 and len(lines) < count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step) + remainder
+            parts = chunk.split(b'\n')
+            # The first part may be cut off mid-line; keep it for the next block
+            remainder = parts.pop(0)
+            lines.extend(part for part in reversed(parts) if part.strip())
+        if position == 0 and remainder.strip() and len(lines) < count:
+            lines.append(remainder)
+    return [line.decode('utf-8', errors='replace') for line in reversed(lines[:count])]
+
+
+class ActivityLog:
+    """
+    Append-only JSONL log split into rotating segments.
+
+    The sidecar index (index.json) lists the segments in order with the byte
+    offset each one starts at in the whole log, their creation time and, for
+    closed segments, their size and record count.
+    """
+
+    def __init__(self, directory=None, max_segment_bytes=None, max_segment_age=None):
+        self.directory = directory or ACTIVITY_LOG['DIRECTORY']
+        self.max_segment_bytes = max_segment_bytes or ACTIVITY_LOG['MAX_SEGMENT_BYTES']
+        self.max_segment_age = max_segment_age or ACTIVITY_LOG['MAX_SEGMENT_AGE']
+        self.index_path = os.path.join(self.directory, INDEX_FILE)
+        self.segments = self._load_index()
+        self._handle = None
+
+    # Index
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                segments = json.load(f)['segments']
+        except FileNotFoundError:
+            segments = []
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Activity log index {self.index_path} is unreadable ({e}); rebuilding it.")
+            segments = []
+        # Segment files the index doesn't know about (e.g. a lost index) are picked up again
+        if os.path.isdir(self.directory):
+            known = {segment['file'] for segment in segments}
+            found = sorted(name for name in os.listdir(self.directory)
+                           if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+            if any(name not in known for name in found):
+                segments = self._rebuild_index(found)
+        return segments
+
+    def _rebuild_index(self, file_names):
+        segments, offset = [], 0
+        for name in file_names:
+            path = os.path.join(self.directory, name)
+            size = os.path.getsize(path)
+            segments.append({'file': name, 'start_offset': offset, 'created_at': os.path.getmtime(path),
+                             'bytes': size, 'records': None})
+            offset += size
+        if segments:
+            # The newest segment stays open for appends
+            segments[-1]['bytes'] = segments[-1]['records'] = None
+        self.segments = segments
+        self._save_index()
+        return segments
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'segments': self.segments}, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def segment_paths(self):
+        return [os.path.join(self.directory, segment['file']) for segment in self.segments]
+
+    # Writing
+
+    def _active_path(self):
+        return os.path.join(self.directory, self.segments[-1]['file'])
+
+    def _needs_rotation(self):
+        if not self.segments:
+            return True
+        active = self.segments[-1]
+        try:
+            size = os.path.getsize(self._active_path())
+        except FileNotFoundError:
+            size = 0
+        return size >= self.max_segment_bytes or (
+            size > 0 and time.time() - active['created_at'] >= self.max_segment_age)
+
+    def _rotate(self):
+        """
+        Close the active segment (recording its final size) and start a new one.
+        """
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        offset = 0
+        if self.segments:
+            active = self.segments[-1]
+            path = self._active_path()
+            active['bytes'] = active['records'] = 0
+            if os.path.exists(path):
+                active['bytes'] = os.path.getsize(path)
+                with open(path, 'rb') as f:
+                    active['records'] = sum(1 for line in f if line.strip())
+            offset = active['start_offset'] + active['bytes']
+        number = len(self.segments) + 1
+        self.segments.append({'file': f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}", 'start_offset': offset,
+                              'created_at': time.time(), 'bytes': None, 'records': None})
+        self._save_index()
+
+    def write(self, lines, sync=False):
+        """
+        Append already formatted lines to the active segment, rotating it whenever it is full or too old.
+        A large batch (e.g. an imported history) is spread over as many segments as it needs.
+        """
+        start = 0
+        while start < len(lines):
+            if self._needs_rotation():
+                self._rotate()
+            if self._handle is None:
+                self._handle = open(self._active_path(), 'a', encoding='utf-8')
+            # Fill the active segment up to its size limit; the rest goes to the next one
+            room = self.max_segment_bytes - os.path.getsize(self._active_path())
+            end = start + 1
+            room -= len(lines[start].encode('utf-8'))
+            while end < len(lines) and room > 0:
+                room -= len(lines[end].encode('utf-8'))
+                end += 1
+            self._handle.writelines(lines[start:end])
+            self._handle.flush()
+            if sync:
+                os.fsync(self._handle.fileno())
+            start = end
+
+    def append(self, record, sync=False):
+        self.write([format_record(record)], sync)
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    # Reading
+
+    def iter_ids(self):
+        """
+        Stream the comment ID of every record, oldest first, without decoding the records.
+        """
+        for path in self.segment_paths():
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as f:
+                for raw in f:
+                    comment_id = read_record_id(raw)
+                    if comment_id:
+                        yield comment_id
+
+    def tail(self, count=10):
+        """
+        The newest `count` records (oldest first), reading only the end of the newest segments.
+        """
+        lines = []
+        for path in reversed(self.segment_paths()):
+            lines[:0] = tail_lines(path, count - len(lines))
+            if len(lines) >= count:
+                break
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def stats(self):
+        sizes = [os.path.getsize(path) for path in self.segment_paths() if os.path.isfile(path)]
+        return {'segments': len(self.segments), 'bytes': sum(sizes)}
+
+
+class ActivityLogStore(ReplyStore):
+    """
+    ReplyStore whose history is the JSONL activity log instead of the `|`-separated text file.
+    The text file is imported into the log the first time the log is created.
+    """
+
+    def __init__(self, directory=None, legacy_file=None, **kwargs):
+        self.log = ActivityLog(directory)
+        self.legacy_file = legacy_file or TRACKING_SETTINGS['HISTORY_FILE']
+        super().__init__(file_path=self.log.directory, **kwargs)
+
+    def _load(self):
+        if not self.log.segments and os.path.isfile(self.legacy_file):
+            imported = import_history_file(self.log, self.legacy_file)
+            if imported:
+                logger.info(f"Imported {imported} replied comments from {self.legacy_file} into the activity log")
+        for comment_id in self.log.iter_ids():
+            self._remember(comment_id)
+
+    def _format(self, comment_id, subreddit_name, comment_body, post_id):
+        return format_record({
+            'id': comment_id,
+            'ts': datetime.now().isoformat(),
+            'event': 'reply',
+            'subreddit': subreddit_name,
+            'post_id': post_id,
+            'excerpt': (comment_body or '')[:50],
+        })
+
+    def _write(self, lines, sync):
+        self.log.write(lines, sync)
+
+    def stats(self):
+        return dict(super().stats(), backend='jsonl', log=self.log.stats())
+
+    def close(self):
+        super().close()
+        self.log.close()
+
+
+def import_history_file(log, file_path):
+    """
+    Copy the entries of a `timestamp|id|subreddit|excerpt` history file into an activity log.
+    """
+    records = []
+    seen = set()
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            comment_id = parse_history_line(line)
+            if comment_id is None or comment_id in seen:
+                continue
+            seen.add(comment_id)
+            parts = line.rstrip('\n').split('|', 3)
+            records.append(format_record({
+                'id': comment_id,
+                'ts': parts[0],
+                'event': 'reply',
+                'subreddit': parts[2] if len(parts) > 2 else '',
+                'post_id': None,
+                'excerpt': parts[3].removesuffix('...') if len(parts) > 3 else '',
+            }))
+    log.write(records, sync=True)
+    return len(records)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'tail':
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        for entry in ActivityLog().tail(count):
+            print(format_entry(entry))
+    else:
+        print("Usage: python activity_log.py tail [count]")
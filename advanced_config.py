@@ -5,9 +5,6 @@ This file allows for more nuanced control over the bot's behavior.
 
 # Engagement settings
 ENGAGEMENT_STRATEGY = {
-    # Time to wait between different subreddits (in seconds)
-    'SUBREDDIT_SWITCH_DELAY': 5,
-    
     # How many posts to check per subreddit per session
     'POSTS_PER_SUBREDDIT': 100,
     
@@ -83,4 +80,269 @@ TRACKING_SETTINGS = {
     
     # File to store reply history
     'HISTORY_FILE': 'comments_replied_to.txt',
-}
\ No newline at end of file
+}
+
+# Reply history storage
+HISTORY_STORE = {
+    # 'jsonl' keeps IDs in memory and records replies in the JSONL activity log (ACTIVITY_LOG),
+    # 'set' does the same with the `|`-separated history file, 'index' uses the compact
+    # memory-mapped index, 'sqlite' keeps replies, per-post counts and session counters in one database
+    'BACKEND': 'jsonl',
+
+    # When appended history lines reach the disk: 'always', 'interval' or 'never'
+    'FSYNC_POLICY': 'interval',
+
+    # Seconds between flushes when using the 'interval' policy
+    'FLUSH_INTERVAL': 30,
+
+    # Number of pending history lines that forces a flush
+    'BUFFER_SIZE': 20,
+
+    # Sorted integer index file used by the 'index' backend
+    'INDEX_FILE': 'comments_replied_to.idx',
+
+    # New IDs held in memory before they are merged into the index file
+    'INDEX_MERGE_THRESHOLD': 10000,
+
+    # Target false positive rate of the Bloom filter in front of the index
+    'BLOOM_FALSE_POSITIVE_RATE': 0.01,
+
+    # Database file used by the 'sqlite' backend
+    'SQLITE_FILE': 'bot_state.db',
+}
+
+# Keyword matching
+KEYWORD_MATCHING = {
+    # Only match target/avoid keywords as whole words (e.g. 'hate' won't match 'whatever')
+    'WORD_BOUNDARIES': False,
+
+    # Reload config.py when it changes on disk (e.g. edited through bot_manager.py)
+    'RELOAD_CONFIG': True,
+
+    # Seconds between checks for config.py changes
+    'CONFIG_CHECK_INTERVAL': 60,
+}
+
+# Comment scanning
+SCAN_SETTINGS = {
+    # 'raw' parses listing JSON into lightweight records, 'praw' uses regular PRAW Comment objects
+    'MODE': 'raw',
+
+    # 'combined' reads one 'sub1+sub2+...' listing, 'per_subreddit' reads one listing per subreddit
+    'POLLING': 'combined',
+
+    # Longest combined subreddit path per listing request; longer lists are split into chunks
+    'MULTIREDDIT_MAX_LENGTH': 500,
+
+    # Comments fetched per combined listing each cycle
+    'COMBINED_LISTING_LIMIT': 100,
+
+    # Only fetch comments newer than the last one processed per listing (saved across restarts)
+    'INCREMENTAL': True,
+
+    # File holding the per-listing high-water-mark cursors
+    'CURSOR_FILE': 'scan_cursors.json',
+
+    # Pages (100 comments each) to walk back when catching up after downtime
+    'CATCHUP_MAX_PAGES': 10,
+
+    # Seconds without cursor movement before re-checking the cursor against the newest comments
+    'CURSOR_STALE_SECONDS': 900,
+}
+
+# Reddit API rate limiting (Reddit allows 100 requests per minute per OAuth client, averaged over 10 minutes)
+API_RATE_LIMIT = {
+    # Sustained request rate for all Reddit API calls
+    'REQUESTS_PER_MINUTE': 90,
+
+    # Requests that may be made back-to-back before throttling starts
+    'BURST': 10,
+}
+
+# Retries for failed Reddit API calls
+REQUEST_RETRY = {
+    # Retries per call for transient errors (5xx, timeouts, 429)
+    'MAX_RETRIES': 4,
+
+    # Base and maximum backoff in seconds (exponential with full jitter)
+    'BASE_DELAY': 2,
+    'MAX_DELAY': 60,
+
+    # Retry tokens earned per successful call, and the starting/minimum budget
+    'BUDGET_RATIO': 0.1,
+    'MIN_BUDGET': 10,
+}
+
+# asyncio runtime (python reddit_bot.py --async)
+ASYNC_SETTINGS = {
+    # Hugging Face generations allowed in flight at once
+    'GENERATION_CONCURRENCY': 4,
+}
+
+# Staged fetch -> filter -> generate -> post pipeline for the synchronous bot
+PIPELINE_SETTINGS = {
+    # Run comments through the staged pipeline (False handles each comment inline)
+    'ENABLED': True,
+
+    # Threads generating responses in parallel
+    'GENERATION_WORKERS': 3,
+
+    # Bounded queue sizes between stages; a full queue blocks the stage before it
+    'FILTER_QUEUE_SIZE': 200,
+    'GENERATE_QUEUE_SIZE': 10,
+    'POST_QUEUE_SIZE': 5,
+}
+
+# Cache of Hugging Face generations, reused when a comment is evaluated again
+GENERATION_CACHE = {
+    # Reuse earlier generations for the same comment, subreddit, context, model and parameters
+    'ENABLED': True,
+
+    # File the cache is saved to, so it survives restarts
+    'FILE': 'generation_cache.json',
+
+    # Least recently used entries are dropped beyond this size
+    'MAX_ENTRIES': 500,
+
+    # Entries older than this (in seconds) are regenerated
+    'TTL_SECONDS': 7 * 24 * 3600,
+}
+
+# Hugging Face generation pool
+GENERATION_SERVICE = {
+    # Inference requests allowed in flight at once (shared by all pipeline generation workers)
+    'MAX_WORKERS': 4,
+
+    # Seconds to wait for a generation before replying with a template instead
+    'DEADLINE_SECONDS': 45,
+
+    # HTTP timeout of the inference client, so hung requests eventually release their thread
+    'REQUEST_TIMEOUT': 120,
+
+    # Recent requests per model used for the p50/p95/p99 latency figures
+    'LATENCY_WINDOW': 500,
+
+    # Stream tokens and stop at a stop sequence, an echoed prompt or MAX_RESPONSE_LENGTH characters
+    'STREAM': True,
+}
+
+# Context files used when generating responses
+CONTEXT_SETTINGS = {
+    # Directory holding the markdown context files (re-read when a file changes)
+    'DIRECTORY': 'context',
+
+    # Context used when a subreddit has no specific file
+    'DEFAULT_FILE': 'travel_journal_context.md',
+
+    # Subreddit -> context file (case-insensitive). Subreddits not listed here use
+    # '<subreddit>_context.md' when such a file exists, otherwise the default file.
+    'SUBREDDIT_CONTEXTS': {
+        'JapanTravel': 'japan_context.md',
+        'Tokyo': 'japan_context.md',
+        'japan': 'japan_context.md',
+        'EuropeTravelTips': 'europe_context.md',
+        'europe': 'europe_context.md',
+        'Paris': 'europe_context.md',
+        'italianlearning': 'europe_context.md',
+    },
+}
+
+# Retrieval of the context passages relevant to each comment (BM25 over context/*.md paragraphs)
+CONTEXT_RETRIEVAL = {
+    # Send only the best-matching passages instead of the whole context file
+    'ENABLED': True,
+
+    # Maximum passages per prompt, and the approximate token budget they must fit in
+    # (never more than the subreddit's whole context file)
+    'TOP_K': 3,
+    'TOKEN_BUDGET': 200,
+
+    # BM25 parameters: term-frequency saturation and length normalization
+    'K1': 1.5,
+    'B': 0.75,
+}
+
+# Prometheus metrics endpoint served by the bot process (see metrics.py)
+METRICS = {
+    # Serve /metrics in Prometheus text format while the bot runs
+    'ENABLED': True,
+
+    # Listening address; use '0.0.0.0' to let a scraper on another host reach it
+    'HOST': '127.0.0.1',
+
+    # Port of the endpoint (the METRICS_PORT environment variable takes precedence; 0 disables it)
+    'PORT': 9108,
+}
+
+# On-demand profiling of the running bot (see profiling.py)
+PROFILING = {
+    # Allow profiles to be requested with the signal or the control file
+    'ENABLED': True,
+
+    # Signal that requests a profile (`kill -USR1 <pid>`), where the platform has it
+    'SIGNAL': 'SIGUSR1',
+
+    # Creating this file also requests a profile; it may contain a cycle count and/or a mode, e.g. "3 cprofile"
+    'CONTROL_FILE': 'profile.request',
+
+    # Cycles profiled per request
+    'CYCLES': 1,
+
+    # 'sampling' samples every thread (pipeline and generation workers included);
+    # 'cprofile' traces every call, but only in the bot's main thread
+    'MODE': 'sampling',
+    'SAMPLE_INTERVAL': 0.005,
+
+    # Also take a tracemalloc snapshot, keeping this many frames per allocation
+    'TRACEMALLOC': True,
+    'TRACEMALLOC_FRAMES': 10,
+
+    # Where profiles and snapshots are written, and how many hot spots are logged
+    'DUMP_DIRECTORY': 'profiles',
+    'TOP_N': 15,
+}
+
+# Structured JSONL activity log used by the 'jsonl' history backend (see activity_log.py)
+ACTIVITY_LOG = {
+    # Directory holding the log segments and their index
+    'DIRECTORY': 'activity_log',
+
+    # Start a new segment once the current one reaches this size (bytes) or age (seconds)
+    'MAX_SEGMENT_BYTES': 4 * 1024 * 1024,
+    'MAX_SEGMENT_AGE': 7 * 24 * 3600,
+}
+
+# Destination-specific fallback responses (see destination_router.py)
+DESTINATION_ROUTING = {
+    # JSON file listing the destinations in priority order, with their aliases and responses;
+    # relative paths are resolved next to the bot's code
+    'FILE': 'destinations.json',
+
+    # Reload the file when it changes on disk (checked once per cycle)
+    'RELOAD': True,
+}
+
+# Batch relevance scoring behind CONTENT_MODERATION['MIN_CONFIDENCE'] (see relevance_scorer.py; needs NumPy)
+RELEVANCE_SCORING = {
+    # Score each listing against the subreddits' relevance profiles before generating
+    'ENABLED': True,
+
+    # Size of the hashing space for words (a power of two)
+    'HASH_FEATURES': 2 ** 20,
+
+    # Cosine similarity to the subreddit profile that counts as full confidence (1.0);
+    # lower similarities scale linearly, so MIN_CONFIDENCE 0.5 needs half of it
+    'FULL_CONFIDENCE_SIMILARITY': 0.1,
+}
+
+# Near-duplicate check of outgoing replies within RESPONSE_SETTINGS['DUPLICATE_RESPONSE_WINDOW'] (see reply_dedup.py)
+REPLY_DEDUP = {
+    # Replace (or skip) responses that repeat a reply posted within the window
+    'ENABLED': True,
+
+    # File the fingerprints of recent replies are saved to, so the window survives restarts
+    'FILE': 'reply_fingerprints.json',
+
+    # Replies whose 64-bit SimHash fingerprints differ in at most this many bits count as duplicates
+    'MAX_DISTANCE': 3,
+}
@@ -0,0 +1,300 @@
+"""
+asyncio runtime for the travel engagement bot.
+Listing fetches for every feed and Hugging Face generations overlap on one
+event loop, while sharing the filters, rate limits, cursors and history store
+of the synchronous bot in reddit_bot.py. Replies are still posted one at a
+time with the usual spacing.
+
+Run with `python async_bot.py` or `python reddit_bot.py --async`.
+"""
+
+import time
+import random
+import asyncio
+import logging
+
+import asyncpraw
+import asyncprawcore
+
+import metrics
+import reddit_bot as bot
+from config import (
+    REDDIT_USERNAME,
+    REDDIT_PASSWORD,
+    REDDIT_CLIENT_ID,
+    REDDIT_CLIENT_SECRET,
+    REDDIT_USER_AGENT,
+    SLEEP_DURATION,
+    MAX_COMMENTS_PER_SESSION,
+    MAX_REPLY_PER_POST,
+)
+from advanced_config import ENGAGEMENT_STRATEGY, ACTIVITY_SCHEDULE, SCAN_SETTINGS, ASYNC_SETTINGS, PROFILING
+from comment_feed import MAX_PAGE_SIZE, parse_comment_listing
+from scan_cursors import get_cursor_store, newer_than_cursor, page_back_to_cursor
+from reply_store import close_on_exit
+from session_state import get_session_counters
+from request_scheduler import get_request_scheduler
+from relevance_scorer import score_comments
+from profiling import get_cycle_profiler
+from response_templates import generate_contextual_response_async
+
+logger = logging.getLogger(__name__)
+
+# asyncprawcore mirrors the prawcore exception hierarchy
+ASYNC_RETRYABLE_ERRORS = (
+    asyncprawcore.exceptions.ServerError,
+    asyncprawcore.exceptions.RequestException,
+    asyncprawcore.exceptions.TooManyRequests,
+)
+
+_bot_username = None
+
+
+def bot_login_async():
+    """
+    Create the asyncpraw client (authentication happens lazily on the first request).
+    """
+    logger.info("Logging in (asyncio runtime)...")
+    return asyncpraw.Reddit(
+        username=REDDIT_USERNAME,
+        password=REDDIT_PASSWORD,
+        client_id=REDDIT_CLIENT_ID,
+        client_secret=REDDIT_CLIENT_SECRET,
+        user_agent=REDDIT_USER_AGENT,
+    )
+
+
+async def get_bot_username_async(reddit):
+    """
+    Lowercased username of the logged-in bot account (cached after the first call).
+    """
+    global _bot_username
+    if _bot_username is None:
+        me = await get_request_scheduler().call_async(reddit.user.me, reason='identity', reddit_instance=reddit,
+                                                      retryable=ASYNC_RETRYABLE_ERRORS)
+        _bot_username = me.name.lower()
+    return _bot_username
+
+
+async def fetch_comment_page_async(reddit, feed_path, limit=MAX_PAGE_SIZE, after=None, before=None):
+    """
+    Fetch one raw listing page; returns (records, after, before).
+    """
+    params = {'limit': min(limit, MAX_PAGE_SIZE), 'raw_json': 1}
+    if after:
+        params['after'] = after
+    if before:
+        params['before'] = before
+    listing = await get_request_scheduler().call_async(
+        reddit.request, method='GET', path=f'r/{feed_path}/comments/', params=params,
+        reason='listing', reddit_instance=reddit, retryable=ASYNC_RETRYABLE_ERRORS)
+    return parse_comment_listing(listing)
+
+
+async def fetch_feed_async(reddit, feed_path, first_poll_limit):
+    """
+    Async version of the listing fetch: incremental from the feed's cursor when enabled,
+    otherwise the newest `first_poll_limit` comments.
+    """
+    cursor = get_cursor_store().get(feed_path) if SCAN_SETTINGS['INCREMENTAL'] else None
+
+    if cursor is not None:
+        records, _, _ = await fetch_comment_page_async(reddit, feed_path, before=cursor['fullname'])
+        stale = time.time() - cursor.get('updated_at', 0) > SCAN_SETTINGS['CURSOR_STALE_SECONDS']
+        if len(records) < MAX_PAGE_SIZE and (records or not stale):
+            return newer_than_cursor(records, cursor)[0]
+
+    # Page backward from the newest comment (stopping at the cursor if there is one)
+    collected, after = [], None
+    max_pages = SCAN_SETTINGS['CATCHUP_MAX_PAGES'] if cursor else -(-first_poll_limit // MAX_PAGE_SIZE)
+    for _ in range(max_pages):
+        limit = MAX_PAGE_SIZE if cursor else first_poll_limit - len(collected)
+        page, after, _ = await fetch_comment_page_async(reddit, feed_path, limit, after=after)
+        if cursor is not None:
+            unseen, reached = newer_than_cursor(page, cursor)
+            collected.extend(unseen)
+            if reached:
+                return collected
+        else:
+            collected.extend(page)
+        if not after or not page:
+            break
+    if cursor is not None:
+        if not collected:
+            # Quiet feed: the cursor is still valid, so don't re-check it every cycle
+            get_cursor_store().touch(feed_path)
+        return page_back_to_cursor(collected, cursor, feed_path)
+    return collected[:first_poll_limit]
+
+
+async def generate_response_async(record, keyword_matches, semaphore):
+    async with semaphore:
+        context = await asyncio.to_thread(bot.get_context_for_subreddit, record.subreddit, record.body)
+        started = time.monotonic()
+        response = await generate_contextual_response_async(record.body, record.subreddit, context,
+                                                            destination_terms=keyword_matches['destination'])
+        metrics.STAGE_SECONDS.observe(time.monotonic() - started, stage='generate')
+        return bot.select_unique_response(record, keyword_matches, response)
+
+
+async def post_reply_async(reddit, record, response, comments_replied_to, subreddit_name):
+    """
+    Post one reply and record it; returns True on success.
+    """
+    try:
+        return await _post_reply_async(reddit, record, response, comments_replied_to, subreddit_name)
+    finally:
+        bot.release_response(record)
+
+
+async def _post_reply_async(reddit, record, response, comments_replied_to, subreddit_name):
+    started = time.monotonic()
+    try:
+        comment = await reddit.comment(record.id, fetch=False)
+        await get_request_scheduler().call_async(comment.reply, response, reason='reply', idempotent=False,
+                                                 reddit_instance=reddit, retryable=ASYNC_RETRYABLE_ERRORS)
+    except asyncprawcore.exceptions.Forbidden as forbidden_error:
+        metrics.REPLIES.inc(outcome='forbidden')
+        logger.warning(f"Permission error for comment {record.id}: {forbidden_error}. Skipping.")
+        return False
+    except asyncpraw.exceptions.RedditAPIException as api_exception:
+        metrics.REPLIES.inc(outcome='api_error')
+        delay = bot.get_ratelimit_delay(api_exception)
+        if delay is None:
+            logger.error(f"API Exception: {api_exception}")
+        else:
+            logger.warning(f"Rate limited by Reddit. Backing off for {delay} seconds.")
+            metrics.SLEEP_SECONDS.inc(delay + 1, cause='ratelimit_backoff')
+            await asyncio.sleep(delay + 1)
+        return False
+    except Exception as reply_error:
+        metrics.REPLIES.inc(outcome='error')
+        logger.exception(f"Error while replying to comment {record.id}: {reply_error}")
+        return False
+
+    metrics.STAGE_SECONDS.observe(time.monotonic() - started, stage='reply')
+    metrics.REPLIES.inc(outcome='posted')
+    logger.info(f"Replied to comment {record.id}")
+    # History writes may hit the disk; keep them off the event loop
+    await asyncio.to_thread(bot.record_reply, record, comments_replied_to, subreddit_name, response)
+    return True
+
+
+async def run_cycle_async(reddit, comments_replied_to):
+    """
+    One scan: fetch every feed concurrently, filter locally, generate concurrently,
+    then post replies one by one with the configured spacing.
+    """
+    bot.start_cycle(comments_replied_to)
+    feeds = bot.get_feeds()
+
+    async def fetch(subreddit_names):
+        limit = ENGAGEMENT_STRATEGY['POSTS_PER_SUBREDDIT'] if len(subreddit_names) == 1 \
+            else SCAN_SETTINGS['COMBINED_LISTING_LIMIT']
+        started = time.monotonic()
+        records = await fetch_feed_async(reddit, '+'.join(subreddit_names), limit)
+        metrics.STAGE_SECONDS.observe(time.monotonic() - started, stage='fetch')
+        return records
+
+    results = await asyncio.gather(*(fetch(names) for names in feeds), return_exceptions=True)
+    bot_username = await get_bot_username_async(reddit)
+
+    # Plan replies within the session and per-post budgets before spending any inference
+    candidates = []
+    planned_posts = dict(get_session_counters().posts)
+    planned_total = get_session_counters().comments
+    truncated_feeds = set()
+    for subreddit_names, records in zip(feeds, results):
+        feed_name = '+'.join(subreddit_names)
+        if isinstance(records, Exception):
+            logger.error(f"An error occurred while fetching {feed_name}: {records}")
+            continue
+        route = {subreddit_name.lower(): subreddit_name for subreddit_name in subreddit_names}
+        confidences = score_comments(records, route)
+        for record in records:
+            subreddit_name = route.get(record.subreddit.lower())
+            if subreddit_name is None:
+                continue
+            keyword_matches, _ = bot.qualify_comment(record, comments_replied_to, bot_username,
+                                                     confidences.get(record.id))
+            if keyword_matches is None:
+                continue
+            if planned_total >= MAX_COMMENTS_PER_SESSION:
+                truncated_feeds.add(feed_name)
+                break
+            if planned_posts.get(record.post_id, 0) >= MAX_REPLY_PER_POST:
+                continue
+            bot.log_keyword_match(record, subreddit_name, keyword_matches)
+            if random.random() > ENGAGEMENT_STRATEGY['RESPONSE_RATE']:
+                metrics.COMMENTS_REJECTED.inc(reason='response_rate')
+                continue
+            planned_total += 1
+            planned_posts[record.post_id] = planned_posts.get(record.post_id, 0) + 1
+            candidates.append((record, subreddit_name, keyword_matches))
+
+    semaphore = asyncio.Semaphore(ASYNC_SETTINGS['GENERATION_CONCURRENCY'])
+    responses = await asyncio.gather(*(generate_response_async(record, matches, semaphore)
+                                       for record, _, matches in candidates))
+
+    for index, ((record, subreddit_name, _), response) in enumerate(zip(candidates, responses)):
+        if response is None:
+            # Every candidate response repeated a recent reply
+            continue
+        posted = await post_reply_async(reddit, record, response, comments_replied_to, subreddit_name)
+        if posted and index < len(candidates) - 1:
+            # Keep the same natural spacing between replies as the synchronous bot
+            delay = random.randint(ACTIVITY_SCHEDULE['MIN_RESPONSE_DELAY'], ACTIVITY_SCHEDULE['MAX_RESPONSE_DELAY'])
+            metrics.SLEEP_SECONDS.inc(delay, cause='reply_spacing')
+            await asyncio.sleep(delay)
+
+    # Advance cursors for feeds whose comments were all evaluated
+    if SCAN_SETTINGS['INCREMENTAL']:
+        for subreddit_names, records in zip(feeds, results):
+            feed_name = '+'.join(subreddit_names)
+            if not isinstance(records, Exception) and records and feed_name not in truncated_feeds:
+                get_cursor_store().update(feed_name, records[0])
+
+
+async def main():
+    comments_replied_to = bot.get_saved_comments()
+    close_on_exit(comments_replied_to)
+    logger.info(f"Number of comments replied to: {len(comments_replied_to)}")
+    get_session_counters().load(comments_replied_to.load_counters())
+
+    reddit = bot_login_async()
+    try:
+        while True:
+            started = time.monotonic()
+            get_cycle_profiler().start_cycle()
+            try:
+                await run_cycle_async(reddit, comments_replied_to)
+            except Exception as e:
+                logger.exception(f"An error occurred: {e}")
+            finally:
+                get_cycle_profiler().end_cycle()
+            metrics.STAGE_SECONDS.observe(time.monotonic() - started, stage='cycle')
+            bot.log_cycle_stats()
+            logger.info(f"Session completed. Comments replied in this session: {get_session_counters().comments}. "
+                        f"Sleeping for {SLEEP_DURATION} seconds...")
+            metrics.SLEEP_SECONDS.inc(int(SLEEP_DURATION), cause='cycle_pause')
+            await asyncio.sleep(int(SLEEP_DURATION))
+    finally:
+        await asyncio.to_thread(comments_replied_to.close)
+        await reddit.close()
+
+
+def run():
+    """
+    Entry point for the asyncio runtime.
+    """
+    metrics.start_metrics_server()
+    if PROFILING['ENABLED']:
+        get_cycle_profiler().install_signal_handler()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Bot terminated.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,147 @@
+"""
+Micro-benchmark of the destination router.
+Builds routers with growing numbers of synthetic destinations (on top of the
+ones in destinations.json) and times routing a batch of comments, against a
+baseline that checks the destinations one by one like the old if/elif chain.
+
+    python -m bench.destination_router_benchmark --sizes 10 100 1000 --comments 2000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import argparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FILLER = ("looking for tips on food neighborhoods budget hotels trains and what to skip, "
+          "we have about a week in total and like museums markets and long walks").split()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark destination routing against a linear scan")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+                        help="numbers of destinations to benchmark")
+    parser.add_argument('--comments', type=int, default=2000)
+    parser.add_argument('--words', type=int, default=40, help="words per synthetic comment")
+    parser.add_argument('--match-ratio', type=float, default=0.5,
+                        help="share of comments mentioning a destination")
+    parser.add_argument('--repeat', type=int, default=3, help="best of this many timed passes")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def load_base_destinations():
+    with open(os.path.join(REPO_DIR, 'destinations.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)['destinations']
+
+
+def synthetic_destinations(count, rng):
+    """
+    `count` destinations with made-up place names; every fifth one needs a qualifier.
+    """
+    destinations = []
+    for i in range(count):
+        aliases = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 10))) for _ in range(rng.randint(1, 3))]
+        destination = {'name': f"place-{i}", 'responses': [f"Response for place {i}"]}
+        if i % 5 == 4:
+            destination.update(qualified_aliases=aliases, qualifiers=['trip', 'itinerary'])
+        else:
+            destination['aliases'] = aliases
+        destinations.append(destination)
+    return destinations
+
+
+def synthetic_comments(destinations, args, rng):
+    comments = []
+    for _ in range(args.comments):
+        words = rng.choices(FILLER, k=args.words)
+        if rng.random() < args.match_ratio:
+            destination = rng.choice(destinations)
+            terms = destination.get('aliases') or destination['qualified_aliases']
+            words[rng.randrange(len(words))] = rng.choice(terms)
+            if destination.get('qualifiers'):
+                words[rng.randrange(len(words))] = rng.choice(destination['qualifiers'])
+        comments.append(' '.join(words))
+    return comments
+
+
+def linear_route(destinations, comment_text):
+    """
+    Baseline: test each destination's terms in priority order, as the old if/elif chain did.
+    """
+    comment_lower = comment_text.lower()
+    for position, destination in enumerate(destinations):
+        if any(alias in comment_lower for alias in destination.get('aliases', ())):
+            return position
+        if (any(alias in comment_lower for alias in destination.get('qualified_aliases', ()))
+                and any(qualifier in comment_lower for qualifier in destination.get('qualifiers', ()))):
+            return position
+    return None
+
+
+def best_time(function, items, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(args):
+    sys.path.insert(0, REPO_DIR)
+    from destination_router import DestinationRouter
+
+    rng = random.Random(args.seed)
+    base = load_base_destinations()
+    results = []
+    for size in args.sizes:
+        destinations = base + synthetic_destinations(max(0, size - len(base)), rng)
+        comments = synthetic_comments(destinations, args, rng)
+        router = DestinationRouter(destinations)
+        matched = [router.scan(comment) for comment in comments]
+
+        mismatches = sum(router.route(comment) != linear_route(destinations, comment) for comment in comments)
+        started = time.perf_counter()
+        DestinationRouter(destinations).scan('')
+        compile_seconds = time.perf_counter() - started
+
+        results.append({
+            'destinations': len(router),
+            'terms': len(router.terms),
+            'compile_ms': compile_seconds * 1000,
+            'router_us': best_time(router.route, comments, args.repeat) / len(comments) * 1e6,
+            # Routing from terms the shared keyword matcher already found (the bot's usual path)
+            'matched_us': best_time(lambda terms: router.route(matched_terms=terms), matched, args.repeat)
+            / len(comments) * 1e6,
+            'linear_us': best_time(lambda comment: linear_route(destinations, comment), comments, args.repeat)
+            / len(comments) * 1e6,
+            'mismatches': mismatches,
+        })
+    return results
+
+
+def print_report(results, args):
+    print(f"\nDestination routing ({args.comments} comments of {args.words} words, "
+          f"{args.match_ratio:.0%} mentioning a destination), per comment:")
+    print(f"  {'destinations':>12} {'terms':>6} {'compile':>9} {'router':>10} {'from terms':>11} {'linear':>10}")
+    for row in results:
+        print(f"  {row['destinations']:>12} {row['terms']:>6} {row['compile_ms']:>7.1f}ms "
+              f"{row['router_us']:>8.1f}us {row['matched_us']:>9.2f}us {row['linear_us']:>8.1f}us")
+        if row['mismatches']:
+            print(f"  warning: {row['mismatches']} comments routed differently from the linear baseline")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print_report(run(args), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Local stand-in for the parts of the Reddit API the bot uses.
+Implements the OAuth token, comment listing, /api/v1/me and reply endpoints
+with configurable latency and X-Ratelimit-* headers, so the real bot can be
+benchmarked without touching live Reddit.
+
+Run standalone with `python -m bench.fake_reddit --port 8765 --comments 1000`.
+"""
+
+import json
+import time
+import random
+import string
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Comment bodies for synthetic streams; KEYWORD_BODIES contain TARGET_STRINGS phrases
+KEYWORD_BODIES = [
+    "I'm planning a first time trip to Tokyo next spring, any tips for getting around?",
+    "Can anyone recommend food spots in Paris that aren't tourist traps? Visiting in May.",
+    "Feeling overwhelmed with my itinerary for Bali, where should I stay for a week?",
+    "Looking for trip advice: best places for a day trip from Reykjavik in winter?",
+    "Solo travel in Thailand for a beginner, what options do I have for island hopping?",
+]
+FILLER_BODIES = [
+    "This photo is amazing, thanks for sharing!",
+    "Same thing happened to me at the airport last year.",
+    "Ha, the queue at that museum is always ridiculous.",
+    "Totally agree with the comment above.",
+    "The weather there was great when we went.",
+    "I miss that place so much.",
+]
+
+
+def _base36(value):
+    digits = string.digits + string.ascii_lowercase
+    out = ''
+    while True:
+        value, remainder = divmod(value, 36)
+        out = digits[remainder] + out
+        if not value:
+            return out
+
+
+class CommentStream:
+    """
+    Newest-last list of comment dicts served by the fake listings, plus reply bookkeeping.
+    """
+
+    def __init__(self, subreddits, keyword_ratio=0.2, posts_per_subreddit=50, seed=None):
+        self.subreddits = list(subreddits)
+        self.keyword_ratio = keyword_ratio
+        self.posts_per_subreddit = posts_per_subreddit
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._comments = []
+        self._positions = {}
+        self._next_id = 36 ** 5
+        self.injected_at = {}
+        self.replies = {}
+
+    def _new_id(self):
+        self._next_id += 1
+        return _base36(self._next_id)
+
+    def add(self, data):
+        """
+        Append one comment (a listing `data` dict); missing fields are filled in.
+        """
+        with self._lock:
+            comment_id = data.get('id') or self._new_id()
+            data = dict(data, id=comment_id, name='t1_' + comment_id)
+            data.setdefault('created_utc', time.time())
+            data.setdefault('author', 'traveller_' + self._random.choice(string.ascii_lowercase))
+            data.setdefault('link_id', 't3_' + _base36(self._random.randrange(self.posts_per_subreddit * 100)))
+            data.setdefault('subreddit', self._random.choice(self.subreddits))
+            self._positions[data['name']] = len(self._comments)
+            self._comments.append(data)
+            self.injected_at[comment_id] = time.monotonic()
+            return data
+
+    def inject(self, count):
+        """
+        Add `count` synthetic comments, `keyword_ratio` of them containing target keywords.
+        """
+        for _ in range(count):
+            keyword = self._random.random() < self.keyword_ratio
+            body = self._random.choice(KEYWORD_BODIES if keyword else FILLER_BODIES)
+            self.add({'body': body})
+
+    def load(self, file_path):
+        """
+        Queue a recorded stream: one listing `data` dict (JSON) per line. Returns the records.
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def listing(self, subreddit_path, limit, after=None, before=None):
+        """
+        Newest-first page of comments from the given 'a+b' subreddits, Reddit-style paging.
+        """
+        wanted = {name.lower() for name in subreddit_path.split('+')}
+        limit = max(1, min(int(limit or 25), 100))
+        with self._lock:
+            if before and before in self._positions:
+                # Comments newer than `before`, closest to it first, returned newest first
+                start = self._positions[before] + 1
+                page = [c for c in self._comments[start:] if c['subreddit'].lower() in wanted][:limit]
+                page.reverse()
+            else:
+                end = self._positions.get(after, len(self._comments)) if after else len(self._comments)
+                page = []
+                for comment in reversed(self._comments[:end]):
+                    if comment['subreddit'].lower() in wanted:
+                        page.append(comment)
+                        if len(page) == limit:
+                            break
+        next_after = page[-1]['name'] if len(page) == limit else None
+        return {
+            'kind': 'Listing',
+            'data': {
+                'after': next_after,
+                'before': page[0]['name'] if page else None,
+                'dist': len(page),
+                'children': [{'kind': 't1', 'data': comment} for comment in page],
+            },
+        }
+
+    def reply(self, thing_id, text):
+        parent_id = thing_id[3:]
+        with self._lock:
+            self.replies[parent_id] = time.monotonic()
+            parent = self._comments[self._positions[thing_id]] if thing_id in self._positions else {}
+        comment_id = self._new_id()
+        return {
+            'id': comment_id,
+            'name': 't1_' + comment_id,
+            'body': text,
+            'author': 'bench_bot',
+            'parent_id': thing_id,
+            'link_id': parent.get('link_id', 't3_0'),
+            'subreddit': parent.get('subreddit', 'travel'),
+            'created_utc': time.time(),
+            'replies': '',
+        }
+
+
+class RateLimitWindow:
+    """
+    Reddit-style request budget: `limit` requests per `window` seconds.
+    """
+
+    def __init__(self, limit=1000, window=600):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self.used = 0
+        self.requests = 0
+
+    def take(self):
+        with self._lock:
+            now = time.time()
+            if now - self._started >= self.window:
+                self._started, self.used = now, 0
+            self.used += 1
+            self.requests += 1
+            return {
+                'x-ratelimit-used': str(self.used),
+                'x-ratelimit-remaining': str(float(max(self.limit - self.used, 0))),
+                'x-ratelimit-reset': str(int(self._started + self.window - now)),
+            }
+
+
+class FakeRedditServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server serving a CommentStream. Counts requests per endpoint.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, stream, port=0, latency=0.0, ratelimit=None):
+        super().__init__(('127.0.0.1', port), FakeRedditHandler)
+        self.stream = stream
+        self.latency = latency
+        self.ratelimit = ratelimit or RateLimitWindow()
+        self.calls = {}
+        self._calls_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, endpoint):
+        with self._calls_lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-reddit', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeRedditHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in self.server.ratelimit.take().items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length).decode('utf-8') if length else ''
+        return {key: values[0] for key, values in parse_qs(raw).items()}
+
+    def _delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def do_GET(self):
+        self._delay()
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts[:3] == ['api', 'v1', 'me']:
+            self.server.count('me')
+            self._send({'name': 'bench_bot', 'id': 'benchbot', 'created_utc': time.time() - 86400,
+                        'link_karma': 1, 'comment_karma': 1})
+        elif len(parts) >= 3 and parts[0] == 'r' and parts[2] == 'comments':
+            self.server.count('listing')
+            self._send(self.server.stream.listing(parts[1], query.get('limit'),
+                                                  after=query.get('after'), before=query.get('before')))
+        else:
+            self.server.count('other')
+            self._send({'message': 'Not Found', 'error': 404}, status=404)
+
+    def do_POST(self):
+        self._delay()
+        parts = [part for part in urlsplit(self.path).path.split('/') if part]
+        form = self._form()
+
+        if parts[:3] == ['api', 'v1', 'access_token']:
+            self.server.count('access_token')
+            self._send({'access_token': 'bench-token', 'token_type': 'bearer', 'expires_in': 3600, 'scope': '*'})
+        elif parts[:2] == ['api', 'comment']:
+            self.server.count('reply')
+            reply = self.server.stream.reply(form.get('thing_id', ''), form.get('text', ''))
+            self._send({'json': {'errors': [], 'data': {'things': [{'kind': 't1', 'data': reply}]}}})
+        else:
+            self.server.count('other')
+            self._send({'message': 'Not Found', 'error': 404}, status=404)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Reddit API server for benchmarks")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--comments', type=int, default=1000, help="synthetic comments to start with")
+    parser.add_argument('--keyword-ratio', type=float, default=0.2)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--ratelimit', type=int, default=1000, help="requests allowed per 600 s window")
+    parser.add_argument('--stream', help="JSONL file of recorded comment data to serve")
+    args = parser.parse_args()
+
+    from config import TARGET_SUBREDDITS
+    stream = CommentStream(TARGET_SUBREDDITS, args.keyword_ratio)
+    if args.stream:
+        for data in stream.load(args.stream):
+            stream.add(data)
+    else:
+        stream.inject(args.comments)
+
+    server = FakeRedditServer(stream, args.port, args.latency_ms / 1000.0, RateLimitWindow(args.ratelimit))
+    print(f"Fake Reddit API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Load test of the generation stage against bench.mock_inference.
+Runs the real generate_contextual_response path (generation pool, deadlines,
+streaming cutoff, template fallback) from several threads at once, the way
+the pipeline's generation workers do, and reports throughput, fallback rate
+and latency.
+
+    python -m bench.generation_load_test --requests 200 --concurrency 8 --latency lognormal:1.0:0.6 --error-rate 0.05
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import tempfile
+
+from bench.mock_inference import ANSWER_PREFIX, MockInferenceServer, add_behaviour_arguments, behaviour_from_args
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_COMMENTS = [
+    "Planning a first time trip to Tokyo, any tips for getting around?",
+    "Can anyone recommend food spots in Paris? Visiting in May.",
+    "Overwhelmed with my Bali itinerary, where should I stay?",
+    "Trip advice needed: best places for a day trip from Reykjavik?",
+    "Solo travel in Thailand as a beginner, what are my options?",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the generation stage against a mock inference endpoint")
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4, help="threads calling the generation path")
+    parser.add_argument('--max-workers', type=int, help="GENERATION_SERVICE['MAX_WORKERS'] for the run")
+    parser.add_argument('--deadline', type=float, help="GENERATION_SERVICE['DEADLINE_SECONDS'] for the run")
+    parser.add_argument('--no-stream', action='store_true', help="request whole responses instead of streaming")
+    parser.add_argument('--cache', action='store_true', help="keep the generation cache enabled")
+    parser.add_argument('--max-fallback-rate', type=float, default=0.5,
+                        help="fail the run when a larger share of requests falls back to templates")
+    add_behaviour_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def configure(args, server_url, work_dir):
+    """
+    Point the bot's generation settings at the mock endpoint. Must run before response_templates is imported.
+    """
+    os.environ['HF_BASE_URL'] = server_url
+    sys.path.insert(0, REPO_DIR)
+
+    import advanced_config
+    advanced_config.GENERATION_SERVICE['STREAM'] = not args.no_stream
+    advanced_config.GENERATION_CACHE['ENABLED'] = args.cache
+    if args.max_workers:
+        advanced_config.GENERATION_SERVICE['MAX_WORKERS'] = args.max_workers
+    if args.deadline:
+        advanced_config.GENERATION_SERVICE['DEADLINE_SECONDS'] = args.deadline
+    os.chdir(work_dir)
+
+
+def run(args, server):
+    import response_templates
+    from generation_service import get_generation_service, percentile
+
+    lock = threading.Lock()
+    outcomes = {'generated': 0, 'fallback': 0}
+    latencies = []
+    next_request = iter(range(args.requests))
+
+    def worker():
+        while True:
+            with lock:
+                number = next(next_request, None)
+            if number is None:
+                return
+            # A unique suffix keeps every request distinct for the cache and the mock
+            comment = f"{SAMPLE_COMMENTS[number % len(SAMPLE_COMMENTS)]} (request {number})"
+            started = time.monotonic()
+            response = response_templates.generate_contextual_response(comment, 'travel', "Bench context.")
+            elapsed = time.monotonic() - started
+            with lock:
+                latencies.append(elapsed)
+                outcomes['generated' if response.startswith(ANSWER_PREFIX) else 'fallback'] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    service_stats = get_generation_service().stats()
+    return {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'seconds': elapsed,
+        'throughput': args.requests / elapsed if elapsed else 0.0,
+        'generated': outcomes['generated'],
+        'fallbacks': outcomes['fallback'],
+        'fallback_rate': outcomes['fallback'] / args.requests if args.requests else 0.0,
+        'caller_p50': percentile(latencies, 0.50),
+        'caller_p95': percentile(latencies, 0.95),
+        'caller_p99': percentile(latencies, 0.99),
+        'service': service_stats,
+        'mock': dict(server.behaviour.stats),
+    }
+
+
+def print_report(results):
+    print(f"\nGeneration load test ({results['requests']} requests, concurrency {results['concurrency']})")
+    print(f"  wall time:     {results['seconds']:.2f}s ({results['throughput']:.2f} responses/s)")
+    print(f"  generated:     {results['generated']}")
+    print(f"  fallbacks:     {results['fallbacks']} ({results['fallback_rate']:.1%})")
+    print(f"  caller wait:   p50 {results['caller_p50']:.3f}s, p95 {results['caller_p95']:.3f}s, "
+          f"p99 {results['caller_p99']:.3f}s")
+    for model, stats in results['service']['models'].items():
+        print(f"  model {model}: {stats}")
+    for model, stats in results['service']['streaming'].items():
+        print(f"  streaming {model}: {stats}")
+    print(f"  mock endpoint: {results['mock']}")
+
+
+def check_results(results, args):
+    """
+    Reasons the run should fail: a broken generation path shows up as the mock
+    getting no requests, or as (nearly) every response being a template.
+    """
+    problems = []
+    if results['requests'] and not results['mock']['requests']:
+        problems.append("the mock endpoint received no requests")
+    if results['fallback_rate'] > args.max_fallback_rate:
+        problems.append(f"fallback rate {results['fallback_rate']:.1%} is above {args.max_fallback_rate:.1%}")
+    return problems
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = MockInferenceServer(behaviour_from_args(args)).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix='generation-bench-') as work_dir:
+            configure(args, server.url, work_dir)
+            results = run(args, server)
+            os.chdir(REPO_DIR)
+    finally:
+        server.stop()
+    print_report(results)
+    problems = check_results(results, args)
+    if problems:
+        print(f"\nFAILED: {'; '.join(problems)}")
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
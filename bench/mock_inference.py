@@ -0,0 +1,233 @@
+"""
+Local mock of a text-generation (TGI-style) endpoint.
+Point the bot at it with HF_BASE_URL=http://127.0.0.1:<port> to exercise the
+real generation path offline. Latency, error rate, streaming speed and
+prompt echoing are configurable, so deadlines, fallbacks and streaming
+cutoffs can be load-tested.
+
+Run standalone with `python -m bench.mock_inference --port 8766 --latency lognormal:2.0:0.5`.
+"""
+
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Every mock answer starts with this, so callers can tell generations from template fallbacks
+ANSWER_PREFIX = "[mock]"
+
+ANSWER_SENTENCES = [
+    "Start with the neighbourhoods that locals actually live in rather than the main tourist strip.",
+    "Book the long-distance trains a few weeks ahead, the flexible fares sell out first.",
+    "Mornings are the best time for the big sights, the crowds only arrive after ten.",
+    "Pick one base for three or four nights and do day trips, it saves a lot of packing.",
+    "Street food markets are usually cheaper and better than the restaurants around them.",
+    "Keep one rainy-day plan ready, museums and covered markets fill up fast when it pours.",
+]
+
+
+class LatencyModel:
+    """
+    Seconds before the first token, parsed from 'fixed:S', 'uniform:LOW:HIGH' or 'lognormal:MEDIAN:SIGMA'.
+    """
+
+    def __init__(self, spec='fixed:0.5', seed=None):
+        kind, *values = spec.split(':')
+        self.kind = kind
+        self.values = [float(value) for value in values]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            if self.kind == 'uniform':
+                return self._random.uniform(*self.values)
+            if self.kind == 'lognormal':
+                median, sigma = self.values
+                return self._random.lognormvariate(math.log(median), sigma)
+            return self.values[0] if self.values else 0.0
+
+
+class MockBehaviour:
+    """
+    What the mock endpoint does for each request, plus counters of what it did.
+    """
+
+    def __init__(self, latency='fixed:0.5', error_rate=0.0, echo_rate=0.0, token_seconds=0.02,
+                 answer_sentences=3, seed=None):
+        self.latency = LatencyModel(latency, seed)
+        self.error_rate = error_rate
+        self.echo_rate = echo_rate
+        self.token_seconds = token_seconds
+        self.answer_sentences = answer_sentences
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'streams': 0, 'errors': 0, 'echoes': 0,
+                      'tokens_sent': 0, 'streams_closed_early': 0}
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def roll(self, rate):
+        with self._lock:
+            return self._random.random() < rate
+
+    def answer(self, prompt, max_new_tokens, stop_sequences=()):
+        """
+        Tokens for a prompt: the generated text (cut by max_new_tokens and the stop sequences),
+        optionally preceded by an echo of the prompt.
+        """
+        with self._lock:
+            sentences = self._random.sample(ANSWER_SENTENCES, min(self.answer_sentences, len(ANSWER_SENTENCES)))
+        generated = split_tokens(f"{ANSWER_PREFIX} " + ' '.join(sentences))
+        if max_new_tokens:
+            generated = generated[:max_new_tokens]
+        generated = apply_stop_sequences(generated, stop_sequences)
+        if self.roll(self.echo_rate):
+            self.count('echoes')
+            # Like a real server, limits and stop sequences only apply to the generated part
+            return split_tokens(prompt + ' ') + generated
+        return generated
+
+
+def split_tokens(text):
+    """
+    Word-sized tokens, each keeping its trailing space.
+    """
+    words = text.split(' ')
+    return [word + ' ' for word in words[:-1]] + ([words[-1]] if words[-1] else [])
+
+
+def apply_stop_sequences(tokens, stop_sequences):
+    """
+    Cut the token list after the first stop sequence, like a real TGI server.
+    """
+    text = ''
+    for index, token in enumerate(tokens):
+        text += token
+        if any(stop and stop in text for stop in stop_sequences):
+            return tokens[:index + 1]
+    return tokens
+
+
+class MockInferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, behaviour, port=0):
+        super().__init__(('127.0.0.1', port), MockInferenceHandler)
+        self.behaviour = behaviour
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='mock-inference', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class MockInferenceHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0: every response ends by closing the connection, which also delimits streams
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        behaviour = self.server.behaviour
+        behaviour.count('requests')
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json({'error': 'Invalid JSON'}, status=400)
+            return
+
+        parameters = request.get('parameters') or {}
+        stop_sequences = parameters.get('stop') or parameters.get('stop_sequences') or []
+        time.sleep(behaviour.latency.sample())
+
+        if behaviour.roll(behaviour.error_rate):
+            behaviour.count('errors')
+            self._send_json({'error': 'Model is overloaded', 'error_type': 'overloaded'}, status=503)
+            return
+
+        tokens = behaviour.answer(request.get('inputs', ''), parameters.get('max_new_tokens'), stop_sequences)
+        if request.get('stream'):
+            self._stream(tokens)
+        else:
+            behaviour.count('tokens_sent', len(tokens))
+            self._send_json([{'generated_text': ''.join(tokens)}])
+
+    def _stream(self, tokens):
+        behaviour = self.server.behaviour
+        behaviour.count('streams')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        try:
+            for index, token in enumerate(tokens):
+                last = index == len(tokens) - 1
+                event = {
+                    'index': index + 1,
+                    'token': {'id': index, 'text': token, 'logprob': -0.1, 'special': False},
+                    'generated_text': ''.join(tokens) if last else None,
+                    'details': None,
+                }
+                self.wfile.write(b'data:' + json.dumps(event).encode('utf-8') + b'\n\n')
+                self.wfile.flush()
+                behaviour.count('tokens_sent')
+                if not last:
+                    time.sleep(behaviour.token_seconds)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up early (e.g. it reached its length limit)
+            behaviour.count('streams_closed_early')
+
+
+def add_behaviour_arguments(parser):
+    parser.add_argument('--latency', default='fixed:0.5',
+                        help="time to first token: fixed:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument('--echo-rate', type=float, default=0.0, help="share of answers that repeat the prompt first")
+    parser.add_argument('--token-ms', type=float, default=20.0, help="delay between streamed tokens")
+    parser.add_argument('--sentences', type=int, default=3, help="sentences per answer")
+    parser.add_argument('--seed', type=int)
+
+
+def behaviour_from_args(args):
+    return MockBehaviour(args.latency, args.error_rate, args.echo_rate, args.token_ms / 1000.0,
+                         args.sentences, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock text-generation endpoint for offline tests")
+    parser.add_argument('--port', type=int, default=8766)
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockInferenceServer(behaviour_from_args(args), args.port)
+    print(f"Mock inference endpoint listening on {server.url} (set HF_BASE_URL to this URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        print(f"Mock inference stats: {server.behaviour.stats}")
+
+
+if __name__ == "__main__":
+    main()
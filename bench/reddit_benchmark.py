@@ -0,0 +1,166 @@
+"""
+End-to-end throughput benchmark of the bot against the fake Reddit API.
+Runs the real scan cycle (staged pipeline or inline path) with PRAW pointed
+at bench.fake_reddit, injecting a batch of comments before every cycle, and
+reports comments scanned/s, candidates/s, API calls per comment and
+comment-to-reply latency.
+
+    python -m bench.reddit_benchmark --cycles 5 --comments-per-cycle 500 --latency-ms 20
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bot loop against a local fake Reddit API")
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--comments-per-cycle', type=int, default=500)
+    parser.add_argument('--keyword-ratio', type=float, default=0.2,
+                        help="share of synthetic comments containing target keywords")
+    parser.add_argument('--stream', help="JSONL file of recorded comment data, split evenly over the cycles")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="added latency per API request")
+    parser.add_argument('--ratelimit', type=int, default=1000, help="requests allowed per 600 s window")
+    parser.add_argument('--max-replies', type=int, default=1000, help="MAX_COMMENTS_PER_SESSION for the run")
+    parser.add_argument('--reply-delay', type=int, default=0, help="seconds between replies")
+    parser.add_argument('--requests-per-minute', type=int,
+                        help="override API_RATE_LIMIT['REQUESTS_PER_MINUTE'] (defaults to the configured pace)")
+    parser.add_argument('--inline', action='store_true', help="use the inline path instead of the staged pipeline")
+    parser.add_argument('--dedup', action='store_true',
+                        help="keep the duplicate-reply check on (synthetic comments soon exhaust the template pools)")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def configure(args, work_dir):
+    """
+    Point the bot's settings at a scratch directory and the benchmark parameters.
+    Must run before reddit_bot is imported.
+    """
+    os.environ['MAX_COMMENTS_PER_SESSION'] = str(args.max_replies)
+    os.environ.pop('HF_TOKEN', None)
+    sys.path.insert(0, REPO_DIR)
+
+    import advanced_config
+    advanced_config.CONTEXT_SETTINGS['DIRECTORY'] = os.path.join(REPO_DIR, 'context')
+    advanced_config.ACTIVITY_SCHEDULE['ACTIVE_HOURS'] = list(range(24))
+    advanced_config.ACTIVITY_SCHEDULE['ACTIVE_DAYS'] = list(range(7))
+    advanced_config.ACTIVITY_SCHEDULE['MIN_RESPONSE_DELAY'] = args.reply_delay
+    advanced_config.ACTIVITY_SCHEDULE['MAX_RESPONSE_DELAY'] = args.reply_delay
+    advanced_config.PIPELINE_SETTINGS['ENABLED'] = not args.inline
+    advanced_config.REPLY_DEDUP['ENABLED'] = args.dedup
+    if args.requests_per_minute:
+        advanced_config.API_RATE_LIMIT['REQUESTS_PER_MINUTE'] = args.requests_per_minute
+    # History, cursors and caches go to the scratch directory (all relative paths)
+    os.chdir(work_dir)
+
+
+def make_reddit(server_url):
+    import praw
+    return praw.Reddit(
+        client_id='bench',
+        client_secret='bench',
+        username='bench_bot',
+        password='bench',
+        user_agent='TravelBot benchmark',
+        oauth_url=server_url,
+        reddit_url=server_url,
+        check_for_updates=False,
+    )
+
+
+def run(args):
+    import metrics
+    from generation_service import percentile
+    from bench.fake_reddit import CommentStream, FakeRedditServer, RateLimitWindow
+    import reddit_bot as bot
+    from config import TARGET_SUBREDDITS
+
+    stream = CommentStream(TARGET_SUBREDDITS, args.keyword_ratio, seed=args.seed)
+    recorded = stream.load(args.stream) if args.stream else None
+    server = FakeRedditServer(stream, latency=args.latency_ms / 1000.0,
+                              ratelimit=RateLimitWindow(args.ratelimit)).start()
+
+    reddit = make_reddit(server.url)
+    store = bot.get_saved_comments()
+    comment_pipeline = None
+    if not args.inline:
+        from pipeline import CommentPipeline
+        comment_pipeline = CommentPipeline(reddit, store)
+
+    cycle_seconds = []
+    try:
+        for cycle in range(args.cycles):
+            if recorded is not None:
+                share = -(-len(recorded) // args.cycles)
+                for data in recorded[cycle * share:(cycle + 1) * share]:
+                    stream.add(data)
+            else:
+                stream.inject(args.comments_per_cycle)
+
+            started = time.monotonic()
+            if comment_pipeline is not None:
+                comment_pipeline.run_cycle()
+            else:
+                bot.run_cycle(reddit, store)
+            cycle_seconds.append(time.monotonic() - started)
+    finally:
+        if comment_pipeline is not None:
+            comment_pipeline.close()
+        else:
+            store.close()
+        server.stop()
+
+    elapsed = sum(cycle_seconds)
+    # Whichever path ran, qualify_comment counts what the bot evaluated
+    counters = {'scanned': metrics.COMMENTS_SCANNED.total(), 'candidates': metrics.CANDIDATES.total()}
+    api_calls = sum(count for endpoint, count in server.calls.items() if endpoint != 'access_token')
+    latencies = sorted(replied - stream.injected_at[comment_id]
+                       for comment_id, replied in stream.replies.items() if comment_id in stream.injected_at)
+    return {
+        'mode': 'inline' if args.inline else 'pipeline',
+        'cycles': args.cycles,
+        'seconds': elapsed,
+        'comments_scanned': counters['scanned'],
+        'candidates': counters['candidates'],
+        'replies': len(stream.replies),
+        'scanned_per_second': counters['scanned'] / elapsed if elapsed else 0.0,
+        'candidates_per_second': counters['candidates'] / elapsed if elapsed else 0.0,
+        'api_calls': dict(server.calls),
+        'api_calls_per_comment': api_calls / counters['scanned'] if counters['scanned'] else 0.0,
+        'reply_latency_p50': percentile(latencies, 0.50),
+        'reply_latency_p95': percentile(latencies, 0.95),
+        'reply_latency_p99': percentile(latencies, 0.99),
+        'cycle_seconds': cycle_seconds,
+    }
+
+
+def print_report(results):
+    print(f"\nBenchmark ({results['mode']}, {results['cycles']} cycles, {results['seconds']:.2f}s)")
+    print(f"  comments scanned:    {results['comments_scanned']} ({results['scanned_per_second']:.1f}/s)")
+    print(f"  candidates:          {results['candidates']} ({results['candidates_per_second']:.1f}/s)")
+    print(f"  replies:             {results['replies']}")
+    print(f"  API calls:           {results['api_calls']} ({results['api_calls_per_comment']:.3f} per comment)")
+    if results['reply_latency_p50'] is not None:
+        print(f"  comment -> reply:    p50 {results['reply_latency_p50']:.3f}s, "
+              f"p95 {results['reply_latency_p95']:.3f}s, p99 {results['reply_latency_p99']:.3f}s")
+    print(f"  cycle seconds:       {', '.join(f'{seconds:.2f}' for seconds in results['cycle_seconds'])}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='reddit-bench-') as work_dir:
+        configure(args, work_dir)
+        results = run(args)
+        os.chdir(REPO_DIR)
+    print_report(results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
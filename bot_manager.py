@@ -295,14 +295,21 @@ def update_variable(content, var_name, new_value, comment):
 
 def view_logs():
     """View recent log entries"""
+    # Only the end of the log is read, however long the history is
+    from activity_log import ActivityLog, format_entry, tail_lines
+    activity_log = ActivityLog()
+    if activity_log.segments:
+        print(f"\nRecent log entries from {activity_log.directory}/:")
+        for entry in activity_log.tail(10):
+            print(format_entry(entry))
+        return
+
     log_file = "comments_replied_to.txt"
     if os.path.exists(log_file):
         print(f"\nRecent log entries from {log_file}:")
-        with open(log_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            # Show last 10 entries
-            for line in lines[-10:]:
-                print(line.strip())
+        # Show last 10 entries
+        for line in tail_lines(log_file, 10):
+            print(line.strip())
     else:
         print(f"\nLog file {log_file} not found")
 
@@ -349,6 +356,8 @@ def manage_context():
     else:
         print("Context directory not found.")
 
+    print("A running bot picks up new and edited context files at the start of its next cycle.")
+
     print("\nOptions:")
     print("1. View a context file")
     print("2. Create a new context file")
@@ -369,6 +378,14 @@ def manage_context():
         print("Invalid choice")
 
 
+def write_context_file(file_path, content):
+    """Write a context file atomically so a running bot never reads a half-written file"""
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, file_path)
+
+
 def view_context_file():
     """View the contents of a context file"""
     import os
@@ -423,10 +440,10 @@ def create_context_file():
 
     content = '\n'.join(lines)
 
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    write_context_file(file_path, content)
 
     print(f"Context file {filename} created successfully!")
+    print("Name a file <subreddit>_context.md to use it for that subreddit automatically.")
 
 
 def edit_context_file():
@@ -464,8 +481,7 @@ def edit_context_file():
 
                 new_content = '\n'.join(lines)
 
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
+                write_context_file(file_path, new_content)
 
                 print(f"Context file {files[file_choice]} updated successfully!")
             else:
@@ -505,10 +521,14 @@ def main_menu():
         elif choice == "6":
             manage_context()
         elif choice == "7":
-            print("Starting the bot...")
-            import reddit_bot
-            # Note: This won't actually start the bot in a loop here
-            # It's just for demonstration purposes
+            print("Starting the bot... (Ctrl+C to stop)")
+            # Run it as its own process, so this menu never loads PRAW or the Hugging Face stack
+            import subprocess
+            import sys
+            try:
+                subprocess.run([sys.executable, "reddit_bot.py"])
+            except KeyboardInterrupt:
+                pass
         elif choice == "8":
             print("Goodbye!")
             break
@@ -0,0 +1,177 @@
+"""
+Lean comment ingestion for the travel engagement bot.
+Comment listings are fetched as plain JSON and turned into small slotted
+CommentRecord snapshots. Full PRAW objects are only created for comments
+the bot actually replies to.
+"""
+
+import logging
+
+from request_scheduler import get_request_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Reddit returns at most 100 items per listing page
+MAX_PAGE_SIZE = 100
+
+
+class CommentRecord:
+    """
+    Minimal, immutable-by-convention snapshot of a Reddit comment.
+    """
+
+    __slots__ = ('id', 'name', 'link_id', 'post_id', 'author', 'subreddit',
+                 'created_utc', 'body', 'body_lower')
+
+    def __init__(self, comment_id, link_id, author, subreddit, created_utc, body):
+        self.id = comment_id
+        self.name = 't1_' + comment_id
+        self.link_id = link_id
+        self.post_id = link_id[3:] if link_id.startswith('t3_') else link_id
+        self.author = author
+        self.subreddit = subreddit
+        self.created_utc = created_utc
+        self.body = body
+        self.body_lower = body.lower()
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Build a record from the `data` dict of a `t1` listing child.
+        """
+        return cls(
+            data['id'],
+            data.get('link_id') or '',
+            data.get('author'),
+            data.get('subreddit') or '',
+            float(data.get('created_utc') or 0),
+            data.get('body') or '',
+        )
+
+    @classmethod
+    def from_praw(cls, comment):
+        """
+        Build a record from a PRAW Comment that came from a listing (no extra requests).
+        """
+        author = comment.author
+        return cls(
+            comment.id,
+            comment.link_id,
+            author.name if author else None,
+            comment.subreddit.display_name,
+            float(comment.created_utc),
+            comment.body,
+        )
+
+    def to_praw(self, reddit_instance):
+        """
+        Lazy PRAW Comment for replying; constructing it does not hit the API.
+        """
+        return reddit_instance.comment(id=self.id)
+
+    def __repr__(self):
+        return f"CommentRecord(id={self.id!r}, subreddit={self.subreddit!r}, author={self.author!r})"
+
+
+def parse_comment_listing(listing):
+    """
+    Turn a decoded listing response into (records, after, before).
+    """
+    data = listing.get('data') or {}
+    records = [CommentRecord.from_json(child['data'])
+               for child in data.get('children', ())
+               if child.get('kind') == 't1']
+    return records, data.get('after'), data.get('before')
+
+
+def fetch_comment_page(reddit_instance, subreddit_path, limit=MAX_PAGE_SIZE, after=None, before=None):
+    """
+    Fetch one page of the newest comments for a subreddit (or `a+b` multireddit path)
+    without building PRAW model objects. Returns (records, after, before).
+    """
+    params = {'limit': min(limit, MAX_PAGE_SIZE), 'raw_json': 1}
+    if after:
+        params['after'] = after
+    if before:
+        params['before'] = before
+    listing = get_request_scheduler().call(reddit_instance.request, method='GET', path=f'r/{subreddit_path}/comments/',
+                                           params=params, reason='listing', reddit_instance=reddit_instance)
+    return parse_comment_listing(listing)
+
+
+def iter_comment_records(reddit_instance, subreddit_path, limit):
+    """
+    Yield up to `limit` newest comments as CommentRecords, paging as needed.
+    """
+    after = None
+    remaining = limit
+    while remaining > 0:
+        records, after, _ = fetch_comment_page(reddit_instance, subreddit_path, remaining, after=after)
+        yield from records[:remaining]
+        remaining -= len(records)
+        if not after or not records:
+            break
+
+
+def iter_praw_comment_records(reddit_instance, subreddit_path, limit):
+    """
+    Yield comments through the regular PRAW listing, converted to CommentRecords.
+    """
+    scheduler = get_request_scheduler()
+    listing = reddit_instance.subreddit(subreddit_path).comments(limit=limit)
+    index = 0
+    while True:
+        if index % MAX_PAGE_SIZE == 0:
+            # PRAW fetches the next page inside next(), so that step goes through the scheduler:
+            # it is paced before the request and retried like a raw-mode page fetch
+            comment = scheduler.call(next, listing, None, reason='listing', reddit_instance=reddit_instance)
+        else:
+            comment = next(listing, None)
+        if comment is None:
+            return
+        yield CommentRecord.from_praw(comment)
+        index += 1
+
+
+def chunk_subreddits(subreddit_names, max_length):
+    """
+    Group subreddit names into `a+b+c` multireddit paths no longer than `max_length` characters.
+    Returns a list of name lists, one per combined listing.
+    """
+    chunks = []
+    current = []
+    current_length = 0
+    for name in subreddit_names:
+        added = len(name) + (1 if current else 0)
+        if current and current_length + added > max_length:
+            chunks.append(current)
+            current, current_length, added = [], 0, len(name)
+        current.append(name)
+        current_length += added
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# Bot identity, resolved once per session instead of once per comment
+
+_bot_username = None
+
+
+def get_bot_username(reddit_instance):
+    """
+    Lowercased username of the logged-in bot account (cached after the first call).
+    """
+    global _bot_username
+    if _bot_username is None:
+        me = get_request_scheduler().call(reddit_instance.user.me, reason='identity', reddit_instance=reddit_instance)
+        _bot_username = me.name.lower()
+    return _bot_username
+
+
+def reset_bot_identity():
+    """
+    Forget the cached identity, e.g. after logging in again.
+    """
+    global _bot_username
+    _bot_username = None
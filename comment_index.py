@@ -0,0 +1,273 @@
+"""
+Compact replied-comment index for the travel engagement bot.
+Comment IDs are decoded from base36 to 64-bit integers and kept in a sorted,
+fixed-width file that is memory-mapped instead of loaded as Python strings.
+New IDs live in a small in-memory delta and a Bloom filter answers most
+"never seen" lookups without touching the index at all.
+"""
+
+import os
+import sys
+import math
+import mmap
+import struct
+import bisect
+import heapq
+import logging
+from array import array
+
+from advanced_config import HISTORY_STORE
+from reply_store import ReplyStore, parse_history_line
+
+logger = logging.getLogger(__name__)
+
+# Header: magic, version, entry count, history file inode, history bytes covered.
+# Entries follow as native-endian unsigned 64-bit integers.
+INDEX_MAGIC = b'CIDX'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<4sIQQQ')
+
+MASK64 = (1 << 64) - 1
+
+
+def encode_comment_id(comment_id):
+    """
+    Decode a base36 Reddit comment ID into an integer, or None if it doesn't fit in 64 bits.
+    """
+    try:
+        value = int(comment_id, 36)
+    except ValueError:
+        return None
+    return value if value <= MASK64 else None
+
+
+def decode_comment_id(value):
+    """
+    Turn an integer back into its base36 comment ID.
+    """
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    if value == 0:
+        return '0'
+    chars = []
+    while value:
+        value, rem = divmod(value, 36)
+        chars.append(digits[rem])
+    return ''.join(reversed(chars))
+
+
+def _mix64(value):
+    # splitmix64 finalizer, spreads sequential IDs across the filter
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+class BloomFilter:
+    """
+    Bit-array Bloom filter over 64-bit integers using double hashing.
+    """
+
+    def __init__(self, capacity, false_positive_rate):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.num_bits = max(64, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        h = _mix64(value)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    def expected_false_positive_rate(self):
+        """
+        Theoretical false positive rate for the current fill level.
+        """
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class CompactReplyIndex(ReplyStore):
+    """
+    Drop-in replacement for ReplyStore that keeps replied IDs as integers.
+
+    The history text file stays the source of truth; the index file records how
+    many bytes of it are already covered, so startup only replays lines appended
+    since the last merge. If the history file was replaced (for example by
+    compaction) the index is rebuilt from scratch.
+    """
+
+    def __init__(self, file_path=None, index_path=None, merge_threshold=None,
+                 false_positive_rate=None, **kwargs):
+        self.index_path = index_path or HISTORY_STORE['INDEX_FILE']
+        self.merge_threshold = merge_threshold or HISTORY_STORE['INDEX_MERGE_THRESHOLD']
+        self.false_positive_rate = false_positive_rate or HISTORY_STORE['BLOOM_FALSE_POSITIVE_RATE']
+
+        self._mmap = None
+        self._sorted = ()
+        self._delta = set()
+        self._bloom = None
+        self._lookups = 0
+        self._hits = 0
+        self._false_positives = 0
+        super().__init__(file_path=file_path, **kwargs)
+
+    # Loading
+
+    def _history_identity(self):
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return 0, 0
+        return st.st_ino, st.st_size
+
+    def _load(self):
+        inode, size = self._history_identity()
+        covered = self._open_index(inode, size)
+
+        # History lines are at least ~16 bytes, which bounds how many IDs the replay can add
+        capacity = len(self._sorted) + max(size - covered, 0) // 16
+        self._bloom = BloomFilter(max(capacity * 2, self.merge_threshold * 4), self.false_positive_rate)
+        for value in self._sorted:
+            self._bloom.add(value)
+
+        # Replay history lines that were appended after the last merge
+        if size > covered:
+            with open(self.file_path, 'rb') as f:
+                f.seek(covered)
+                for raw in f:
+                    comment_id = parse_history_line(raw.decode('utf-8', errors='replace'))
+                    if comment_id:
+                        self._remember(comment_id)
+
+        if self._delta:
+            self._merge()
+        self._lookups = self._hits = self._false_positives = 0
+
+    def _open_index(self, inode, size):
+        """
+        Map the index file if it matches the current history file.
+        Returns the number of history bytes it already covers.
+        """
+        if not os.path.isfile(self.index_path):
+            return 0
+        with open(self.index_path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+            if len(header) < INDEX_HEADER.size:
+                return 0
+            magic, version, count, index_inode, covered = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or index_inode != inode or covered > size:
+                logger.info("Reply index is stale, rebuilding from history file.")
+                return 0
+            if count:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._sorted = memoryview(self._mmap)[INDEX_HEADER.size:INDEX_HEADER.size + count * 8].cast('Q')
+        return covered
+
+    # Membership
+
+    def _remember(self, comment_id):
+        value = encode_comment_id(comment_id)
+        if value is None or self._has_value(value):
+            return
+        self._delta.add(value)
+        self._bloom.add(value)
+
+    def _has_value(self, value):
+        self._lookups += 1
+        if value not in self._bloom:
+            return False
+        if value in self._delta:
+            self._hits += 1
+            return True
+        i = bisect.bisect_left(self._sorted, value)
+        if i < len(self._sorted) and self._sorted[i] == value:
+            self._hits += 1
+            return True
+        self._false_positives += 1
+        return False
+
+    def _has(self, comment_id):
+        value = encode_comment_id(comment_id)
+        return value is not None and self._has_value(value)
+
+    def __len__(self):
+        return len(self._sorted) + len(self._delta)
+
+    # Persistence
+
+    def flush(self, sync=False):
+        super().flush(sync=sync)
+        if len(self._delta) >= self.merge_threshold:
+            self._merge()
+
+    def close(self):
+        super().close()
+        if self._delta:
+            self._merge()
+        self._release_mmap()
+
+    def _release_mmap(self):
+        if isinstance(self._sorted, memoryview):
+            self._sorted.release()
+        self._sorted = ()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _merge(self):
+        """
+        Fold the in-memory delta into a new sorted index file and remap it.
+        Only called once the history file is flushed, so the covered offset is exact.
+        """
+        # Linear merge of the mapped (sorted) entries with the sorted delta
+        merged = array('Q', heapq.merge(self._sorted, sorted(self._delta)))
+        inode, size = self._history_identity()
+
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(merged), inode, size))
+            merged.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._release_mmap()
+        os.replace(tmp_path, self.index_path)
+        self._delta = set()
+        self._open_index(inode, size)
+        if len(self._sorted) > self._bloom.capacity:
+            # Resize the filter once it fills past its design capacity
+            self._bloom = BloomFilter(len(self._sorted) * 2, self.false_positive_rate)
+            for value in self._sorted:
+                self._bloom.add(value)
+
+    # Reporting
+
+    def stats(self):
+        """
+        Memory footprint and Bloom filter accuracy of the index.
+        """
+        negatives = self._lookups - self._hits
+        observed = self._false_positives / negatives if negatives else 0.0
+        return {
+            'backend': 'index',
+            'entries': len(self),
+            'mapped_index_bytes': len(self._sorted) * 8,
+            'delta_entries': len(self._delta),
+            'delta_bytes': sys.getsizeof(self._delta) + 32 * len(self._delta),
+            'bloom_bytes': len(self._bloom.bits),
+            'bloom_hashes': self._bloom.num_hashes,
+            'expected_false_positive_rate': self._bloom.expected_false_positive_rate(),
+            'observed_false_positive_rate': observed,
+            'lookups': self._lookups,
+        }
@@ -0,0 +1,131 @@
+"""
+Registry of the markdown context files used when generating responses.
+Files in the context directory are read once and kept in memory; a file is
+only read again when its modification time changes, so edits made with
+bot_manager.py are picked up by a running bot without a restart.
+"""
+
+import os
+import logging
+import threading
+
+from advanced_config import CONTEXT_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_SUFFIX = '_context.md'
+
+
+class ContextRegistry:
+    """
+    Case-insensitive subreddit -> context text lookup backed by `context/*.md`.
+
+    A subreddit uses the file configured in SUBREDDIT_CONTEXTS, otherwise
+    `<subreddit>_context.md` if it exists, otherwise the default file.
+    """
+
+    def __init__(self, context_dir=None, subreddit_contexts=None, default_file=None):
+        self.context_dir = context_dir or CONTEXT_SETTINGS['DIRECTORY']
+        self.default_file = (default_file or CONTEXT_SETTINGS['DEFAULT_FILE']).lower()
+        contexts = subreddit_contexts if subreddit_contexts is not None else CONTEXT_SETTINGS['SUBREDDIT_CONTEXTS']
+        self.subreddit_contexts = {name.lower(): file_name.lower() for name, file_name in contexts.items()}
+
+        self._lock = threading.Lock()
+        # lowercased file name -> (mtime_ns, text)
+        self._files = {}
+        self._reloads = 0
+        # Bumped whenever a file is added, changed or removed (lets indexes over the files rebuild)
+        self.version = 0
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-scan the context directory, reading only new or modified files.
+        Returns the names of the files that were (re)loaded.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.context_dir)
+                       if entry.is_file() and entry.name.lower().endswith('.md')]
+        except FileNotFoundError:
+            entries = []
+
+        loaded = []
+        seen = set()
+        for entry in entries:
+            key = entry.name.lower()
+            seen.add(key)
+            mtime = entry.stat().st_mtime_ns
+            cached = self._files.get(key)
+            if cached is not None and cached[0] == mtime:
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except OSError as e:
+                logger.warning(f"Could not read context file {entry.path}: {e}")
+                continue
+            with self._lock:
+                self._files[key] = (mtime, text)
+                self._reloads += 1
+            loaded.append(entry.name)
+
+        with self._lock:
+            removed = set(self._files) - seen
+            for key in removed:
+                del self._files[key]
+            if loaded or removed:
+                self.version += 1
+        if loaded:
+            logger.info(f"Loaded context files: {', '.join(sorted(loaded))}")
+        return loaded
+
+    def file_for(self, subreddit_name):
+        """
+        Lowercased name of the context file used for a subreddit.
+        """
+        name = (subreddit_name or '').lower()
+        configured = self.subreddit_contexts.get(name)
+        if configured in self._files:
+            return configured
+        if name + CONTEXT_SUFFIX in self._files:
+            return name + CONTEXT_SUFFIX
+        return self.default_file
+
+    def get(self, subreddit_name):
+        """
+        Context text for a subreddit ("" if neither its file nor the default exists).
+        """
+        with self._lock:
+            entry = self._files.get(self.file_for(subreddit_name))
+        return entry[1] if entry else ""
+
+    def files(self):
+        """
+        Snapshot of lowercased file name -> text for every loaded context file.
+        """
+        with self._lock:
+            return {key: text for key, (_, text) in self._files.items()}
+
+    def stats(self):
+        with self._lock:
+            return {'files': len(self._files), 'reloads': self._reloads, 'version': self.version}
+
+
+_context_registry = None
+
+
+def get_context_registry():
+    """
+    Shared registry, loaded on first use.
+    """
+    global _context_registry
+    if _context_registry is None:
+        _context_registry = ContextRegistry()
+    return _context_registry
+
+
+def refresh_context_registry():
+    """
+    Pick up context files created or edited since the last check.
+    """
+    return get_context_registry().refresh()
@@ -0,0 +1,190 @@
+"""
+BM25 passage retrieval over the context files.
+Instead of pasting a whole context file into every prompt, the paragraphs of
+all context files are indexed and each prompt gets only the passages that
+best match the comment, within a token budget.
+"""
+
+import re
+import math
+import logging
+import threading
+
+from advanced_config import CONTEXT_RETRIEVAL
+from context_registry import get_context_registry
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Words too common to say anything about relevance
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i if in into is it its me my of on or our so that the their them
+they this to was we were what when where which who will with you your can do does any how
+""".split())
+
+
+def tokenize(text):
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in STOPWORDS and len(word) > 1]
+
+
+def estimate_tokens(text):
+    """
+    Rough model-token count (about four characters per token for English text).
+    """
+    return math.ceil(len(text) / 4)
+
+
+def split_passages(text):
+    """
+    Split markdown into paragraphs. Headings are kept as a prefix of the paragraphs below them.
+    """
+    passages = []
+    heading = ''
+    for block in re.split(r'\n\s*\n', text):
+        block = block.strip()
+        if not block:
+            continue
+        lines = block.splitlines()
+        # A heading on its own (or at the top of a block) labels what follows
+        while lines and lines[0].lstrip().startswith('#'):
+            heading = lines.pop(0).lstrip('# ').strip()
+        if lines:
+            body = '\n'.join(lines)
+            passages.append(f"{heading}:\n{body}" if heading else body)
+    return passages
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of passages.
+    """
+
+    def __init__(self, passages, k1=None, b=None):
+        self.k1 = k1 if k1 is not None else CONTEXT_RETRIEVAL['K1']
+        self.b = b if b is not None else CONTEXT_RETRIEVAL['B']
+        self.passages = passages
+        self._term_counts = []
+        self._lengths = []
+        document_frequency = {}
+        for passage in passages:
+            counts = {}
+            for term in tokenize(passage):
+                counts[term] = counts.get(term, 0) + 1
+            self._term_counts.append(counts)
+            self._lengths.append(sum(counts.values()))
+            for term in counts:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        total = len(passages)
+        self._average_length = sum(self._lengths) / total if total else 0.0
+        self._idf = {term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+                     for term, frequency in document_frequency.items()}
+
+    def search(self, query, top_k):
+        """
+        Indices of the `top_k` best-matching passages with their scores, best first (zero scores dropped).
+        """
+        query_terms = set(tokenize(query)) & self._idf.keys()
+        if not query_terms:
+            return []
+        scores = []
+        for index, counts in enumerate(self._term_counts):
+            length_norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / (self._average_length or 1))
+            score = 0.0
+            for term in query_terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self._idf[term] * frequency * (self.k1 + 1) / (frequency + length_norm)
+            if score > 0:
+                scores.append((score, index))
+        scores.sort(reverse=True)
+        return [(index, score) for score, index in scores[:top_k]]
+
+
+class ContextRetriever:
+    """
+    Picks the context passages for a comment, rebuilding the index when context files change.
+    """
+
+    def __init__(self, registry=None, top_k=None, token_budget=None):
+        self.registry = registry or get_context_registry()
+        self.top_k = top_k or CONTEXT_RETRIEVAL['TOP_K']
+        self.token_budget = token_budget or CONTEXT_RETRIEVAL['TOKEN_BUDGET']
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = None
+        self._sources = []
+        self._requests = 0
+        self._full_tokens = 0
+        self._used_tokens = 0
+
+    def _current_index(self):
+        with self._lock:
+            if self._version != self.registry.version:
+                passages, sources = [], []
+                for file_name, text in self.registry.files().items():
+                    for passage in split_passages(text):
+                        passages.append(passage)
+                        sources.append(file_name)
+                self._index = BM25Index(passages)
+                self._sources = sources
+                self._version = self.registry.version
+                logger.info(f"Indexed {len(passages)} context passages from {len(set(sources))} files")
+            return self._index, self._sources
+
+    def retrieve(self, subreddit_name, comment_text):
+        """
+        Context for a prompt: the best-matching passages in ranked order, within the token budget.
+        Falls back to the start of the subreddit's own context file when nothing matches.
+        """
+        index, sources = self._current_index()
+        own_file = self.registry.file_for(subreddit_name)
+        full_context = self.registry.get(subreddit_name)
+
+        ranked = [position for position, _ in index.search(comment_text, self.top_k)]
+        if not ranked:
+            ranked = [position for position, source in enumerate(sources) if source == own_file][:self.top_k]
+
+        # Never send more than the whole file would have cost
+        full_tokens = estimate_tokens(full_context)
+        budget = min(self.token_budget, full_tokens) if full_tokens else self.token_budget
+        selected, used = [], 0
+        for position in ranked:
+            cost = estimate_tokens(index.passages[position])
+            if used + cost > budget:
+                continue
+            selected.append(index.passages[position])
+            used += cost
+        context = '\n\n'.join(selected)
+        used_tokens = estimate_tokens(context)
+        with self._lock:
+            self._requests += 1
+            self._full_tokens += full_tokens
+            self._used_tokens += used_tokens
+        saved = 1 - used_tokens / full_tokens if full_tokens else 0.0
+        logger.info(f"Context for r/{subreddit_name}: {len(selected)} passages, ~{used_tokens} tokens "
+                    f"instead of ~{full_tokens} ({saved:.0%} smaller)")
+        return context
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'full_context_tokens': self._full_tokens,
+                'retrieved_tokens': self._used_tokens,
+                'saved_ratio': 1 - self._used_tokens / self._full_tokens if self._full_tokens else 0.0,
+            }
+
+
+_context_retriever = None
+
+
+def get_context_retriever():
+    """
+    Shared retriever over the shared context registry.
+    """
+    global _context_retriever
+    if _context_retriever is None:
+        _context_retriever = ContextRetriever()
+    return _context_retriever
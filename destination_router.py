@@ -0,0 +1,165 @@
+"""
+Data-driven destination routing for the template fallback responses.
+Destinations, their aliases and response pools are loaded from a JSON data
+file (destinations.json) and compiled into a single keyword index, so the
+best destination for a comment is found in one pass whatever the number of
+destinations.
+"""
+
+import os
+import json
+import random
+import logging
+
+from keyword_matcher import KeywordMatcher
+from advanced_config import DESTINATION_ROUTING
+
+logger = logging.getLogger(__name__)
+
+# Roles a term can play for a destination
+ALIAS = 0        # matching the term alone selects the destination
+QUALIFIED = 1    # the term selects the destination only together with one of its qualifiers
+QUALIFIER = 2
+
+
+class DestinationRouter:
+    """
+    Routes comments to destination response pools.
+
+    `destinations` is a list of dicts, in priority order (the first matching
+    destination wins), with the keys:
+      name               - identifier used in logs and the benchmark
+      aliases            - terms that select the destination on their own
+      qualified_aliases  - terms that need one of `qualifiers` in the same comment
+      qualifiers         - e.g. 'trip' for 'europe', so "european trip" routes but "europe" alone doesn't
+      responses          - the response pool
+    Terms are matched as lowercase substrings, like the other destination keywords.
+    """
+
+    def __init__(self, destinations):
+        self.names = []
+        self.responses = []
+        # term -> ((destination index, role), ...)
+        self._index = {}
+        for destination in destinations:
+            responses = [response for response in destination.get('responses', ()) if response]
+            if not responses:
+                logger.warning(f"Destination {destination.get('name')!r} has no responses; skipping it")
+                continue
+            position = len(self.names)
+            self.names.append(destination.get('name') or f"destination-{position}")
+            self.responses.append(responses)
+            for role, key in ((ALIAS, 'aliases'), (QUALIFIED, 'qualified_aliases'), (QUALIFIER, 'qualifiers')):
+                for term in destination.get(key, ()):
+                    term = term.strip().lower()
+                    if term:
+                        roles = self._index.setdefault(term, ())
+                        if (position, role) not in roles:
+                            self._index[term] = roles + ((position, role),)
+        self.terms = tuple(self._index)
+        self._matcher = None
+
+    @classmethod
+    def from_file(cls, file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['destinations'] if isinstance(data, dict) else data)
+
+    def __len__(self):
+        return len(self.names)
+
+    def scan(self, comment_text):
+        """
+        Destination terms found in `comment_text`.
+        """
+        if self._matcher is None:
+            self._matcher = KeywordMatcher({'destination': self.terms})
+        return self._matcher.scan(comment_text)['destination']
+
+    def route(self, comment_text=None, matched_terms=None):
+        """
+        Index of the best destination for a comment, or None.
+        `matched_terms` can carry destination terms already found by the shared keyword matcher;
+        the cost depends only on the terms matched, not on the number of destinations.
+        """
+        if matched_terms is None:
+            matched_terms = self.scan(comment_text)
+        best = None
+        qualified, qualifiers = set(), set()
+        for term in matched_terms:
+            for position, role in self._index.get(term, ()):
+                if best is not None and position >= best:
+                    continue
+                if role == ALIAS:
+                    best = position
+                elif role == QUALIFIED:
+                    qualified.add(position)
+                else:
+                    qualifiers.add(position)
+        for position in qualified & qualifiers:
+            if best is None or position < best:
+                best = position
+        return best
+
+    def name_of(self, position):
+        return None if position is None else self.names[position]
+
+    def choose_response(self, comment_text=None, matched_terms=None):
+        """
+        Random response from the best destination's pool, or None when no destination matches.
+        """
+        position = self.route(comment_text, matched_terms)
+        return None if position is None else random.choice(self.responses[position])
+
+
+def destinations_path():
+    path = DESTINATION_ROUTING['FILE']
+    # Relative paths point next to this module, where the shipped data file lives
+    return path if os.path.isabs(path) else os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+
+_router = None
+_router_mtime = None
+
+
+def _load_router():
+    global _router, _router_mtime
+    path = destinations_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    if _router is not None and mtime == _router_mtime:
+        return _router
+    try:
+        router = DestinationRouter.from_file(path)
+    except FileNotFoundError:
+        logger.warning(f"Destination file {path} not found; only generic fallback responses will be used.")
+        router = DestinationRouter([])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        if _router is not None:
+            logger.warning(f"Destination file {path} is invalid ({e}); keeping the previous destinations.")
+            _router_mtime = mtime
+            return _router
+        logger.warning(f"Destination file {path} is invalid ({e}); only generic fallback responses will be used.")
+        router = DestinationRouter([])
+    else:
+        logger.info(f"Loaded {len(router)} destinations ({len(router.terms)} terms) from {path}")
+    _router, _router_mtime = router, mtime
+    return router
+
+
+def get_destination_router():
+    """
+    Return the shared router, loading the destination file on first use.
+    """
+    return _router if _router is not None else _load_router()
+
+
+def refresh_destination_router():
+    """
+    Reload the destination file if it changed on disk. Called with the keyword matcher refresh, once per cycle.
+    """
+    if DESTINATION_ROUTING['RELOAD'] or _router is None:
+        return _load_router()
+    return _router
@@ -0,0 +1,222 @@
+"""
+Disk-backed LRU/TTL cache for Hugging Face generations.
+A comment that is evaluated again (after a failed reply, or after a restart
+before the reply landed) reuses the text generated the first time instead of
+paying for another inference call. Concurrent requests for the same key are
+collapsed into a single generation.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import metrics
+from advanced_config import GENERATION_CACHE
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_comment_text(comment_text):
+    """
+    Case- and whitespace-insensitive form of a comment used in cache keys.
+    """
+    return re.sub(r'\s+', ' ', comment_text or '').strip().lower()
+
+
+def make_cache_key(comment_text, subreddit_name, context, model, parameters):
+    """
+    Key covering everything that shapes a generation: comment, subreddit, context, model and sampling.
+    """
+    context_hash = hashlib.sha256((context or '').encode('utf-8')).hexdigest()
+    material = json.dumps([
+        normalize_comment_text(comment_text),
+        (subreddit_name or '').lower(),
+        context_hash,
+        model,
+        parameters,
+    ], sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """
+    LRU map of key -> generated text with a TTL, saved to a JSON file after each change.
+    """
+
+    def __init__(self, file_path=None, max_entries=None, ttl_seconds=None):
+        self.file_path = file_path or GENERATION_CACHE['FILE']
+        self.max_entries = max_entries or GENERATION_CACHE['MAX_ENTRIES']
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else GENERATION_CACHE['TTL_SECONDS']
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._async_in_flight = {}
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._coalesced = 0
+        self._load()
+
+    # Persistence
+
+    def _load(self):
+        if not os.path.isfile(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read generation cache from {self.file_path}: {e}. Starting empty.")
+            return
+        now = time.time()
+        # Saved oldest-used first, so insertion order restores the LRU order
+        for key, created_at, text in entries:
+            if now - created_at < self.ttl_seconds:
+                self._entries[key] = (created_at, text)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        entries = [[key, created_at, text] for key, (created_at, text) in self._entries.items()]
+        tmp_path = self.file_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            logger.warning(f"Could not save generation cache to {self.file_path}: {e}")
+
+    # Lookups
+
+    def get(self, key):
+        """
+        Cached text for `key`, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                metrics.GENERATION_CACHE_LOOKUPS.inc(result='miss')
+                return None
+            if time.time() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                self._expired += 1
+                self._misses += 1
+                metrics.GENERATION_CACHE_LOOKUPS.inc(result='expired')
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            metrics.GENERATION_CACHE_LOOKUPS.inc(result='hit')
+            return entry[1]
+
+    def put(self, key, text):
+        with self._lock:
+            self._entries[key] = (time.time(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            self._save()
+
+    def get_or_create(self, key, generate):
+        """
+        Return the cached text for `key`, or call `generate()` once and cache its result.
+        Threads asking for a key that is already being generated wait for that result.
+        `generate` may return None (e.g. on failure); None is returned but not cached.
+        """
+        text = self.get(key)
+        if text is not None:
+            return text
+
+        with self._lock:
+            pending = self._in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._in_flight[key] = {'done': threading.Event(), 'text': None}
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            pending['done'].wait()
+            return pending['text']
+
+        try:
+            pending['text'] = generate()
+            if pending['text'] is not None:
+                self.put(key, pending['text'])
+            return pending['text']
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            pending['done'].set()
+
+    async def get_or_create_async(self, key, generate):
+        """
+        Async counterpart of get_or_create(); `generate` is a coroutine function.
+        """
+        import asyncio
+        text = self.get(key)
+        if text is not None:
+            return text
+
+        pending = self._async_in_flight.get(key)
+        if pending is not None:
+            with self._lock:
+                self._coalesced += 1
+            return await asyncio.shield(pending)
+
+        pending = self._async_in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            text = await generate()
+            if text is not None:
+                # Saving writes the whole file; keep it off the event loop
+                await asyncio.to_thread(self.put, key, text)
+        except Exception as e:
+            pending.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting for it
+            pending.exception()
+            raise
+        except BaseException:
+            pending.cancel()
+            raise
+        else:
+            pending.set_result(text)
+            return text
+        finally:
+            del self._async_in_flight[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'coalesced': self._coalesced,
+            }
+
+
+_generation_cache = None
+
+
+def get_generation_cache():
+    """
+    Shared generation cache, loaded on first use.
+    """
+    global _generation_cache
+    if _generation_cache is None:
+        _generation_cache = GenerationCache()
+    return _generation_cache
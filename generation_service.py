@@ -0,0 +1,207 @@
+"""
+Thread-pool service for Hugging Face generations.
+Runs inference calls on a bounded pool, gives each request a deadline and
+tracks latency percentiles per model, so one hung request can no longer
+freeze the bot: callers fall back to the templates when the deadline passes.
+"""
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import metrics
+from advanced_config import GENERATION_SERVICE
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list (None when empty).
+    """
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class LatencyTracker:
+    """
+    Recent latencies per model (a sliding window) with p50/p95/p99 summaries.
+    """
+
+    def __init__(self, window=None):
+        self.window = window or GENERATION_SERVICE['LATENCY_WINDOW']
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def summary(self):
+        with self._lock:
+            samples = {model: sorted(values) for model, values in self._samples.items()}
+        return {
+            model: {
+                'count': len(values),
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99),
+            }
+            for model, values in samples.items()
+        }
+
+
+class GenerationService:
+    """
+    Bounded pool for blocking generation calls with per-request deadlines.
+    """
+
+    def __init__(self, max_workers=None, deadline_seconds=None, latency_window=None):
+        self.max_workers = max_workers or GENERATION_SERVICE['MAX_WORKERS']
+        self.deadline_seconds = deadline_seconds or GENERATION_SERVICE['DEADLINE_SECONDS']
+        self.latency = LatencyTracker(latency_window)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='generation')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._requests = {}
+        self._timeouts = {}
+        self._late_results = {}
+        self._cancelled = 0
+        self.first_token = LatencyTracker(latency_window)
+        self.usable_response = LatencyTracker(latency_window)
+        self._streams = {}
+
+    def _timed(self, model, func, args, kwargs):
+        started = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Late completions are recorded too, so the percentiles show the real latency
+            self.latency.record(model, time.monotonic() - started)
+            metrics.GENERATION_SECONDS.observe(time.monotonic() - started, model=model)
+            with self._lock:
+                self._in_flight -= 1
+
+    def submit(self, func, *args, model='default', **kwargs):
+        """
+        Schedule `func(*args, **kwargs)` on the pool; returns a Future.
+        """
+        with self._lock:
+            self._in_flight += 1
+            self._requests[model] = self._requests.get(model, 0) + 1
+        return self._executor.submit(self._timed, model, func, args, kwargs)
+
+    def run(self, func, *args, model='default', deadline=None, default=None, on_late_result=None, **kwargs):
+        """
+        Run `func` on the pool and wait at most `deadline` seconds for it.
+
+        Returns `default` if the deadline passes. The call keeps running in the
+        background; if it still succeeds, `on_late_result` receives its result
+        (e.g. to cache it for the next attempt).
+        """
+        future = self.submit(func, *args, model=model, **kwargs)
+        timeout = deadline if deadline is not None else self.deadline_seconds
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._timeouts[model] = self._timeouts.get(model, 0) + 1
+            metrics.GENERATION_TIMEOUTS.inc(model=model)
+            logger.warning(f"Generation with {model} exceeded its {timeout:g}s deadline; using a fallback response.")
+            if future.cancel():
+                # Still queued behind other requests: don't spend a worker on it at all
+                with self._lock:
+                    self._in_flight -= 1
+                    self._cancelled += 1
+            elif on_late_result is not None:
+                future.add_done_callback(lambda done: self._deliver_late(model, done, on_late_result))
+            return default
+
+    def _deliver_late(self, model, future, on_late_result):
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        with self._lock:
+            self._late_results[model] = self._late_results.get(model, 0) + 1
+        try:
+            on_late_result(future.result())
+        except Exception as e:
+            logger.warning(f"Could not keep a late generation result: {e}")
+
+    def record(self, model, seconds, timed_out=False):
+        """
+        Account for a request made outside the pool (e.g. by the asyncio runtime).
+        """
+        self.latency.record(model, seconds)
+        metrics.GENERATION_SECONDS.observe(seconds, model=model)
+        if timed_out:
+            metrics.GENERATION_TIMEOUTS.inc(model=model)
+        with self._lock:
+            self._requests[model] = self._requests.get(model, 0) + 1
+            if timed_out:
+                self._timeouts[model] = self._timeouts.get(model, 0) + 1
+
+    def record_stream(self, model, started, first_token_at, finished, cleaner):
+        """
+        Account for one streamed generation: time to first token, time until the
+        response was usable, tokens received and whether we hung up early.
+        """
+        if first_token_at is not None:
+            self.first_token.record(model, first_token_at - started)
+        self.usable_response.record(model, finished - started)
+        with self._lock:
+            stream_stats = self._streams.setdefault(model, {'streams': 0, 'tokens': 0, 'stopped_early': 0})
+            stream_stats['streams'] += 1
+            stream_stats['tokens'] += cleaner.tokens
+            stream_stats['stopped_early'] += int(cleaner.stopped_early)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self):
+        """
+        In-flight count plus requests, timeouts, late results and p50/p95/p99 latency per model,
+        and for streamed generations the time to first token and to a usable response.
+        """
+        latency = self.latency.summary()
+        first_token = self.first_token.summary()
+        usable_response = self.usable_response.summary()
+        with self._lock:
+            models = set(self._requests) | set(latency)
+            streaming = {
+                model: dict(stream_stats,
+                            first_token=first_token.get(model),
+                            usable_response=usable_response.get(model))
+                for model, stream_stats in self._streams.items()
+            }
+            return {
+                'in_flight': self._in_flight,
+                'max_workers': self.max_workers,
+                'cancelled_before_start': self._cancelled,
+                'models': {
+                    model: dict(latency.get(model, {}),
+                                requests=self._requests.get(model, 0),
+                                timeouts=self._timeouts.get(model, 0),
+                                late_results=self._late_results.get(model, 0))
+                    for model in models
+                },
+                'streaming': streaming,
+            }
+
+
+_generation_service = None
+
+
+def get_generation_service():
+    """
+    Shared generation service, started on first use.
+    """
+    global _generation_service
+    if _generation_service is None:
+        _generation_service = GenerationService()
+    return _generation_service
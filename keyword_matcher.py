@@ -0,0 +1,156 @@
+"""
+Multi-pattern keyword matching for the travel engagement bot.
+All target, avoid and destination keywords are compiled into a single
+Aho-Corasick automaton, so each comment is scanned once no matter how many
+keywords are configured.
+"""
+
+import os
+import time
+import logging
+import importlib
+from collections import deque
+
+import config
+import advanced_config
+from advanced_config import KEYWORD_MATCHING
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over lowercase keywords grouped by category.
+
+    Categories listed in `boundary_categories` only match whole words
+    (the characters around the match must not be letters or digits).
+    """
+
+    def __init__(self, categories, boundary_categories=()):
+        self.categories = tuple(categories)
+        self._boundary = set(boundary_categories)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self._terms = []
+
+        for category, terms in categories.items():
+            for term in terms:
+                term = term.strip().lower()
+                if term:
+                    self._add(term, category)
+        self._build()
+
+    def __len__(self):
+        return len(self._terms)
+
+    def _add(self, term, category):
+        node = 0
+        for ch in term:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node] += (len(self._terms),)
+        self._terms.append((term, category, category in self._boundary))
+
+    def _build(self):
+        # Breadth-first pass computing failure links and merged outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] += self._out[self._fail[child]]
+
+    def scan(self, text, lowered=False):
+        """
+        Find every keyword in `text` in a single pass.
+        Returns a dict mapping each category to the set of matched terms.
+        """
+        if not lowered:
+            text = text.lower()
+        found = {category: set() for category in self.categories}
+        goto, fail, out, terms = self._goto, self._fail, self._out, self._terms
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for index in out[node]:
+                term, category, whole_word = terms[index]
+                if whole_word and not _is_whole_word(text, i + 1 - len(term), i + 1):
+                    continue
+                found[category].add(term)
+        return found
+
+
+def _is_whole_word(text, start, end):
+    before = text[start - 1] if start > 0 else ' '
+    after = text[end] if end < len(text) else ' '
+    return not before.isalnum() and not after.isalnum()
+
+
+# Shared matcher built from the bot configuration
+
+_matcher = None
+_fingerprint = None
+_config_mtime = None
+_last_config_check = 0.0
+
+
+def _config_terms():
+    from destination_router import refresh_destination_router
+    return {
+        'target': tuple(config.TARGET_STRINGS),
+        'avoid': tuple(advanced_config.CONTENT_MODERATION['AVOID_KEYWORDS']),
+        'destination': refresh_destination_router().terms,
+    }
+
+
+def _rebuild_matcher():
+    global _matcher, _fingerprint
+    terms = _config_terms()
+    fingerprint = hash(tuple(terms.items()))
+    if _matcher is None or fingerprint != _fingerprint:
+        boundary = ('target', 'avoid') if KEYWORD_MATCHING['WORD_BOUNDARIES'] else ()
+        _matcher = KeywordMatcher(terms, boundary_categories=boundary)
+        _fingerprint = fingerprint
+        logger.info(f"Compiled keyword matcher with {len(_matcher)} terms")
+    return _matcher
+
+
+def get_keyword_matcher():
+    """
+    Return the compiled matcher, building it on first use.
+    """
+    return _matcher if _matcher is not None else _rebuild_matcher()
+
+
+def refresh_keyword_matcher():
+    """
+    Reload config.py if it was edited (e.g. through bot_manager) and rebuild the matcher
+    when the keyword lists changed. Cheap enough to call once per bot cycle.
+    """
+    global _config_mtime, _last_config_check
+    now = time.monotonic()
+    if KEYWORD_MATCHING['RELOAD_CONFIG'] and now - _last_config_check >= KEYWORD_MATCHING['CONFIG_CHECK_INTERVAL']:
+        _last_config_check = now
+        try:
+            mtime = os.path.getmtime(config.__file__)
+        except OSError:
+            mtime = None
+        if _config_mtime is not None and mtime != _config_mtime:
+            logger.info("config.py changed on disk, reloading keyword configuration")
+            importlib.reload(config)
+        _config_mtime = mtime
+    return _rebuild_matcher()
@@ -0,0 +1,280 @@
+"""
+In-process metrics for the travel engagement bot.
+Counters, gauges and histograms for every stage of a cycle (fetching,
+filtering, context loading, generation, replying and sleeping), exposed in
+Prometheus text format by a small HTTP endpoint running inside the worker.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from advanced_config import METRICS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base class: a named family of samples keyed by label values.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        """
+        Sum over all label values.
+        """
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self):
+        with self._lock:
+            samples = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                for key, value in samples]
+
+
+class Gauge(Metric):
+    """
+    Current value; either set directly or read from a callback at scrape time.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, callback, **labels):
+        with self._lock:
+            self._callbacks[self._key(labels)] = callback
+
+    def render(self):
+        with self._lock:
+            samples = dict(self._values)
+            callbacks = dict(self._callbacks)
+        for key, callback in callbacks.items():
+            try:
+                samples[key] = callback()
+            except Exception as e:
+                logger.debug(f"Gauge callback for {self.name} failed: {e}")
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                for key, value in sorted(samples.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of a `with` block.
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def render(self):
+        with self._lock:
+            samples = sorted((key, {'counts': list(state['counts']), 'sum': state['sum'], 'count': state['count']})
+                             for key, state in self._values.items())
+        lines = self.header()
+        for key, state in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        All metrics in Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Scanning and filtering
+COMMENTS_SCANNED = REGISTRY.counter('bot_comments_scanned_total', "Comments evaluated by the filter", ['subreddit'])
+COMMENTS_REJECTED = REGISTRY.counter('bot_comments_rejected_total', "Comments rejected by the filter", ['reason'])
+CANDIDATES = REGISTRY.counter('bot_candidates_total', "Comments that qualified for a reply", ['subreddit'])
+RELEVANCE_CONFIDENCE = REGISTRY.histogram('bot_relevance_confidence', "Relevance confidence of scored comments",
+                                          buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0))
+
+# Time spent per stage: fetch, score, filter, context, generate, reply, cycle
+STAGE_SECONDS = REGISTRY.histogram('bot_stage_seconds', "Time spent in each processing stage", ['stage'])
+
+# Generation
+GENERATIONS = REGISTRY.counter('bot_generations_total',
+                               "Responses by source (model or template fallback) and fallback reason",
+                               ['source', 'reason'])
+GENERATION_CACHE_LOOKUPS = REGISTRY.counter('bot_generation_cache_lookups_total', "Generation cache lookups",
+                                            ['result'])
+GENERATION_SECONDS = REGISTRY.histogram('bot_generation_seconds', "Inference request latency", ['model'])
+GENERATION_TIMEOUTS = REGISTRY.counter('bot_generation_timeouts_total', "Generations that missed their deadline",
+                                       ['model'])
+
+# Reddit API
+API_CALLS = REGISTRY.counter('bot_api_calls_total', "Reddit API calls by reason and outcome", ['reason', 'outcome'])
+API_SECONDS = REGISTRY.histogram('bot_api_request_seconds', "Reddit API request latency", ['reason'])
+REPLIES = REGISTRY.counter('bot_replies_total', "Reply attempts by outcome", ['outcome'])
+DUPLICATE_RESPONSES = REGISTRY.counter('bot_duplicate_responses_total',
+                                       "Responses that repeated a recent reply, by what happened instead",
+                                       ['outcome'])
+
+# Sleeping: limiter waits, retry backoff, rate-limit backoff, reply spacing and the pause between cycles
+SLEEP_SECONDS = REGISTRY.counter('bot_sleep_seconds_total', "Seconds spent sleeping, by cause", ['cause'])
+
+# Pipeline queues
+QUEUE_DEPTH = REGISTRY.gauge('bot_pipeline_queue_depth', "Items waiting in each pipeline queue", ['stage'])
+
+
+def sleep(seconds, cause):
+    """
+    time.sleep() that is accounted for in bot_sleep_seconds_total.
+    """
+    if seconds > 0:
+        SLEEP_SECONDS.inc(seconds, cause=cause)
+        time.sleep(seconds)
+
+
+def _serve_metrics(handler):
+    if handler.path.split('?')[0] not in ('/', '/metrics'):
+        handler.send_error(404)
+        return
+    body = REGISTRY.render().encode('utf-8')
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+_server = None
+
+
+def start_metrics_server(port=None, host=None):
+    """
+    Serve /metrics from a daemon thread (once per process). Returns the server, or None if disabled.
+    """
+    global _server
+    if port is None:
+        port = int(os.getenv('METRICS_PORT') or METRICS['PORT']) if METRICS['ENABLED'] else 0
+    if _server is not None or not port:
+        return _server
+    # http.server is only imported by the process that serves the endpoint
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        do_GET = _serve_metrics
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        _server = ThreadingHTTPServer((host or METRICS['HOST'], port), MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Could not start the metrics endpoint on port {port}: {e}")
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f"Serving metrics on http://{_server.server_address[0]}:{_server.server_address[1]}/metrics")
+    return _server
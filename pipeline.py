@@ -0,0 +1,434 @@
+"""
+Staged comment pipeline for the travel engagement bot.
+fetch -> filter -> generate -> post, connected by bounded queues, so a slow
+Hugging Face generation or the pause after a reply no longer holds up
+scanning of the other subreddits. When a queue is full, the stage feeding it
+blocks, and that pushes back all the way to the fetcher.
+"""
+
+import time
+import queue
+import random
+import logging
+import threading
+
+import praw
+import prawcore
+
+import metrics
+import reddit_bot as bot
+from config import MAX_COMMENTS_PER_SESSION, MAX_REPLY_PER_POST
+from advanced_config import ENGAGEMENT_STRATEGY, ACTIVITY_SCHEDULE, SCAN_SETTINGS, PIPELINE_SETTINGS
+from comment_feed import get_bot_username
+from scan_cursors import get_cursor_store
+from request_scheduler import get_request_scheduler
+from relevance_scorer import score_comments
+from session_state import get_session_counters
+
+logger = logging.getLogger(__name__)
+
+# Queue item telling a worker thread to exit
+_STOP = object()
+
+
+class StageStats:
+    """
+    Throughput, latency and queue-depth counters for one pipeline stage.
+    """
+
+    def __init__(self, name, work_queue=None):
+        self.name = name
+        self.work_queue = work_queue
+        self._lock = threading.Lock()
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self.max_depth = 0
+        self.blocked_puts = 0
+        self.blocked_seconds = 0.0
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self.items += 1
+            self.errors += int(error)
+            self.busy_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def put(self, item):
+        """
+        Put `item` on this stage's queue, blocking (and counting the wait) while it is full.
+        """
+        started = time.monotonic()
+        blocked = self.work_queue.full()
+        self.work_queue.put(item)
+        with self._lock:
+            if blocked:
+                self.blocked_puts += 1
+                self.blocked_seconds += time.monotonic() - started
+            self.max_depth = max(self.max_depth, self.work_queue.qsize())
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'items': self.items,
+                'errors': self.errors,
+                'avg_seconds': self.busy_seconds / self.items if self.items else 0.0,
+                'max_seconds': self.max_seconds,
+                'queue_depth': self.work_queue.qsize() if self.work_queue is not None else 0,
+                'max_queue_depth': self.max_depth,
+                'blocked_puts': self.blocked_puts,
+                'blocked_seconds': self.blocked_seconds,
+            }
+
+
+class FeedBatch:
+    """
+    Comments fetched from one listing; the feed's cursor moves once all of them are done.
+    """
+
+    def __init__(self, feed_name, records, confidences=None):
+        self.feed_name = feed_name
+        self.newest = records[0] if records else None
+        self.pending = len(records)
+        self.truncated = False
+        # Relevance confidence by comment ID (empty when scoring is off)
+        self.confidences = confidences or {}
+
+
+class CommentPipeline:
+    """
+    Runs one scan cycle at a time through four stages:
+
+    - fetcher (calling thread): pulls each feed's listing and feeds the filter queue
+    - filter (one thread): local keyword/limit checks, plans the session budget
+    - generate (GENERATION_WORKERS threads): builds the reply text
+    - poster (one thread): posts replies one by one, keeping the reply spacing
+
+    Worker threads are started once and reused across cycles. A cycle returns
+    when every fetched comment has left the pipeline, so the session counters
+    and scan cursors are consistent before the bot sleeps.
+    """
+
+    def __init__(self, reddit_instance, comments_replied_to, settings=None):
+        self.reddit_instance = reddit_instance
+        self.comments_replied_to = comments_replied_to
+        self.settings = dict(PIPELINE_SETTINGS, **(settings or {}))
+
+        self.filter_queue = queue.Queue(maxsize=self.settings['FILTER_QUEUE_SIZE'])
+        self.generate_queue = queue.Queue(maxsize=self.settings['GENERATE_QUEUE_SIZE'])
+        self.post_queue = queue.Queue(maxsize=self.settings['POST_QUEUE_SIZE'])
+        self.stages = {
+            'fetch': StageStats('fetch'),
+            'filter': StageStats('filter', self.filter_queue),
+            'generate': StageStats('generate', self.generate_queue),
+            'post': StageStats('post', self.post_queue),
+        }
+        for name, stage in self.stages.items():
+            if stage.work_queue is not None:
+                metrics.QUEUE_DEPTH.set_function(stage.work_queue.qsize, stage=name)
+
+        # Replies planned by the filter but not yet posted, so limits account for in-flight work
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._in_flight_posts = {}
+        self._in_flight_ids = set()
+        # History stores are not thread-safe; the filter reads while the poster writes
+        self._store_lock = threading.Lock()
+        self._bot_username = None
+        self._threads = []
+        # Set by stop(): workers drop queued comments instead of starting new work
+        self._stopping = threading.Event()
+
+    # Lifecycle
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        workers = [('filter', self._filter_worker)]
+        workers += [(f'generate-{n}', self._generate_worker) for n in range(self.settings['GENERATION_WORKERS'])]
+        workers += [('post', self._post_worker)]
+        for name, target in workers:
+            thread = threading.Thread(target=target, name=f'pipeline-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Stop the worker threads. Queued comments are dropped (their feeds' cursors don't move),
+        but a reply that is being posted is finished and recorded before this returns.
+        """
+        if not self._threads:
+            return
+        self._stopping.set()
+        for work_queue, discard in self._discarders():
+            self._drain(work_queue, discard)
+        # Stop the stages in order, so nothing upstream can still feed a stage that has exited
+        filter_threads, generate_threads, post_threads = self._threads[:1], self._threads[1:-1], self._threads[-1:]
+        for work_queue, threads in ((self.filter_queue, filter_threads), (self.generate_queue, generate_threads),
+                                    (self.post_queue, post_threads)):
+            for _ in threads:
+                work_queue.put(_STOP)
+            for thread in threads:
+                thread.join()
+        self._threads = []
+
+    def close(self):
+        """
+        Stop the workers, then flush and close the history store.
+        """
+        self.stop()
+        with self._store_lock:
+            self.comments_replied_to.close()
+
+    def _discarders(self):
+        return (
+            (self.filter_queue, lambda item: self._discard(item[0])),
+            (self.generate_queue, lambda item: self._discard(item[0], item[2])),
+            (self.post_queue, lambda item: self._discard(item[0], item[2], reserved=True)),
+        )
+
+    def _drain(self, work_queue, discard):
+        while True:
+            try:
+                item = work_queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                discard(item)
+            work_queue.task_done()
+
+    # Fetch stage
+
+    def run_cycle(self):
+        """
+        Fetch every feed, stream the comments through the stages and wait for them to finish.
+        """
+        self.start()
+        bot.start_cycle(self.comments_replied_to)
+        self._bot_username = get_bot_username(self.reddit_instance)
+
+        for subreddit_names in bot.get_feeds():
+            feed_name = '+'.join(subreddit_names)
+            if get_session_counters().comments + self._in_flight >= MAX_COMMENTS_PER_SESSION:
+                logger.info("Session limit planned; skipping the remaining feeds this cycle.")
+                break
+            limit = ENGAGEMENT_STRATEGY['POSTS_PER_SUBREDDIT'] if len(subreddit_names) == 1 \
+                else SCAN_SETTINGS['COMBINED_LISTING_LIMIT']
+            route = {subreddit_name.lower(): subreddit_name for subreddit_name in subreddit_names}
+
+            logger.info(f"Searching latest comments in r/{feed_name}")
+            started = time.monotonic()
+            try:
+                records = list(bot.fetch_comments(self.reddit_instance, feed_name, limit))
+            except Exception as e:
+                self.stages['fetch'].record(time.monotonic() - started, error=True)
+                logger.exception(f"An error occurred while fetching {feed_name}: {e}")
+                continue
+            self.stages['fetch'].record(time.monotonic() - started)
+            metrics.STAGE_SECONDS.observe(time.monotonic() - started, stage='fetch')
+
+            batch = FeedBatch(feed_name, records, score_comments(records, route))
+            for record in records:
+                # Blocks while the filter queue is full: backpressure from the slower stages
+                self.stages['filter'].put((batch, route, record))
+
+        # Wait until every comment has been filtered, generated and posted (or dropped)
+        self.filter_queue.join()
+        self.generate_queue.join()
+        self.post_queue.join()
+
+    # Filter stage
+
+    def _filter_worker(self):
+        while True:
+            item = self.filter_queue.get()
+            if item is _STOP:
+                self.filter_queue.task_done()
+                return
+            if self._stopping.is_set():
+                self._discard(item[0])
+                self.filter_queue.task_done()
+                continue
+            started = time.monotonic()
+            batch, route, record = item
+            forwarded = False
+            try:
+                forwarded = self._filter(batch, route, record)
+            except Exception as e:
+                logger.exception(f"Error filtering comment {record.id}: {e}")
+            finally:
+                if not forwarded:
+                    self._finish(batch)
+                self.stages['filter'].record(time.monotonic() - started)
+                self.filter_queue.task_done()
+
+    def _filter(self, batch, route, record):
+        subreddit_name = route.get(record.subreddit.lower())
+        if subreddit_name is None:
+            return False
+        with self._store_lock:
+            keyword_matches, reason = bot.qualify_comment(record, self.comments_replied_to, self._bot_username,
+                                                          batch.confidences.get(record.id))
+        if keyword_matches is None:
+            if reason == 'session_limit':
+                batch.truncated = True
+            return False
+
+        with self._lock:
+            if record.id in self._in_flight_ids:
+                return False
+            if get_session_counters().comments + self._in_flight >= MAX_COMMENTS_PER_SESSION:
+                batch.truncated = True
+                return False
+            post_count = get_session_counters().replies_to(record.post_id) + self._in_flight_posts.get(record.post_id, 0)
+            if post_count >= MAX_REPLY_PER_POST:
+                return False
+
+        bot.log_keyword_match(record, subreddit_name, keyword_matches)
+        # Randomly decide whether to respond based on response rate
+        if random.random() > ENGAGEMENT_STRATEGY['RESPONSE_RATE']:
+            metrics.COMMENTS_REJECTED.inc(reason='response_rate')
+            return False
+
+        with self._lock:
+            self._in_flight += 1
+            self._in_flight_posts[record.post_id] = self._in_flight_posts.get(record.post_id, 0) + 1
+            self._in_flight_ids.add(record.id)
+        self.stages['generate'].put((batch, subreddit_name, record, keyword_matches))
+        return True
+
+    # Generate stage
+
+    def _generate_worker(self):
+        while True:
+            item = self.generate_queue.get()
+            if item is _STOP:
+                self.generate_queue.task_done()
+                return
+            if self._stopping.is_set():
+                self._discard(item[0], item[2])
+                self.generate_queue.task_done()
+                continue
+            started = time.monotonic()
+            batch, subreddit_name, record, keyword_matches = item
+            try:
+                response = bot.select_unique_response(record, keyword_matches,
+                                                      bot.generate_response(record, keyword_matches))
+            except Exception as e:
+                logger.exception(f"Error generating a response for comment {record.id}: {e}")
+                self._release(record)
+                self._finish(batch)
+                self.stages['generate'].record(time.monotonic() - started, error=True)
+            else:
+                self.stages['generate'].record(time.monotonic() - started)
+                if response is None:
+                    # Every candidate repeated a recent reply
+                    self._release(record)
+                    self._finish(batch)
+                else:
+                    self.stages['post'].put((batch, subreddit_name, record, response))
+            finally:
+                self.generate_queue.task_done()
+
+    # Post stage
+
+    def _post_worker(self):
+        while True:
+            item = self.post_queue.get()
+            if item is _STOP:
+                self.post_queue.task_done()
+                return
+            if self._stopping.is_set():
+                self._discard(item[0], item[2], reserved=True)
+                self.post_queue.task_done()
+                continue
+            started = time.monotonic()
+            batch, subreddit_name, record, response = item
+            posted = False
+            try:
+                posted = self._post(record, response, subreddit_name)
+            finally:
+                bot.release_response(record)
+                self._release(record)
+                self._finish(batch)
+                self.stages['post'].record(time.monotonic() - started, error=not posted)
+                self.post_queue.task_done()
+
+            if posted:
+                # Reply spacing only delays the next post, not scanning or generation; stop() cuts it short
+                delay = random.randint(ACTIVITY_SCHEDULE['MIN_RESPONSE_DELAY'], ACTIVITY_SCHEDULE['MAX_RESPONSE_DELAY'])
+                metrics.SLEEP_SECONDS.inc(delay, cause='reply_spacing')
+                self._stopping.wait(delay)
+
+    def _post(self, record, response, subreddit_name):
+        try:
+            with metrics.STAGE_SECONDS.time(stage='reply'):
+                get_request_scheduler().call(record.to_praw(self.reddit_instance).reply, response,
+                                             reason='reply', idempotent=False, reddit_instance=self.reddit_instance)
+        except prawcore.exceptions.Forbidden as forbidden_error:
+            metrics.REPLIES.inc(outcome='forbidden')
+            logger.warning(f"Permission error for comment {record.id}: {forbidden_error}. Skipping.")
+            return False
+        except praw.exceptions.APIException as api_exception:
+            metrics.REPLIES.inc(outcome='api_error')
+            bot.handle_rate_limit(api_exception)
+            return False
+        except Exception as reply_error:
+            metrics.REPLIES.inc(outcome='error')
+            logger.exception(f"Error while replying to comment {record.id}: {reply_error}")
+            return False
+
+        logger.info(f"Replied to comment {record.id}")
+        metrics.REPLIES.inc(outcome='posted')
+        with self._store_lock:
+            bot.record_reply(record, self.comments_replied_to, subreddit_name, response)
+        return True
+
+    # Bookkeeping
+
+    def _release(self, record):
+        with self._lock:
+            self._in_flight -= 1
+            remaining = self._in_flight_posts.get(record.post_id, 0) - 1
+            if remaining > 0:
+                self._in_flight_posts[record.post_id] = remaining
+            else:
+                self._in_flight_posts.pop(record.post_id, None)
+            self._in_flight_ids.discard(record.id)
+
+    def _discard(self, batch, planned_record=None, reserved=False):
+        """
+        Drop a queued comment on shutdown. `planned_record` is set once the filter counted it
+        as in flight, `reserved` once its reply text holds a duplicate-check reservation.
+        """
+        if reserved:
+            bot.release_response(planned_record)
+        if planned_record is not None:
+            self._release(planned_record)
+        # It was never evaluated, so the feed's cursor must not move past it
+        batch.truncated = True
+        self._finish(batch)
+
+    def _finish(self, batch):
+        with self._lock:
+            batch.pending -= 1
+            done = batch.pending == 0
+        # Only move the cursor once every fetched comment was evaluated
+        if done and SCAN_SETTINGS['INCREMENTAL'] and not batch.truncated and batch.newest is not None:
+            with self._store_lock:
+                get_cursor_store().update(batch.feed_name, batch.newest)
+
+    def stats(self):
+        """
+        Per-stage counters: items, errors, avg/max latency, queue depth and time blocked on full queues.
+        """
+        return {name: stage.snapshot() for name, stage in self.stages.items()}
+
+    def log_stats(self):
+        for name, stage in self.stats().items():
+            logger.info(f"Pipeline {name}: {stage['items']} items ({stage['errors']} failed), "
+                        f"avg {stage['avg_seconds']:.2f}s, max {stage['max_seconds']:.2f}s, "
+                        f"queue {stage['queue_depth']} (max {stage['max_queue_depth']}), "
+                        f"blocked {stage['blocked_puts']}x / {stage['blocked_seconds']:.1f}s")
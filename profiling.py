@@ -0,0 +1,236 @@
+"""
+On-demand profiling of the running bot.
+Send SIGUSR1 (`kill -USR1 <pid>`) or create the control file to profile the
+next N cycles: a cProfile or sampling profile plus a tracemalloc snapshot are
+written to the dump directory and the top hot spots are logged. While no
+profile is requested the only cost is one flag check and one stat() per cycle.
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import tracemalloc
+from io import StringIO
+from datetime import datetime
+
+from advanced_config import PROFILING
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sampling')
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread (pipeline and generation workers included) at a fixed interval.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval or PROFILING['SAMPLE_INTERVAL']
+        self.samples = 0
+        # (file, line, function) -> samples with that frame on top / anywhere on the stack
+        self.own = {}
+        self.total = {}
+        # 'outer;...;inner' -> samples (collapsed stacks, the input format of flame graph tools)
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_thread:
+                    self._record(frame)
+            self.samples += 1
+
+    def _record(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        self.own[stack[0]] = self.own.get(stack[0], 0) + 1
+        for location in set((filename, name) for filename, _, name in stack):
+            self.total[location] = self.total.get(location, 0) + 1
+        collapsed = ';'.join(f"{name} ({os.path.basename(filename)}:{line})" for filename, line, name in reversed(stack))
+        self.stacks[collapsed] = self.stacks.get(collapsed, 0) + 1
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, top_n):
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms"]
+        lines.append("Own time (frame on top of the stack):")
+        for (filename, line, name), count in sorted(self.own.items(), key=lambda item: -item[1])[:top_n]:
+            lines.append(f"  {count:6d}  {name} ({filename}:{line})")
+        lines.append("Cumulative (function anywhere on the stack):")
+        for (filename, name), count in sorted(self.total.items(), key=lambda item: -item[1])[:top_n]:
+            lines.append(f"  {count:6d}  {name} ({filename})")
+        return '\n'.join(lines)
+
+
+class CycleProfiler:
+    """
+    Profiles whole bot cycles on request.
+
+    request() arms the profiler (safe to call from a signal handler); the bot
+    loop calls start_cycle()/end_cycle() around every cycle, and once the
+    requested number of cycles has run the results are dumped and summarized.
+    """
+
+    def __init__(self, dump_dir=None, control_file=None):
+        self.dump_dir = dump_dir or PROFILING['DUMP_DIRECTORY']
+        self.control_file = control_file or PROFILING['CONTROL_FILE']
+        self._requested = None
+        self._active = None
+        self.runs = 0
+
+    # Triggers
+
+    def request(self, cycles=None, mode=None):
+        """
+        Profile the next `cycles` cycles with `mode` ('cprofile' or 'sampling').
+        """
+        self._requested = (cycles or PROFILING['CYCLES'], mode or PROFILING['MODE'])
+
+    def install_signal_handler(self):
+        """
+        Request a profile on SIGUSR1 (or the configured signal), where the platform supports it.
+        """
+        signum = getattr(signal, PROFILING['SIGNAL'], None)
+        if signum is None:
+            logger.info(f"{PROFILING['SIGNAL']} is not available here; use the control file {self.control_file}")
+            return False
+        signal.signal(signum, lambda received, frame: self.request())
+        return True
+
+    def _check_control_file(self):
+        """
+        A control file may contain a cycle count and/or a mode, e.g. "3 sampling". It is removed once read.
+        """
+        if not os.path.exists(self.control_file):
+            return
+        cycles, mode = None, None
+        try:
+            with open(self.control_file, 'r', encoding='utf-8') as f:
+                words = f.read().split()
+            os.remove(self.control_file)
+        except OSError as e:
+            logger.warning(f"Could not read the profiling control file {self.control_file}: {e}")
+            return
+        for word in words:
+            if word.isdigit():
+                cycles = int(word)
+            elif word.lower() in MODES:
+                mode = word.lower()
+        self.request(cycles, mode)
+
+    # Cycle hooks
+
+    def start_cycle(self):
+        if self._active is None and PROFILING['ENABLED']:
+            self._check_control_file()
+            if self._requested is None:
+                return
+            cycles, mode = self._requested
+            self._requested = None
+            self._begin(cycles, mode)
+
+    def end_cycle(self):
+        if self._active is None:
+            return
+        self._active['remaining'] -= 1
+        if self._active['remaining'] <= 0:
+            self._finish()
+
+    def _begin(self, cycles, mode):
+        mode = mode if mode in MODES else 'sampling'
+        logger.info(f"Profiling the next {cycles} cycle(s) ({mode}{', tracemalloc' if PROFILING['TRACEMALLOC'] else ''})")
+        if mode == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+        else:
+            profiler = SamplingProfiler()
+        started_tracing = False
+        if PROFILING['TRACEMALLOC'] and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILING['TRACEMALLOC_FRAMES'])
+            started_tracing = True
+        self._active = {'mode': mode, 'profiler': profiler, 'cycles': cycles, 'remaining': cycles,
+                        'started': time.monotonic(), 'started_tracing': started_tracing}
+        if mode == 'cprofile':
+            profiler.enable()
+        else:
+            profiler.start()
+
+    def _finish(self):
+        active, self._active = self._active, None
+        profiler = active['profiler']
+        if active['mode'] == 'cprofile':
+            profiler.disable()
+        else:
+            profiler.stop()
+        elapsed = time.monotonic() - active['started']
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        if active['started_tracing']:
+            tracemalloc.stop()
+
+        self.runs += 1
+        os.makedirs(self.dump_dir, exist_ok=True)
+        base = os.path.join(self.dump_dir, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        top_n = PROFILING['TOP_N']
+        if active['mode'] == 'cprofile':
+            profile_path = base + '.prof'
+            profiler.dump_stats(profile_path)
+            import pstats
+            output = StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(top_n)
+            summary = output.getvalue().strip()
+        else:
+            profile_path = base + '.stacks.txt'
+            profiler.dump(profile_path)
+            summary = profiler.summary(top_n)
+        logger.info(f"Profiled {active['cycles']} cycle(s) in {elapsed:.1f}s; written to {profile_path}\n{summary}")
+
+        if snapshot is not None:
+            snapshot_path = base + '.tracemalloc'
+            snapshot.dump(snapshot_path)
+            stats = snapshot.statistics('lineno')
+            lines = [f"  {stat.size / 1024:10.1f} KiB  {stat.count:7d} blocks  {stat.traceback[0]}"
+                     for stat in stats[:top_n]]
+            total = sum(stat.size for stat in stats) / 1024 / 1024
+            logger.info(f"Allocations traced: {total:.1f} MiB live; snapshot written to {snapshot_path}\n"
+                        + '\n'.join(lines))
+
+    @property
+    def active(self):
+        return self._active is not None
+
+
+_cycle_profiler = None
+
+
+def get_cycle_profiler():
+    """
+    Shared profiler driven by the bot loop.
+    """
+    global _cycle_profiler
+    if _cycle_profiler is None:
+        _cycle_profiler = CycleProfiler()
+    return _cycle_profiler
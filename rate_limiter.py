@@ -0,0 +1,103 @@
+"""
+Token-bucket limiter for outbound Reddit API calls.
+Only real requests (listing pages, identity lookups, replies) take tokens;
+local filtering runs without any sleeps.
+"""
+
+import time
+import logging
+import threading
+
+from advanced_config import API_RATE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with wait-time accounting per call reason.
+    """
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate = float(rate_per_second)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._by_reason = {}
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, cost=1, reason='api'):
+        """
+        Take `cost` tokens and return how long the caller has to wait before calling.
+        Callers that can't block (e.g. asyncio code) sleep for the returned time themselves.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= cost
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+            self._calls += 1
+            reason_stats = self._by_reason.setdefault(reason, {'calls': 0, 'waits': 0, 'wait_seconds': 0.0})
+            reason_stats['calls'] += 1
+            if wait > 0:
+                self._waits += 1
+                self._wait_seconds += wait
+                reason_stats['waits'] += 1
+                reason_stats['wait_seconds'] += wait
+            return wait
+
+    def acquire(self, cost=1, reason='api'):
+        """
+        Block until `cost` tokens are available.
+        """
+        wait = self.reserve(cost, reason)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def set_rate(self, rate_per_second, max_tokens=None):
+        """
+        Change the refill rate, keeping the tokens earned so far (at most `max_tokens` of them).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(float(rate_per_second), 1e-6)
+            if max_tokens is not None:
+                self._tokens = min(self._tokens, float(max_tokens))
+
+    def stats(self):
+        """
+        Counters describing how many calls were made and how long they waited.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_second': self.rate,
+                'capacity': self.capacity,
+                'tokens': self._tokens,
+                'calls': self._calls,
+                'waits': self._waits,
+                'wait_seconds': self._wait_seconds,
+                'by_reason': {reason: dict(values) for reason, values in self._by_reason.items()},
+            }
+
+
+_api_limiter = None
+
+
+def get_api_limiter():
+    """
+    Shared limiter for all Reddit API calls made by this process.
+    """
+    global _api_limiter
+    if _api_limiter is None:
+        _api_limiter = TokenBucket(API_RATE_LIMIT['REQUESTS_PER_MINUTE'] / 60.0, API_RATE_LIMIT['BURST'])
+    return _api_limiter
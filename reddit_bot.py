@@ -2,8 +2,8 @@
 from __future__ import print_function
 import praw
 import prawcore
-import time
-import os
+import sys
+import argparse
 import logging
 import random
 import json
@@ -15,37 +15,57 @@ from config import (
     REDDIT_CLIENT_SECRET,
     REDDIT_USER_AGENT,
     TARGET_SUBREDDITS,
-    TARGET_STRINGS,
     REPLY_TEMPLATES,
     SLEEP_DURATION,
     MIN_KARMA_THRESHOLD,
     MAX_COMMENTS_PER_SESSION,
     MAX_REPLY_PER_POST,
 )
-from response_templates import get_destination_specific_response, GENERIC_RESPONSES, load_context_from_file
-from advanced_config import ENGAGEMENT_STRATEGY, RESPONSE_SETTINGS, CONTENT_MODERATION, ACTIVITY_SCHEDULE, TRACKING_SETTINGS
+from response_templates import (
+    get_destination_specific_response,
+    generate_contextual_response,
+    fallback_alternatives,
+    GENERIC_RESPONSES,
+)
+from advanced_config import ENGAGEMENT_STRATEGY, RESPONSE_SETTINGS, CONTENT_MODERATION, ACTIVITY_SCHEDULE, TRACKING_SETTINGS, HISTORY_STORE, SCAN_SETTINGS, PIPELINE_SETTINGS, GENERATION_CACHE, CONTEXT_RETRIEVAL, PROFILING, RELEVANCE_SCORING, REPLY_DEDUP
+from reply_store import ReplyStore, close_on_exit
+from keyword_matcher import get_keyword_matcher, refresh_keyword_matcher
+from context_registry import get_context_registry, refresh_context_registry
+from context_retrieval import get_context_retriever
+from relevance_scorer import score_comments
+from reply_dedup import get_reply_index
+from session_state import get_session_counters
+from comment_feed import iter_comment_records, iter_praw_comment_records, get_bot_username, chunk_subreddits
+from scan_cursors import fetch_unseen_comments, get_cursor_store
+from rate_limiter import get_api_limiter
+from request_scheduler import get_request_scheduler, parse_ratelimit_delay
+from generation_cache import get_generation_cache
+from generation_service import get_generation_service
+import metrics
+from profiling import get_cycle_profiler
+import startup_profile
 
 # Configuring logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Global variables to track session activity
-session_comments_count = 0
-posts_replied_to = {}
-
-# Function to handle rate limit with exponential backoff
-def handle_rate_limit(api_exception, retry_attempts=3):
-    for attempt in range(retry_attempts):
-        retry_after = api_exception.response.headers.get('retry-after')
-        if retry_after:
-            logger.warning(f"Rate limited. Retrying after {retry_after} seconds. Attempt {attempt + 1}/{retry_attempts}")
-            time.sleep(int(retry_after) + 1)
-        else:
-            logger.error(f"API Exception: {api_exception}")
-            break
-    else:
-        logger.error("Exceeded retry attempts. Aborting.")
-        raise
+# Function to read the back-off delay from a RATELIMIT error returned by Reddit
+def get_ratelimit_delay(api_exception):
+    # Transient HTTP failures are retried by the request scheduler; this only covers Reddit's
+    # "you are doing that too much" responses, which tell us how long to back off
+    for item in getattr(api_exception, 'items', None) or [api_exception]:
+        if getattr(item, 'error_type', None) == 'RATELIMIT':
+            return parse_ratelimit_delay(getattr(item, 'message', '')) or int(SLEEP_DURATION)
+    return None
+
+# Function to handle a RATELIMIT error returned by Reddit (e.g. when replying too often)
+def handle_rate_limit(api_exception):
+    delay = get_ratelimit_delay(api_exception)
+    if delay is None:
+        logger.error(f"API Exception: {api_exception}")
+        return
+    logger.warning(f"Rate limited by Reddit. Backing off for {delay} seconds.")
+    metrics.sleep(delay + 1, 'ratelimit_backoff')
 
 # Function to log in to Reddit
 def bot_login():
@@ -68,117 +88,195 @@ def bot_login():
         logger.exception(f"Unexpected error during login: {e}")
         raise
 
-# Function to run the bot
-def run_bot(reddit_instance, comments_replied_to):
-    global session_comments_count, posts_replied_to
+# Function to reset session counters and reload keywords at the start of a cycle
+def start_cycle(comments_replied_to):
+    session = get_session_counters()
 
-    logger.info(f"Starting bot session. Current session comments count: {session_comments_count}")
+    logger.info(f"Starting bot session. Current session comments count: {session.comments}")
 
     # Reset session tracking if session limit reached
-    if session_comments_count >= MAX_COMMENTS_PER_SESSION:
+    if session.comments >= MAX_COMMENTS_PER_SESSION:
         logger.info("Max comments per session reached. Resetting session counters.")
-        session_comments_count = 0
-        posts_replied_to = {}
-
-    # Process comments from each target subreddit
-    for subreddit_name in TARGET_SUBREDDITS:
-        logger.info(f"Searching last 1,000 comments in subreddit {subreddit_name}")
+        session.reset()
+        comments_replied_to.reset_counters()
+
+    # Pick up keyword changes made to config.py and context files edited since the last cycle
+    refresh_keyword_matcher()
+    refresh_context_registry()
+
+    # Under --profile-startup the measurement ends here, right before the first request for comments
+    startup_profile.first_poll()
+
+# Function to group target subreddits into the listings polled each cycle
+def get_feeds():
+    # Combined polling reads one 'sub1+sub2+...' listing per chunk instead of one listing per subreddit
+    if SCAN_SETTINGS['POLLING'] == 'combined':
+        return chunk_subreddits(TARGET_SUBREDDITS, SCAN_SETTINGS['MULTIREDDIT_MAX_LENGTH'])
+    return [[subreddit_name] for subreddit_name in TARGET_SUBREDDITS]
+
+# Function to log API usage at the end of a cycle
+def log_cycle_stats():
+    limiter_stats = get_api_limiter().stats()
+    logger.info(f"API limiter: {limiter_stats['calls']} calls, {limiter_stats['waits']} throttled, "
+                f"{limiter_stats['wait_seconds']:.1f}s spent waiting ({limiter_stats['by_reason']})")
+    logger.info(f"Request scheduler: {get_request_scheduler().stats()}")
+    if GENERATION_CACHE['ENABLED']:
+        logger.info(f"Generation cache: {get_generation_cache().stats()}")
+    logger.info(f"Generation service: {get_generation_service().stats()}")
+    if CONTEXT_RETRIEVAL['ENABLED']:
+        logger.info(f"Context retrieval: {get_context_retriever().stats()}")
+
+# Function to run one scan over every target subreddit
+def run_cycle(reddit_instance, comments_replied_to):
+    start_cycle(comments_replied_to)
+
+    # Process comments from each target subreddit (or group of subreddits)
+    for subreddit_names in get_feeds():
+        feed_name = '+'.join(subreddit_names)
+        logger.info(f"Searching latest comments in r/{feed_name}")
         try:
-            process_comments(reddit_instance, comments_replied_to, subreddit_name)
+            if len(subreddit_names) == 1:
+                process_comments(reddit_instance, comments_replied_to, subreddit_names[0])
+            else:
+                process_combined_comments(reddit_instance, comments_replied_to, subreddit_names)
         except praw.exceptions.APIException as api_exception:
             # Handle rate limits
             handle_rate_limit(api_exception)
         except Exception as e:
             # Log other exceptions
-            logger.exception(f"An error occurred while processing {subreddit_name}: {e}")
+            logger.exception(f"An error occurred while processing {feed_name}: {e}")
 
-    logger.info(f"Session completed. Comments replied in this session: {session_comments_count}. Sleeping for {SLEEP_DURATION} seconds...")
-    time.sleep(int(SLEEP_DURATION))
+# Function to run the bot
+def run_bot(reddit_instance, comments_replied_to, comment_pipeline=None):
+    # The staged pipeline overlaps fetching, generation and posting; otherwise comments are handled inline
+    # Profiles requested with SIGUSR1 or the control file cover whole cycles (see profiling.py)
+    profiler = get_cycle_profiler()
+    profiler.start_cycle()
+    try:
+        with metrics.STAGE_SECONDS.time(stage='cycle'):
+            if comment_pipeline is not None:
+                comment_pipeline.run_cycle()
+                comment_pipeline.log_stats()
+            else:
+                run_cycle(reddit_instance, comments_replied_to)
+    finally:
+        profiler.end_cycle()
+
+    log_cycle_stats()
+    logger.info(f"Session completed. Comments replied in this session: {get_session_counters().comments}. Sleeping for {SLEEP_DURATION} seconds...")
+    metrics.sleep(int(SLEEP_DURATION), 'cycle_pause')
+
+# Function to fetch the newest comments of a subreddit or a combined 'a+b' path
+def fetch_comments(reddit_instance, subreddit_path, limit):
+    # Incremental mode only returns comments newer than the feed's saved cursor
+    if SCAN_SETTINGS['INCREMENTAL']:
+        return fetch_unseen_comments(reddit_instance, subreddit_path, limit)
+    # Raw mode parses listing JSON into slotted records; praw mode converts PRAW comments
+    if SCAN_SETTINGS['MODE'] == 'raw':
+        return iter_comment_records(reddit_instance, subreddit_path, limit)
+    return iter_praw_comment_records(reddit_instance, subreddit_path, limit)
+
+# Function to fetch, process and advance the cursor of one listing
+def process_feed(reddit_instance, comments_replied_to, feed_name, limit, route):
+    comments = fetch_comments(reddit_instance, feed_name, limit)
+    completed = process_comment_batch(reddit_instance, comments_replied_to, comments, route)
+
+    # Only move the cursor once every fetched comment was evaluated
+    if SCAN_SETTINGS['INCREMENTAL'] and completed and comments:
+        get_cursor_store().update(feed_name, comments[0])
 
 # Function to process comments
 def process_comments(reddit_instance, comments_replied_to, subreddit_name):
-    global session_comments_count
-
     try:
-        subreddit = reddit_instance.subreddit(subreddit_name)
-        # Limit to fewer comments to be more targeted
-        for comment in subreddit.comments(limit=ENGAGEMENT_STRATEGY['POSTS_PER_SUBREDDIT']):
-            if session_comments_count >= MAX_COMMENTS_PER_SESSION:
-                break
-            try:
-                process_single_comment(comment, comments_replied_to, subreddit_name)
-            except prawcore.exceptions.Forbidden as forbidden_error:
-                logger.warning(f"Permission error for comment {comment.id}: {forbidden_error}. Skipping.")
-            except Exception as error:
-                logger.exception(f"Error processing comment {comment.id}: {error}")
-
-            # Add delay between processing comments to avoid rate limits
-            time.sleep(ENGAGEMENT_STRATEGY['SUBREDDIT_SWITCH_DELAY'])
+        process_feed(reddit_instance, comments_replied_to, subreddit_name,
+                     ENGAGEMENT_STRATEGY['POSTS_PER_SUBREDDIT'], {subreddit_name.lower(): subreddit_name})
     except Exception as e:
         logger.exception(f"Error accessing subreddit {subreddit_name}: {e}")
 
     # Log when the search is completed
     logger.info(f"Completed processing {subreddit_name}.")
 
+# Function to process one combined listing covering several subreddits
+def process_combined_comments(reddit_instance, comments_replied_to, subreddit_names):
+    feed_name = '+'.join(subreddit_names)
+    try:
+        route = {subreddit_name.lower(): subreddit_name for subreddit_name in subreddit_names}
+        process_feed(reddit_instance, comments_replied_to, feed_name, SCAN_SETTINGS['COMBINED_LISTING_LIMIT'], route)
+    except Exception as e:
+        logger.exception(f"Error accessing subreddits {feed_name}: {e}")
+
+    logger.info(f"Completed processing {feed_name}.")
+
+# Function to route fetched comments to per-subreddit handling
+def process_comment_batch(reddit_instance, comments_replied_to, comments, route):
+    # Returns False if the session limit stopped the batch early
+    # Relevance is scored over the whole listing at once, so it is read in full first
+    if RELEVANCE_SCORING['ENABLED']:
+        comments = list(comments)
+    confidences = score_comments(comments, route)
+    for comment in comments:
+        if get_session_counters().comments >= MAX_COMMENTS_PER_SESSION:
+            return False
+        subreddit_name = route.get(comment.subreddit.lower())
+        if subreddit_name is None:
+            continue
+        try:
+            process_single_comment(comment, comments_replied_to, subreddit_name, reddit_instance,
+                                   confidences.get(comment.id))
+        except prawcore.exceptions.Forbidden as forbidden_error:
+            logger.warning(f"Permission error for comment {comment.id}: {forbidden_error}. Skipping.")
+        except Exception as error:
+            logger.exception(f"Error processing comment {comment.id}: {error}")
+    return True
+
 # Function to check if comment contains target keywords
 def contains_target_keywords(comment_body):
-    comment_lower = comment_body.lower()
-    for target_string in TARGET_STRINGS:
-        if target_string.lower() in comment_lower:
-            return True
-    return False
+    return bool(get_keyword_matcher().scan(comment_body)['target'])
 
-def get_context_for_subreddit(subreddit_name):
+def get_context_for_subreddit(subreddit_name, comment_text=None):
     """
     Get specific context based on the subreddit.
+    With retrieval enabled, only the passages relevant to the comment are returned.
     """
-    context_map = {
-        'JapanTravel': 'context/japan_context.md',
-        'Tokyo': 'context/japan_context.md',
-        'japan': 'context/japan_context.md',
-        'EuropeTravelTips': 'context/europe_context.md',
-        'europe': 'context/europe_context.md',
-        'Paris': 'context/europe_context.md',
-        'travel': 'context/travel_journal_context.md',
-        'solotravel': 'context/travel_journal_context.md',
-        'travel_tips': 'context/travel_journal_context.md',
-        'TravelHacks': 'context/travel_journal_context.md',
-        'backpacking': 'context/travel_journal_context.md',
-        'digitalnomad': 'context/travel_journal_context.md',
-        'ThailandTourism': 'context/travel_journal_context.md',
-        'bali': 'context/travel_journal_context.md',
-        'VisitingIceland': 'context/travel_journal_context.md',
-        'italianlearning': 'context/europe_context.md'
-    }
-
-    context_file = context_map.get(subreddit_name.lower())
-    if context_file:
-        context = load_context_from_file(context_file)
-        if context:
-            return context
-
-    # Default context if no specific context found
-    default_context = load_context_from_file('context/travel_journal_context.md')
-    return default_context if default_context else ""
+    with metrics.STAGE_SECONDS.time(stage='context'):
+        if comment_text and CONTEXT_RETRIEVAL['ENABLED']:
+            return get_context_retriever().retrieve(subreddit_name, comment_text)
+        # Context files are cached in memory and matched case-insensitively (see context_registry.py)
+        return get_context_registry().get(subreddit_name)
 
 
 # Function to generate a contextually appropriate response
-def generate_response(comment, target_string_found):
+def generate_response(comment, keyword_matches):
     # Get context specific to the subreddit
-    subreddit_context = get_context_for_subreddit(comment.subreddit.display_name)
+    subreddit_context = get_context_for_subreddit(comment.subreddit, comment.body)
 
     # Use the Hugging Face model to generate a contextual response with additional context
-    return generate_contextual_response(comment.body, comment.subreddit.display_name, subreddit_context)
+    with metrics.STAGE_SECONDS.time(stage='generate'):
+        return generate_contextual_response(comment.body, comment.subreddit, subreddit_context,
+                                            destination_terms=keyword_matches['destination'])
 
-# Function to process a single comment
-def process_single_comment(comment, comments_replied_to, subreddit_name):
-    import datetime as dt
+# Function to decide whether a comment qualifies for a reply
+def qualify_comment(comment, comments_replied_to, bot_username, confidence=None):
+    """
+    Run the local checks on a CommentRecord.
+    `confidence` is its relevance score from relevance_scorer.score_comments, if the batch was scored.
+    Returns (keyword_matches, None) when the comment qualifies, otherwise (None, rejection_reason).
+    """
+    keyword_matches, reason = check_comment(comment, comments_replied_to, bot_username, confidence)
+    metrics.COMMENTS_SCANNED.inc(subreddit=comment.subreddit)
+    if keyword_matches is None:
+        metrics.COMMENTS_REJECTED.inc(reason=reason)
+    else:
+        metrics.CANDIDATES.inc(subreddit=comment.subreddit)
+    return keyword_matches, reason
 
-    global session_comments_count, posts_replied_to
+# Function to run the local filters on a comment, returning the first rejection reason
+def check_comment(comment, comments_replied_to, bot_username, confidence=None):
+    import datetime as dt
 
     # Check if we've hit the session limit
-    if session_comments_count >= MAX_COMMENTS_PER_SESSION:
-        return
+    if get_session_counters().comments >= MAX_COMMENTS_PER_SESSION:
+        return None, 'session_limit'
 
     # Check current time to see if we should be active
     current_hour = dt.datetime.now().hour
@@ -186,101 +284,221 @@ def process_single_comment(comment, comments_replied_to, subreddit_name):
 
     if current_hour not in ACTIVITY_SCHEDULE['ACTIVE_HOURS'] or \
        current_day not in ACTIVITY_SCHEDULE['ACTIVE_DAYS']:
-        return  # Not in active hours/days
+        return None, 'inactive_hours'  # Not in active hours/days
 
     # Check if we've already replied too many times to this post
-    post_id = comment.submission.id
-    if post_id in posts_replied_to and posts_replied_to[post_id] >= MAX_REPLY_PER_POST:
-        return
+    if get_session_counters().replies_to(comment.post_id) >= MAX_REPLY_PER_POST:
+        return None, 'post_limit'
+
+    # Find target, avoid and destination keywords in a single pass over the comment
+    keyword_matches = get_keyword_matcher().scan(comment.body_lower, lowered=True)
 
     # Check if comment contains target keywords
-    if (
-        contains_target_keywords(comment.body)
-        and comment.id not in comments_replied_to
-        and comment.author != reddit_instance.user.me()
-        and len(comment.body) >= CONTENT_MODERATION['MIN_COMMENT_LENGTH']
-        and not any(avoid_word in comment.body.lower() for avoid_word in CONTENT_MODERATION['AVOID_KEYWORDS'])
-    ):
-        # Log when the target string is found in a comment
+    if not keyword_matches['target']:
+        return None, 'no_keyword'
+    if keyword_matches['avoid']:
+        return None, 'avoid_keyword'
+    if comment.id in comments_replied_to:
+        return None, 'already_replied'
+    if len(comment.body) < CONTENT_MODERATION['MIN_COMMENT_LENGTH']:
+        return None, 'too_short'
+    if (comment.author or '').lower() == bot_username:
+        return None, 'own_comment'
+    # Keyword hit, but the comment as a whole isn't close enough to the subreddit's topics
+    if confidence is not None and confidence < CONTENT_MODERATION['MIN_CONFIDENCE']:
+        return None, 'low_confidence'
+    return keyword_matches, None
+
+# Function to log a qualifying comment
+def log_keyword_match(comment, subreddit_name, keyword_matches):
+    # Log when the target string is found in a comment
+    if TRACKING_SETTINGS['LOG_KEYWORDS']:
+        logger.info(f"Target keyword found in comment {comment.id} in r/{subreddit_name}: "
+                    f"{', '.join(sorted(keyword_matches['target']))}")
+    else:
         logger.info(f"Target keyword found in comment {comment.id} in r/{subreddit_name}")
 
-        # Randomly decide whether to respond based on response rate
-        if random.random() > ENGAGEMENT_STRATEGY['RESPONSE_RATE']:
-            return  # Skip this response based on probability
+# Function to get the part of a reply that is compared for duplicates (the optional journal P.S. is left out)
+def duplicate_check_text(response):
+    return response.removesuffix(JOURNAL_MENTION)
 
-        # Generate a contextual response
-        response = generate_response(comment, True)
+# Function to pick the final reply text, avoiding one posted within the duplicate window
+def select_unique_response(comment, keyword_matches, response):
+    """
+    Finalized `response`, or, if it is a near-duplicate of a recent reply, a finalized unused template instead.
+    The text is reserved for the comment until record_reply commits it or release_response drops it.
+    Returns None when every candidate was used recently.
+    """
+    if not REPLY_DEDUP['ENABLED']:
+        return finalize_response(response)
+    reply_index = get_reply_index()
+    final_response = finalize_response(response)
+    if reply_index.reserve(comment.id, duplicate_check_text(final_response)):
+        return final_response
+    for alternative in fallback_alternatives(comment.body, keyword_matches['destination']):
+        if alternative == response:
+            continue
+        final_response = finalize_response(alternative)
+        if reply_index.reserve(comment.id, duplicate_check_text(final_response)):
+            metrics.DUPLICATE_RESPONSES.inc(outcome='replaced')
+            return final_response
+    metrics.DUPLICATE_RESPONSES.inc(outcome='skipped')
+    logger.info(f"Every response for comment {comment.id} repeats a recent reply; skipping it.")
+    return None
+
+# Function to drop the reply reserved for a comment that wasn't posted (no-op once it was recorded)
+def release_response(comment):
+    if REPLY_DEDUP['ENABLED']:
+        get_reply_index().release(comment.id)
+
+JOURNAL_MENTION = (
+    "\n\nP.S. I create these fun, crayon-style travel journals that make planning more enjoyable. "
+    "Would love to create one for your trip if you'd find it helpful!"
+)
 
-        # Add visual journal mention based on probability
-        if RESPONSE_SETTINGS['INCLUDE_VISUAL_JOURNAL_MENTION'] and \
-           random.random() < RESPONSE_SETTINGS['JOURNAL_MENTION_PROBABILITY']:
-            journal_mention = (
-                "\n\nP.S. I create these fun, crayon-style travel journals that make planning more enjoyable. "
-                "Would love to create one for your trip if you'd find it helpful!"
-            )
-            response += journal_mention
+# Function to add the optional journal mention and enforce the length limit
+def finalize_response(response):
+    # Add visual journal mention based on probability
+    if RESPONSE_SETTINGS['INCLUDE_VISUAL_JOURNAL_MENTION'] and \
+       random.random() < RESPONSE_SETTINGS['JOURNAL_MENTION_PROBABILITY']:
+        response += JOURNAL_MENTION
 
-        # Make sure response is not too long
-        if len(response) > CONTENT_MODERATION['MAX_RESPONSE_LENGTH']:
-            response = response[:CONTENT_MODERATION['MAX_RESPONSE_LENGTH']-3] + "..."
+    # Make sure response is not too long
+    if len(response) > CONTENT_MODERATION['MAX_RESPONSE_LENGTH']:
+        response = response[:CONTENT_MODERATION['MAX_RESPONSE_LENGTH']-3] + "..."
+    return response
 
-        # Reply to the comment
-        try:
-            comment.reply(response)
-            # Log that the bot has replied to the comment
-            logger.info(f"Replied to comment {comment.id}")
-
-            # Update session counters
-            session_comments_count += 1
-            if post_id not in posts_replied_to:
-                posts_replied_to[post_id] = 0
-            posts_replied_to[post_id] += 1
-
-            # Add the comment ID to the list of comments replied to
-            comments_replied_to.append(comment.id)
-
-            # Save the comment ID to the file with timestamp
-            with open("comments_replied_to.txt", "a") as f:
-                f.write(f"{dt.datetime.now().isoformat()}|{comment.id}|{subreddit_name}|{comment.body[:50]}...\n")
-
-            # Add a small delay between responses to seem more natural
-            time.sleep(random.randint(ACTIVITY_SCHEDULE['MIN_RESPONSE_DELAY'],
-                                     ACTIVITY_SCHEDULE['MAX_RESPONSE_DELAY']))
-        except prawcore.exceptions.Forbidden as forbidden_error:
-            logger.warning(f"Permission error for comment {comment.id}: {forbidden_error}. Skipping.")
-        except Exception as reply_error:
-            logger.exception(f"Error while replying to comment {comment.id}: {reply_error}")
+# Function to update counters and history after a successful reply
+def record_reply(comment, comments_replied_to, subreddit_name, response=None):
+    # Update session counters
+    get_session_counters().record(comment.post_id)
+
+    # Record the reply in the history store (buffered; also persists per-post counters when supported)
+    comments_replied_to.add(comment.id, subreddit_name, comment.body, post_id=comment.post_id)
+
+    # Only posted replies count against the duplicate window
+    if REPLY_DEDUP['ENABLED'] and response is not None:
+        get_reply_index().commit(comment.id, duplicate_check_text(response))
+
+# Function to process a single comment
+def process_single_comment(comment, comments_replied_to, subreddit_name, reddit_instance, confidence=None):
+    """
+    Evaluate a CommentRecord and reply to it if it qualifies.
+    """
+    keyword_matches, _ = qualify_comment(comment, comments_replied_to, get_bot_username(reddit_instance),
+                                         confidence)
+    if keyword_matches is None:
+        return
+
+    log_keyword_match(comment, subreddit_name, keyword_matches)
+
+    # Randomly decide whether to respond based on response rate
+    if random.random() > ENGAGEMENT_STRATEGY['RESPONSE_RATE']:
+        metrics.COMMENTS_REJECTED.inc(reason='response_rate')
+        return  # Skip this response based on probability
+
+    # Generate a contextual response that doesn't repeat a recent reply
+    response = select_unique_response(comment, keyword_matches, generate_response(comment, keyword_matches))
+    if response is None:
+        return
+
+    # Reply to the comment
+    try:
+        # Only now build a PRAW object for the comment we reply to
+        with metrics.STAGE_SECONDS.time(stage='reply'):
+            get_request_scheduler().call(comment.to_praw(reddit_instance).reply, response,
+                                         reason='reply', idempotent=False, reddit_instance=reddit_instance)
+        # Log that the bot has replied to the comment
+        logger.info(f"Replied to comment {comment.id}")
+        metrics.REPLIES.inc(outcome='posted')
+
+        record_reply(comment, comments_replied_to, subreddit_name, response)
+
+        # Add a small delay between responses to seem more natural
+        metrics.sleep(random.randint(ACTIVITY_SCHEDULE['MIN_RESPONSE_DELAY'],
+                                     ACTIVITY_SCHEDULE['MAX_RESPONSE_DELAY']), 'reply_spacing')
+    except prawcore.exceptions.Forbidden as forbidden_error:
+        metrics.REPLIES.inc(outcome='forbidden')
+        logger.warning(f"Permission error for comment {comment.id}: {forbidden_error}. Skipping.")
+    except praw.exceptions.APIException as api_exception:
+        metrics.REPLIES.inc(outcome='api_error')
+        handle_rate_limit(api_exception)
+    except Exception as reply_error:
+        metrics.REPLIES.inc(outcome='error')
+        logger.exception(f"Error while replying to comment {comment.id}: {reply_error}")
+    finally:
+        release_response(comment)
 
 # Function to get saved comments
 def get_saved_comments():
-    if not os.path.isfile("comments_replied_to.txt"):
-        # If the file doesn't exist, initialize an empty list
-        comments_replied_to = []
-    else:
-        # Read the file and create a list of comments (excluding empty lines)
-        with open("comments_replied_to.txt", "r") as f:
-            comments_replied_to = [line.split('|')[1] for line in f.readlines() if line.strip() and '|' in line]  # Extract just the comment ID
-
-    return comments_replied_to
+    # Stream the history file into the configured store for O(1) lookups
+    # Only the configured backend is imported
+    if HISTORY_STORE['BACKEND'] == 'index':
+        from comment_index import CompactReplyIndex
+        return CompactReplyIndex()
+    if HISTORY_STORE['BACKEND'] == 'sqlite':
+        from state_store import SQLiteStateStore
+        return SQLiteStateStore()
+    if HISTORY_STORE['BACKEND'] == 'jsonl':
+        from activity_log import ActivityLogStore
+        return ActivityLogStore()
+    return ReplyStore()
 
 # Main block to execute the bot
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crayon Travel Helper Reddit bot")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="run the asyncio runtime (asyncpraw) instead of the synchronous loop")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="report per-module import times and the time to the first poll, then exit")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        startup_profile.print_report(startup_profile.profile_startup(__file__, ['--async'] if args.use_async else []))
+        sys.exit(0)
+
+    # Expose /metrics for Prometheus while the worker runs (see METRICS in advanced_config.py)
+    metrics.start_metrics_server()
+    # `kill -USR1 <pid>` profiles the next cycle(s) (see PROFILING in advanced_config.py)
+    if PROFILING['ENABLED']:
+        get_cycle_profiler().install_signal_handler()
+
+    if args.use_async:
+        import async_bot
+        async_bot.run()
+        sys.exit(0)
+
     # Log in to Reddit
     reddit_instance = bot_login()
     # Get the list of comments the bot has replied to from the file
     comments_replied_to = get_saved_comments()
+    # Flush the history on SIGTERM and at exit too, not only on Ctrl+C
+    close_on_exit(comments_replied_to)
     # Log the number of comments replied to
     logger.info(f"Number of comments replied to: {len(comments_replied_to)}")
+    logger.info(f"Reply history store: {comments_replied_to.stats()}")
+    # Restore session counters (only the SQLite store keeps them across restarts)
+    get_session_counters().load(comments_replied_to.load_counters())
+    comment_pipeline = None
+    if PIPELINE_SETTINGS['ENABLED']:
+        from pipeline import CommentPipeline
+        comment_pipeline = CommentPipeline(reddit_instance, comments_replied_to)
 
     # Run the bot in an infinite loop
     while True:
         try:
             # Attempt to run the bot
-            run_bot(reddit_instance, comments_replied_to)
+            run_bot(reddit_instance, comments_replied_to, comment_pipeline)
         except Exception as e:
             # Log any general exceptions and sleep for the specified duration
             logger.exception(f"An error occurred: {e}")
-            time.sleep(int(SLEEP_DURATION))  # Add a sleep after catching general exceptions
+            metrics.sleep(int(SLEEP_DURATION), 'cycle_pause')  # Add a sleep after catching general exceptions
         except KeyboardInterrupt:
-            logger.info("Bot terminated by user.")
+            logger.info("Bot terminated.")
             break
+    # Make sure buffered history lines reach the disk
+    if comment_pipeline is not None:
+        # Lets the reply being posted finish and be recorded before the store is closed
+        comment_pipeline.close()
+    else:
+        comments_replied_to.close()
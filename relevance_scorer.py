@@ -0,0 +1,144 @@
+"""
+Batch relevance scoring for the travel engagement bot.
+Every comment of a listing is vectorized at once with hashing TF-IDF and
+compared with a relevance profile of its subreddit (the subreddit's context
+file plus the target and destination keywords) in a single NumPy matrix
+product. Keyword matches whose confidence is below
+CONTENT_MODERATION['MIN_CONFIDENCE'] are not sent to generation.
+"""
+
+import zlib
+import logging
+import threading
+import importlib.util
+
+import config
+import metrics
+from advanced_config import RELEVANCE_SCORING
+from context_registry import get_context_registry
+from context_retrieval import tokenize
+from destination_router import get_destination_router
+
+logger = logging.getLogger(__name__)
+
+
+def hash_tokens(text, features):
+    """
+    Feature indices of the tokens of `text` (stable across runs, unlike hash()).
+    """
+    mask = features - 1
+    return [zlib.crc32(token.encode('utf-8')) & mask for token in tokenize(text)]
+
+
+class RelevanceScorer:
+    """
+    Scores comments against per-subreddit relevance profiles.
+
+    Documents are hashed into `features` buckets (a power of two); only the
+    buckets that occur in a batch become matrix columns, so the matrix stays
+    small whatever the hash space. IDF is computed over the batch and the
+    profiles together, so words that are everywhere in the listing count for little.
+    """
+
+    def __init__(self, registry=None, features=None, full_confidence_similarity=None):
+        # NumPy itself is imported on the first score() call, keeping it off the startup path
+        if importlib.util.find_spec('numpy') is None:
+            raise ImportError("NumPy is required for relevance scoring")
+        self.registry = registry or get_context_registry()
+        self.features = features or RELEVANCE_SCORING['HASH_FEATURES']
+        if self.features & (self.features - 1):
+            raise ValueError(f"HASH_FEATURES must be a power of two, got {self.features}")
+        self.full_confidence_similarity = full_confidence_similarity or RELEVANCE_SCORING['FULL_CONFIDENCE_SIMILARITY']
+        self._lock = threading.Lock()
+        self._version = None
+        self._keyword_key = None
+        self._keyword_buckets = []
+        self._file_buckets = {}
+
+    def _profile_buckets(self, subreddit_name):
+        """
+        Hashed tokens of a subreddit's profile: its context file plus the keywords.
+        """
+        keywords = tuple(config.TARGET_STRINGS) + get_destination_router().terms
+        with self._lock:
+            if self._version != self.registry.version:
+                self._file_buckets = {}
+                self._version = self.registry.version
+            if keywords != self._keyword_key:
+                self._keyword_buckets = hash_tokens(' '.join(keywords), self.features)
+                self._keyword_key = keywords
+            file_name = self.registry.file_for(subreddit_name)
+            buckets = self._file_buckets.get(file_name)
+            if buckets is None:
+                buckets = self._file_buckets[file_name] = hash_tokens(self.registry.get(subreddit_name), self.features)
+            return buckets + self._keyword_buckets
+
+    def score(self, texts, subreddit_names):
+        """
+        Confidence (0-1) that each text is relevant to the subreddit at the same position.
+        """
+        import numpy as np
+
+        profile_names = sorted({name.lower() for name in subreddit_names})
+        profile_of = {name: position for position, name in enumerate(profile_names)}
+        documents = [hash_tokens(text, self.features) for text in texts]
+        documents += [self._profile_buckets(name) for name in profile_names]
+
+        lengths = np.fromiter((len(buckets) for buckets in documents), dtype=np.int64, count=len(documents))
+        buckets = np.fromiter((bucket for document in documents for bucket in document),
+                              dtype=np.int64, count=int(lengths.sum()))
+        # Keep only the buckets present in this batch as columns
+        columns, column_of = np.unique(buckets, return_inverse=True)
+        rows = np.repeat(np.arange(len(documents)), lengths)
+        counts = np.zeros((len(documents), len(columns)), dtype=np.float32)
+        np.add.at(counts, (rows, column_of), 1.0)
+
+        # Sublinear TF, smoothed IDF, L2-normalized rows
+        document_frequency = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        weights = np.log1p(counts) * idf.astype(np.float32)
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        weights /= np.where(norms > 0, norms, 1)
+
+        comments, profiles = weights[:len(texts)], weights[len(texts):]
+        similarity = comments @ profiles.T
+        own_profile = np.fromiter((profile_of[name.lower()] for name in subreddit_names),
+                                  dtype=np.int64, count=len(texts))
+        own_similarity = similarity[np.arange(len(texts)), own_profile]
+        return np.clip(own_similarity / self.full_confidence_similarity, 0.0, 1.0)
+
+
+_relevance_scorer = None
+_numpy_missing = False
+
+
+def get_relevance_scorer():
+    """
+    Shared scorer, or None when NumPy isn't installed (scoring is then skipped).
+    """
+    global _relevance_scorer, _numpy_missing
+    if _relevance_scorer is None and not _numpy_missing:
+        try:
+            _relevance_scorer = RelevanceScorer()
+        except ImportError:
+            _numpy_missing = True
+            logger.warning("NumPy is not installed; relevance scoring (MIN_CONFIDENCE) is disabled.")
+    return _relevance_scorer
+
+
+def score_comments(records, route):
+    """
+    Relevance confidence of every record routed to one of our subreddits, keyed by comment ID.
+    Empty when scoring is disabled, so no comment is held back by MIN_CONFIDENCE.
+    """
+    if not RELEVANCE_SCORING['ENABLED']:
+        return {}
+    routed = [(record, route[record.subreddit.lower()]) for record in records if record.subreddit.lower() in route]
+    scorer = get_relevance_scorer() if routed else None
+    if scorer is None:
+        return {}
+    with metrics.STAGE_SECONDS.time(stage='score'):
+        confidences = scorer.score([record.body for record, _ in routed], [name for _, name in routed])
+    for confidence in confidences:
+        metrics.RELEVANCE_CONFIDENCE.observe(float(confidence))
+    return {record.id: float(confidence) for (record, _), confidence in zip(routed, confidences)}
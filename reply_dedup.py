@@ -0,0 +1,201 @@
+"""
+Near-duplicate detection for outgoing replies.
+Each reply gets a 64-bit SimHash fingerprint. Fingerprints of the replies
+posted within RESPONSE_SETTINGS['DUPLICATE_RESPONSE_WINDOW'] hours are kept
+in banded LSH buckets, so a candidate reply is checked against only the few
+fingerprints that share a band with it, however long the history is.
+Entries expire at the window boundary.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+
+from advanced_config import RESPONSE_SETTINGS, REPLY_DEDUP
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text):
+    """
+    64-bit SimHash of the word bigrams of `text` (single words for one-word texts).
+    """
+    words = _WORD_RE.findall(text.lower())
+    features = [' '.join(pair) for pair in zip(words, words[1:])] or words
+    if not features:
+        return 0
+    # One bit string per feature; counting the '1's of each column is a per-bit majority vote
+    bits = [format(_feature_hash(feature), '064b') for feature in features]
+    half = len(bits) / 2
+    fingerprint = 0
+    for column in zip(*bits):
+        fingerprint = (fingerprint << 1) | (column.count('1') > half)
+    return fingerprint
+
+
+class ReplyIndex:
+    """
+    Time-windowed index of reply fingerprints.
+
+    The fingerprint is cut into `max_distance + 1` bands: two fingerprints
+    within `max_distance` bits of each other agree on at least one whole band,
+    so looking up each band's bucket finds every near-duplicate.
+    """
+
+    def __init__(self, file_path=None, window_seconds=None, max_distance=None):
+        self.file_path = file_path or REPLY_DEDUP['FILE']
+        self.window_seconds = window_seconds or RESPONSE_SETTINGS['DUPLICATE_RESPONSE_WINDOW'] * 3600
+        self.max_distance = max_distance if max_distance is not None else REPLY_DEDUP['MAX_DISTANCE']
+        bands = self.max_distance + 1
+        if not 0 < bands <= FINGERPRINT_BITS:
+            raise ValueError(f"MAX_DISTANCE must be between 0 and {FINGERPRINT_BITS - 1}")
+        # Band boundaries as (shift, mask); the first bands take any remainder bits
+        width, extra = divmod(FINGERPRINT_BITS, bands)
+        self._bands = []
+        shift = FINGERPRINT_BITS
+        for band in range(bands):
+            size = width + (1 if band < extra else 0)
+            shift -= size
+            self._bands.append((shift, (1 << size) - 1))
+        self._buckets = [{} for _ in self._bands]
+        # (created_at, fingerprint) of posted replies, oldest first
+        self._entries = deque()
+        # Comment ID -> fingerprint of a reply chosen but not posted yet (kept in memory only)
+        self._reserved = {}
+        self._lock = threading.Lock()
+        self._checks = 0
+        self._duplicates = 0
+        self._load()
+
+    # Persistence
+
+    def _load(self):
+        if not os.path.isfile(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read reply fingerprints from {self.file_path}: {e}. Starting empty.")
+            return
+        cutoff = time.time() - self.window_seconds
+        for created_at, fingerprint in sorted(entries):
+            if created_at > cutoff:
+                self._insert(created_at, int(fingerprint))
+
+    def _save(self):
+        tmp_path = self.file_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump([[created_at, fingerprint] for created_at, fingerprint in self._entries], f)
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            logger.warning(f"Could not save reply fingerprints to {self.file_path}: {e}")
+
+    # Index
+
+    def _band_keys(self, fingerprint):
+        return [(fingerprint >> shift) & mask for shift, mask in self._bands]
+
+    def _insert(self, created_at, fingerprint):
+        self._entries.append((created_at, fingerprint))
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            bucket.setdefault(key, []).append(fingerprint)
+
+    def _expire(self, now):
+        """
+        Drop the entries that fell out of the window (they are the oldest, at the left).
+        """
+        cutoff = now - self.window_seconds
+        while self._entries and self._entries[0][0] <= cutoff:
+            _, fingerprint = self._entries.popleft()
+            for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+                fingerprints = bucket[key]
+                fingerprints.remove(fingerprint)
+                if not fingerprints:
+                    del bucket[key]
+
+    def _find(self, fingerprint):
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            for candidate in bucket.get(key, ()):
+                if (candidate ^ fingerprint).bit_count() <= self.max_distance:
+                    return True
+        return False
+
+    def _find_reserved(self, fingerprint, key):
+        return any((reserved ^ fingerprint).bit_count() <= self.max_distance
+                   for other, reserved in self._reserved.items() if other != key)
+
+    def reserve(self, key, text):
+        """
+        Hold `text` for `key` (a comment ID) unless it is a near-duplicate of a reply in the window
+        or of a reply reserved for another comment. Checking and reserving happen under one lock,
+        so two workers can't both pick the same text. Returns True when the text was reserved.
+        """
+        fingerprint = simhash(text)
+        with self._lock:
+            self._expire(time.time())
+            self._checks += 1
+            if self._find(fingerprint) or self._find_reserved(fingerprint, key):
+                self._duplicates += 1
+                return False
+            self._reserved[key] = fingerprint
+            return True
+
+    def release(self, key):
+        """
+        Drop the reservation of `key`, e.g. because its reply couldn't be posted.
+        """
+        with self._lock:
+            self._reserved.pop(key, None)
+
+    def commit(self, key, text):
+        """
+        Record `text` as posted for `key`; it counts as a duplicate until it leaves the window.
+        """
+        fingerprint = simhash(text)
+        now = time.time()
+        with self._lock:
+            self._reserved.pop(key, None)
+            self._expire(now)
+            self._insert(now, fingerprint)
+            self._save()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'reserved': len(self._reserved),
+                'checks': self._checks,
+                'duplicates': self._duplicates,
+                'window_hours': self.window_seconds / 3600,
+            }
+
+
+_reply_index = None
+
+
+def get_reply_index():
+    """
+    Shared reply index, loaded on first use.
+    """
+    global _reply_index
+    if _reply_index is None:
+        _reply_index = ReplyIndex()
+    return _reply_index
@@ -0,0 +1,236 @@
+"""
+Replied-comment history store for the travel engagement bot.
+Keeps the IDs of comments we already answered in a set for O(1) lookups and
+appends new entries to the history file through a buffered writer.
+"""
+
+import os
+import sys
+import time
+import atexit
+import signal
+import logging
+import threading
+from datetime import datetime
+
+from advanced_config import HISTORY_STORE, TRACKING_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Reddit comment IDs are short base36 strings
+VALID_ID_CHARS = set('0123456789abcdefghijklmnopqrstuvwxyz')
+
+
+def is_valid_comment_id(comment_id):
+    """
+    Check that a string looks like a Reddit base36 comment ID.
+    """
+    return 0 < len(comment_id) <= 12 and all(c in VALID_ID_CHARS for c in comment_id)
+
+
+def parse_history_line(line):
+    """
+    Extract the comment ID from a `timestamp|id|subreddit|excerpt` history line.
+    Returns None for blank or malformed lines.
+    """
+    parts = line.split('|', 2)
+    if len(parts) < 2:
+        return None
+    comment_id = parts[1].strip()
+    return comment_id if is_valid_comment_id(comment_id) else None
+
+
+def iter_history_ids(file_path):
+    """
+    Stream comment IDs from the history file one line at a time.
+    """
+    if not os.path.isfile(file_path):
+        return
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            comment_id = parse_history_line(line)
+            if comment_id:
+                yield comment_id
+
+
+def format_history_line(comment_id, subreddit_name, comment_body):
+    """
+    Format a history entry in the `timestamp|id|subreddit|excerpt` layout.
+    Separators and newlines are stripped from the excerpt so the line stays parseable.
+    """
+    excerpt = (comment_body or '')[:50].replace('|', ' ').replace('\r', ' ').replace('\n', ' ')
+    return f"{datetime.now().isoformat()}|{comment_id}|{subreddit_name}|{excerpt}...\n"
+
+
+class ReplyStore:
+    """
+    Set-backed view of the replied-comment history with buffered appends.
+
+    The fsync policy controls durability of appended lines:
+    'always' flushes and fsyncs after every reply, 'interval' flushes once
+    FLUSH_INTERVAL seconds have passed or BUFFER_SIZE lines are pending,
+    and 'never' leaves flushing to the OS and close().
+    """
+
+    def __init__(self, file_path=None, fsync_policy=None, flush_interval=None, buffer_size=None):
+        self.file_path = file_path or TRACKING_SETTINGS['HISTORY_FILE']
+        self.fsync_policy = fsync_policy or HISTORY_STORE['FSYNC_POLICY']
+        self.flush_interval = flush_interval if flush_interval is not None else HISTORY_STORE['FLUSH_INTERVAL']
+        self.buffer_size = buffer_size if buffer_size is not None else HISTORY_STORE['BUFFER_SIZE']
+        if self.fsync_policy not in ('always', 'interval', 'never'):
+            raise ValueError(f"Unknown fsync policy: {self.fsync_policy}")
+
+        self._ids = set()
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._handle = None
+        self._load()
+
+    def _load(self):
+        for comment_id in iter_history_ids(self.file_path):
+            self._remember(comment_id)
+
+    def _remember(self, comment_id):
+        self._ids.add(comment_id)
+
+    def _has(self, comment_id):
+        return comment_id in self._ids
+
+    def __contains__(self, comment_id):
+        return self._has(comment_id)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def stats(self):
+        """
+        Rough memory footprint of the in-memory ID set.
+        """
+        return {
+            'backend': 'set',
+            'entries': len(self),
+            'set_bytes': sys.getsizeof(self._ids) + sum(sys.getsizeof(i) for i in self._ids),
+        }
+
+    def load_counters(self):
+        """
+        Session counters are not persisted by the text history; start empty.
+        """
+        return 0, {}
+
+    def reset_counters(self):
+        """
+        Nothing to reset; counters live in the bot process for this backend.
+        """
+
+    def add(self, comment_id, subreddit_name='', comment_body='', post_id=None):
+        """
+        Record that we replied to a comment and queue its history line.
+        """
+        if self._has(comment_id):
+            return
+        self._remember(comment_id)
+        self._pending.append(self._format(comment_id, subreddit_name, comment_body, post_id))
+
+        if self.fsync_policy == 'always':
+            self.flush(sync=True)
+        elif self.fsync_policy == 'interval' and (
+            len(self._pending) >= self.buffer_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush(sync=True)
+        elif len(self._pending) >= self.buffer_size:
+            self.flush()
+
+    def _format(self, comment_id, subreddit_name, comment_body, post_id):
+        return format_history_line(comment_id, subreddit_name, comment_body)
+
+    def append(self, comment_id):
+        """
+        List-style alias kept for callers that treated the history as a list.
+        """
+        self.add(comment_id)
+
+    def flush(self, sync=False):
+        """
+        Write pending history lines to disk, optionally forcing an fsync.
+        """
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        self._write(self._pending, sync)
+        self._pending = []
+
+    def _write(self, lines, sync):
+        if self._handle is None:
+            self._handle = open(self.file_path, 'a', encoding='utf-8')
+        self._handle.writelines(lines)
+        self._handle.flush()
+        if sync:
+            os.fsync(self._handle.fileno())
+
+    def close(self):
+        """
+        Flush everything and release the file handle.
+        """
+        self.flush(sync=self.fsync_policy != 'never')
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def close_on_exit(store):
+    """
+    Close `store` however the process ends: at interpreter exit, and on SIGTERM
+    (e.g. a platform redeploy), which is handled like Ctrl+C so the bot's own shutdown path runs.
+    Lines still buffered at exit would be lost and those comments answered again.
+    """
+    atexit.register(store.close)
+    # Signal handlers can only be installed from the main thread
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+
+def compact_history(file_path=None):
+    """
+    Rewrite the history file without malformed or duplicate lines.
+    The first occurrence of each comment ID wins. Must be run while the bot is stopped.
+    Returns a (kept, dropped) tuple.
+    """
+    file_path = file_path or TRACKING_SETTINGS['HISTORY_FILE']
+    if not os.path.isfile(file_path):
+        return 0, 0
+
+    seen = set()
+    kept = dropped = 0
+    tmp_path = file_path + '.compact'
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as src, \
+            open(tmp_path, 'w', encoding='utf-8') as dst:
+        for line in src:
+            comment_id = parse_history_line(line)
+            if comment_id is None or comment_id in seen:
+                dropped += 1
+                continue
+            seen.add(comment_id)
+            dst.write(line if line.endswith('\n') else line + '\n')
+            kept += 1
+        dst.flush()
+        os.fsync(dst.fileno())
+
+    os.replace(tmp_path, file_path)
+    return kept, dropped
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'compact':
+        target = sys.argv[2] if len(sys.argv) > 2 else None
+        kept, dropped = compact_history(target)
+        print(f"Compaction finished: kept {kept} entries, dropped {dropped} malformed or duplicate lines.")
+    else:
+        print("Usage: python reply_store.py compact [history_file]")
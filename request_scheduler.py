@@ -0,0 +1,238 @@
+"""
+Rate-limit-aware request scheduler for Reddit API calls.
+Paces calls from the X-Ratelimit-* headers Reddit sends back, and retries
+transient failures with jittered exponential backoff under a retry budget.
+"""
+
+import re
+import time
+import random
+import logging
+import threading
+
+import prawcore
+
+import metrics
+from advanced_config import API_RATE_LIMIT, REQUEST_RETRY
+from rate_limiter import get_api_limiter
+
+logger = logging.getLogger(__name__)
+
+# Failures worth retrying: 5xx responses, connection errors/timeouts and 429s
+RETRYABLE_ERRORS = (
+    prawcore.exceptions.ServerError,
+    prawcore.exceptions.RequestException,
+    prawcore.exceptions.TooManyRequests,
+)
+
+
+class RequestScheduler:
+    """
+    Wraps API calls with pacing, header feedback and retries.
+
+    After every response the remaining request budget reported by Reddit is
+    spread evenly over the rest of the rate-limit window by adjusting the shared
+    token bucket. Idempotent calls (listing fetches) are retried on transient
+    errors; non-idempotent calls (replies) are only retried on 429, where Reddit
+    guarantees the request was not processed.
+    """
+
+    def __init__(self, limiter=None, max_retries=None, base_delay=None, max_delay=None,
+                 budget_ratio=None, min_budget=None):
+        self.limiter = limiter or get_api_limiter()
+        self.max_retries = max_retries if max_retries is not None else REQUEST_RETRY['MAX_RETRIES']
+        self.base_delay = base_delay if base_delay is not None else REQUEST_RETRY['BASE_DELAY']
+        self.max_delay = max_delay if max_delay is not None else REQUEST_RETRY['MAX_DELAY']
+        self.budget_ratio = budget_ratio if budget_ratio is not None else REQUEST_RETRY['BUDGET_RATIO']
+        self.min_budget = min_budget if min_budget is not None else REQUEST_RETRY['MIN_BUDGET']
+        self.max_rate = API_RATE_LIMIT['REQUESTS_PER_MINUTE'] / 60.0
+
+        self._lock = threading.Lock()
+        self._retry_budget = float(self.min_budget)
+        self._retries = 0
+        self._budget_exhausted = 0
+        self._failures = 0
+        self._remaining = None
+        self._reset_at = None
+
+    # Header feedback
+
+    def observe(self, reddit_instance):
+        """
+        Read the latest X-Ratelimit-Remaining/Reset values (tracked by prawcore) and repace.
+        """
+        # prawcore keeps these on its private Session._rate_limiter; there is no public accessor,
+        # so this silently stops pacing from headers if a prawcore release renames them
+        rate_limiter = getattr(getattr(reddit_instance, '_core', None), '_rate_limiter', None)
+        remaining = getattr(rate_limiter, 'remaining', None)
+        reset_at = getattr(rate_limiter, 'reset_timestamp', None)
+        if remaining is None or reset_at is None:
+            return
+        self.update_budget(remaining, reset_at - time.time())
+
+    def update_budget(self, remaining, seconds_to_reset):
+        """
+        Spread `remaining` requests across the `seconds_to_reset` left in the window.
+        """
+        seconds_to_reset = max(seconds_to_reset, 1.0)
+        with self._lock:
+            self._remaining = remaining
+            self._reset_at = time.time() + seconds_to_reset
+        rate = max(remaining, 0) / seconds_to_reset
+        # Never go faster than the configured ceiling; when the budget is gone, wait out the window.
+        # Tokens saved up earlier would otherwise still let a burst through into an exhausted window.
+        self.limiter.set_rate(min(max(rate, 1.0 / seconds_to_reset), self.max_rate),
+                              max_tokens=max(remaining, 0))
+
+    # Retry budget
+
+    def _record_success(self):
+        with self._lock:
+            self._retry_budget = min(self._retry_budget + self.budget_ratio,
+                                     max(self.min_budget, self.max_retries * 10))
+
+    def _take_retry_token(self):
+        with self._lock:
+            if self._retry_budget < 1:
+                self._budget_exhausted += 1
+                return False
+            self._retry_budget -= 1
+            self._retries += 1
+            return True
+
+    def _backoff(self, attempt, error):
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, 1)
+            except ValueError:
+                pass
+        # Full jitter: uniform between 0 and the capped exponential delay
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    # Calls
+
+    def _observe(self, reason, started, outcome):
+        metrics.API_CALLS.inc(reason=reason, outcome=outcome)
+        metrics.API_SECONDS.observe(time.monotonic() - started, reason=reason)
+
+    def _retry_delay(self, error, attempt, idempotent, reddit_instance):
+        """
+        Seconds to wait before retrying a failed call, or None if it must not be retried.
+        """
+        with self._lock:
+            self._failures += 1
+        if reddit_instance is not None:
+            self.observe(reddit_instance)
+        # A 429 means Reddit did not process the request, so even replies can be re-sent
+        retry_safe = idempotent or type(error).__name__ == 'TooManyRequests'
+        if not retry_safe or attempt >= self.max_retries or not self._take_retry_token():
+            return None
+        delay = self._backoff(attempt, error)
+        logger.warning(f"API call failed ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def call(self, func, *args, reason='api', idempotent=True, reddit_instance=None, **kwargs):
+        """
+        Run `func(*args, **kwargs)` as one paced API call, retrying transient failures.
+        """
+        attempt = 0
+        while True:
+            wait = self.limiter.acquire(reason=reason)
+            if wait > 0:
+                metrics.SLEEP_SECONDS.inc(wait, cause='rate_limiter')
+            started = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except RETRYABLE_ERRORS as error:
+                self._observe(reason, started, 'retryable_error')
+                delay = self._retry_delay(error, attempt, idempotent, reddit_instance)
+                if delay is None:
+                    raise
+                attempt += 1
+                metrics.sleep(delay, 'retry_backoff')
+                continue
+            except Exception:
+                self._observe(reason, started, 'error')
+                raise
+
+            self._observe(reason, started, 'ok')
+            self._record_success()
+            if reddit_instance is not None:
+                self.observe(reddit_instance)
+            return result
+
+    async def call_async(self, func, *args, reason='api', idempotent=True, reddit_instance=None,
+                         retryable=RETRYABLE_ERRORS, **kwargs):
+        """
+        Async counterpart of call() for coroutine functions (e.g. asyncpraw).
+        `retryable` lets the caller pass the asyncprawcore exception types.
+        """
+        import asyncio
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve(reason=reason)
+            if wait > 0:
+                metrics.SLEEP_SECONDS.inc(wait, cause='rate_limiter')
+                await asyncio.sleep(wait)
+            started = time.monotonic()
+            try:
+                result = await func(*args, **kwargs)
+            except retryable as error:
+                self._observe(reason, started, 'retryable_error')
+                delay = self._retry_delay(error, attempt, idempotent, reddit_instance)
+                if delay is None:
+                    raise
+                attempt += 1
+                metrics.SLEEP_SECONDS.inc(delay, cause='retry_backoff')
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                self._observe(reason, started, 'error')
+                raise
+
+            self._observe(reason, started, 'ok')
+            self._record_success()
+            if reddit_instance is not None:
+                self.observe(reddit_instance)
+            return result
+
+    def stats(self):
+        """
+        Retry counters and the last rate-limit state reported by Reddit.
+        """
+        with self._lock:
+            return {
+                'retries': self._retries,
+                'failures': self._failures,
+                'retry_budget': self._retry_budget,
+                'retry_budget_exhausted': self._budget_exhausted,
+                'ratelimit_remaining': self._remaining,
+                'ratelimit_reset_in': max(self._reset_at - time.time(), 0) if self._reset_at else None,
+            }
+
+
+_scheduler = None
+
+
+def get_request_scheduler():
+    """
+    Shared scheduler for all Reddit API calls made by this process.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler()
+    return _scheduler
+
+
+def parse_ratelimit_delay(message):
+    """
+    Seconds to wait from a Reddit RATELIMIT message such as
+    "you are doing that too much. try again in 5 minutes."
+    """
+    match = re.search(r'(\d+)\s*(second|minute|hour)', message or '')
+    if not match:
+        return None
+    value, unit = int(match.group(1)), match.group(2)
+    return value * {'second': 1, 'minute': 60, 'hour': 3600}[unit]
@@ -1,25 +1,55 @@
 """
 Response templates for the travel engagement bot.
-This file contains various response templates organized by destination/topic.
+This file contains the generation prompt and generic responses; destination-specific
+responses live in destinations.json (see destination_router.py).
 """
 
 import os
-from huggingface_hub import InferenceClient
-import requests
+import time
+import random
+import logging
+import threading
+
+from destination_router import get_destination_router
+from generation_cache import get_generation_cache, make_cache_key
+from generation_service import get_generation_service
+import metrics
+from advanced_config import GENERATION_CACHE, GENERATION_SERVICE, CONTENT_MODERATION
+
+logger = logging.getLogger(__name__)
 
 # Get Hugging Face token from environment
 HF_TOKEN = os.getenv('HF_TOKEN')
-if HF_TOKEN:
+# Optional text-generation endpoint URL (e.g. a dedicated endpoint, or bench/mock_inference.py for offline tests)
+HF_BASE_URL = os.getenv('HF_BASE_URL')
+if HF_TOKEN or HF_BASE_URL:
     # Using Qwen 2.5 7B as the primary model - good balance of quality and speed
     HF_MODEL = os.getenv('HF_MODEL', 'Qwen/Qwen2.5-7B-Instruct')
-    client = InferenceClient(token=HF_TOKEN, model=HF_MODEL)
     HF_ENABLED = True
 else:
     HF_ENABLED = False
     print("Warning: HF_TOKEN not found in environment variables. Hugging Face integration disabled.")
-    client = None
     HF_MODEL = None
 
+# huggingface_hub is imported and the client created on the first generation (see get_inference_client)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    """
+    Shared InferenceClient, created on first use so startup doesn't pay for the Hugging Face stack.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from huggingface_hub import InferenceClient
+                # The client timeout frees pool threads from hung requests; callers stop waiting at the deadline
+                _client = InferenceClient(token=HF_TOKEN, model=HF_BASE_URL or HF_MODEL,
+                                          timeout=GENERATION_SERVICE['REQUEST_TIMEOUT'])
+    return _client
+
 # Generic response templates
 GENERIC_RESPONSES = [
     "That's a great question! Based on my experience, here are some thoughts...",
@@ -34,137 +64,19 @@ GENERIC_RESPONSES = [
     "Excellent question! Here's what I think would work well for you..."
 ]
 
-# Tokyo-specific responses
-TOKYO_RESPONSES = [
-    "Tokyo is incredible but definitely overwhelming! Here's a solid 5-day breakdown:\n\n"
-    "Day 1: Shibuya/Harajuku (hit the famous crossing, explore Takeshita Street)\n"
-    "Day 2: Asakusa/Skytree (traditional temple vibes + modern views)\n"
-    "Day 3: Akihabara/Ueno (anime/tech heaven + museums)\n"
-    "Day 4: Day trip to Nikko or Kamakura\n"
-    "Day 5: Tsukiji Market morning + Ginza shopping\n\n"
-    "Pro tip: Get a Suica card first thing—makes train travel so much easier.\n\n"
-    "If you want, I can create a visual itinerary that maps this out in a more fun way than a boring list. "
-    "I've been making these crayon-style travel journals that people seem to enjoy. "
-    "Happy to make one for your Tokyo trip if you'd like to see what it looks like!",
-
-    "Tokyo can be intimidating for first-timers, but it's absolutely magical! A few highlights:\n\n"
-    "- The train system is your friend - download the Google Translate app for station announcements\n"
-    "- Don't miss the early morning Tsukiji tuna auction if it's still happening during your visit\n"
-    "- Take time to explore neighborhoods beyond the tourist areas like Yanaka\n"
-    "- For food, try the department store basements - they're like food paradises!\n\n"
-    "I specialize in creating visual travel plans that make navigating Tokyo easier. "
-    "Would love to help create a personalized guide for your trip!"
-]
-
-# Paris-specific responses
-PARIS_RESPONSES = [
-    "Oh, the food in Paris is unreal! Some favorites:\n\n"
-    "• L'As du Fallafel (Marais) - best falafel outside Israel\n"
-    "• Marché des Enfants Rouges - oldest covered market, amazing lunch spots\n"
-    "• Breizh Café - incredible crêpes in the Marais\n"
-    "• Any random boulangerie for croissants (seriously, they're all good)\n\n"
-    "Don't sleep on the neighborhood bistros—sometimes the best meals are the unplanned ones where you just wander in.\n\n"
-    "Are you planning a full Paris trip? I love helping visualize itineraries if you need help mapping out your days!",
-
-    "Paris is all about savoring the moment! Here are some non-obvious tips:\n\n"
-    "• Many museums are closed on Mondays - plan accordingly\n"
-    "• Visit Montmartre early morning to beat the crowds\n"
-    "• The promenade along the Seine has hidden gems - walk the full length\n"
-    "• For authentic experiences, eat dinner later like locals do (after 8pm)\n\n"
-    "I create these visual travel journals in a crayon style that make planning more enjoyable. "
-    "If you'd like, I could draft a visual itinerary for your Paris trip!"
-]
+# Sampling parameters passed to the text-generation endpoint
+GENERATION_PARAMETERS = {
+    'max_new_tokens': 300,
+    'temperature': 0.7,
+    'do_sample': True,
+    'stop': ["\n\n", "User:", "Comment:", "A Reddit user"],
+}
 
-# Japan general responses
-JAPAN_RESPONSES = [
-    "Japan is such an amazing country with unique customs! Here are some key things to know:\n\n"
-    "• Bow instead of handshake when greeting someone\n"
-    "• Slurping noodles is a sign of appreciation\n"
-    "• Tipping isn't customary and can be offensive\n"
-    "• Shoes come off indoors in homes and some restaurants\n"
-    "• Vending machines everywhere - even in remote locations!\n\n"
-    "I've been helping travelers plan Japan trips with visual itineraries. "
-    "Would you like me to create a personalized travel journal for your Japan adventure?",
-    
-    "One of the best aspects of Japan is the efficiency of everything! Some transportation tips:\n\n"
-    "• Get a Japan Rail Pass before arrival if you're traveling between cities\n"
-    "• Download Hyperdia or Japan Transit Planner for train schedules\n"
-    "• Suica/PASMO cards work on most city transportation\n"
-    "• Trains are punctual to the minute - be on time!\n\n"
-    "Creating a visual plan can make your Japan experience even smoother. "
-    "I specialize in crayon-style travel journals that make trip planning more engaging!"
-]
-
-# Europe/General travel responses
-EUROPE_RESPONSES = [
-    "European travel has some great money-saving tips! Here are essentials:\n\n"
-    "• Get a rail pass if traveling between countries\n"
-    "• Many museums offer free admission days\n"
-    "• Shop at local markets for budget-friendly meals\n"
-    "• City tourist cards often provide good value for attractions\n"
-    "• Book accommodations in advance during peak season\n\n"
-    "I create personalized visual travel plans that can make your European adventure more organized. "
-    "Would a crayon-style travel journal help with your planning?", 
-    
-    "Europe has such diverse cultures packed into a compact area! My top tips:\n\n"
-    "• Learn basic greetings in local languages\n"
-    "• Pack light - luggage on cobblestones is difficult\n"
-    "• Evening meals are later in Southern Europe\n"
-    "• Tipping customs vary significantly between countries\n"
-    "• Many sites are closed on Sundays/Mondays\n\n"
-    "I've been making visual trip planners that people find really helpful. "
-    "Would love to create one for your European trip!"
-]
 
-# Southeast Asia responses
-SEA_RESPONSES = [
-    "Southeast Asia is such an incredible region for culture and value! Here's what I recommend:\n\n"
-    "• Pack light - clothes dry quickly in the humidity\n"
-    "• Stay in locally-owned guesthouses for authentic experiences\n"
-    "• Eat street food - it's often the safest and tastiest option\n"
-    "• Negotiate tuk-tuk fares upfront\n"
-    "• Respect temple dress codes (covered shoulders/knees)\n\n"
-    "Visual planning can be super helpful in Southeast Asia. "
-    "I create these fun, crayon-style travel journals that help keep track of all the amazing places to visit!",
-
-    "The diversity within Southeast Asia is mind-blowing! Some unique insights:\n\n"
-    "• Bargain respectfully at markets (it's expected!)\n"
-    "• Mosquito protection is essential, especially during rainy season\n"
-    "• Transportation varies dramatically between countries\n"
-    "• Tipping etiquette differs by country\n"
-    "• Many credit cards charge foreign transaction fees\n\n"
-    "If you'd like, I can create a personalized travel journal for your Southeast Asia adventure!"
-]
-
-# Solo travel responses
-SOLO_TRAVEL_RESPONSES = [
-    "Solo travel is such a rewarding experience! Here are key tips I always share:\n\n"
-    "• Choose accommodations with communal spaces to meet fellow travelers\n"
-    "• Join free walking tours to connect with others\n"
-    "• Eat at counters instead of tables for spontaneous conversations\n"
-    "• Consider solo dining during restaurant hours to avoid awkwardness\n"
-    "• Research female-friendly resources if traveling as a woman\n\n"
-    "I create travel journals that can make solo trips feel less lonely. "
-    "My crayon-style planner helps keep you connected to your purpose for traveling alone!",
-
-    "The freedom of solo travel comes with some unique considerations:\n\n"
-    "• Share your location with someone back home regularly\n"
-    "• Take advantage of being able to change plans spontaneously\n"
-    "• Trust your instincts - if something feels off, remove yourself\n"
-    "• Embrace activities you might not do with others (theater alone, anyone?)\n"
-    "• Document your journey extensively - you'll cherish these memories\n\n"
-    "Would a personalized travel journal help organize your solo adventure thoughts? "
-    "I specialize in visual planners that make solo travel more meaningful!"
-]
-
-def generate_contextual_response(comment_text, subreddit_name, additional_context=None):
+def build_prompt(comment_text, subreddit_name, additional_context=None):
     """
-    Generate a contextual response using Hugging Face model based on the comment and subreddit.
+    Build the text-generation prompt for a comment.
     """
-    if not HF_ENABLED:
-        # Fallback to rule-based responses if HF is not enabled
-        return get_destination_specific_response(comment_text)
-
     # Base context for travel advice
     base_context = f"""
     You are a helpful travel advisor named Travel Planning Enthusiast (username: crayontravel_helper).
@@ -176,7 +88,7 @@ def generate_contextual_response(comment_text, subreddit_name, additional_contex
         base_context += f"\nAdditional Context: {additional_context}\n"
 
     # Craft a prompt for the model based on the comment
-    prompt = f"""
+    return f"""
 {base_context}
 A Reddit user in r/{subreddit_name} asked: "{comment_text}"
 
@@ -189,31 +101,280 @@ Use a friendly, knowledgeable tone.
 Response:
 """
 
+
+def clean_generated_text(response):
+    """
+    Strip an echoed prompt from the generated text.
+    """
+    # The response might contain the prompt, so we extract just the generated part
+    if "Response:" in response:
+        response = response.split("Response:")[-1].strip()
+    elif "A Reddit user" in response:
+        # If it echoed the prompt, take everything after
+        parts = response.split("A Reddit user")
+        if len(parts) > 1:
+            response = parts[0].strip()
+    return response
+
+
+class StreamingCleaner:
+    """
+    Incremental clean_generated_text for streamed tokens.
+    feed() returns True once the response is complete: a stop sequence shows
+    up, or the character budget is used up.
+
+    As in clean_generated_text, "Response:" takes precedence over an echoed
+    prompt: while the output still matches the start of the `prompt` it was
+    generated from, or has shown
+    "A Reddit user" before any "Response:", nothing is cut, since the answer
+    may still follow a "Response:". Such a hold lasts until "Response:"
+    appears or the stream ends (bounded by max_new_tokens).
+    """
+
+    RESPONSE_MARKER = "Response:"
+    ECHO_MARKER = "A Reddit user"
+
+    def __init__(self, prompt, max_chars, stop_sequences=()):
+        self.max_chars = max_chars
+        self.cut_markers = [marker for marker in stop_sequences if marker]
+        if self.ECHO_MARKER not in self.cut_markers:
+            self.cut_markers.append(self.ECHO_MARKER)
+        # Markers can be split across tokens; re-scan this many characters before each new chunk
+        self._lookback = max(len(marker) for marker in self.cut_markers + [self.RESPONSE_MARKER])
+        self._prompt = prompt
+        self._raw = ''
+        # The answer is _raw[_answer_from:_answer_end]
+        self._answer_from = 0
+        self._answer_end = None
+        self._seen_response_marker = False
+        # Output identical to the start of the prompt so far
+        self._echoing = True
+        # Where an "A Reddit user" seen before any "Response:" would cut the answer
+        self._echo_cut = None
+        self.tokens = 0
+        self.stopped_early = False
+
+    def feed(self, chunk):
+        self.tokens += 1
+        start = max(len(self._raw) - self._lookback, self._answer_from)
+        self._raw += chunk
+
+        if self._echoing:
+            # Markers inside the echoed prompt (e.g. in the quoted comment) mean nothing
+            if self._prompt.startswith(self._raw):
+                return False
+            # The output left the prompt, or went past its end: scan all of it
+            self._echoing = False
+            start = self._answer_from
+
+        # An echoed prompt ends with "Response:"; the actual answer starts after the last one
+        marker_at = self._raw.rfind(self.RESPONSE_MARKER, start)
+        if marker_at != -1:
+            self._answer_from = start = marker_at + len(self.RESPONSE_MARKER)
+            self._seen_response_marker = True
+            self._echo_cut = None
+
+        # Leading whitespace is dropped later, so a stop sequence before any text doesn't end the answer
+        answer = self._raw[self._answer_from:]
+        text_start = self._answer_from + len(answer) - len(answer.lstrip())
+
+        if not self._seen_response_marker:
+            if self._echo_cut is None:
+                echo_at = self._raw.find(self.ECHO_MARKER, max(start, text_start))
+                if echo_at != -1:
+                    self._echo_cut = echo_at
+            if self._echo_cut is not None:
+                # Hold everything until "Response:" shows up or the stream ends
+                return False
+
+        for marker in self.cut_markers:
+            cut_at = self._raw.find(marker, max(start, text_start))
+            if cut_at != -1:
+                self._answer_end = cut_at
+                self.stopped_early = True
+                return True
+
+        if len(self._raw) - text_start >= self.max_chars:
+            self._answer_end = text_start + self.max_chars
+            self.stopped_early = True
+            return True
+        return False
+
+    def text(self):
+        if self._echoing:
+            # The stream ended inside an echoed prompt, before its "Response:"
+            return ''
+        end = self._answer_end if self._answer_end is not None else self._echo_cut
+        return self._raw[self._answer_from:end].strip()
+
+
+def fallback_response(comment_text, destination_terms=None, reason='failed'):
+    """
+    Rule-based response used when Hugging Face is disabled or fails.
+    """
+    metrics.GENERATIONS.inc(source='fallback', reason=reason)
+    return get_destination_specific_response(comment_text, destination_terms) or random.choice(GENERIC_RESPONSES)
+
+
+def generation_cache_key(comment_text, subreddit_name, additional_context=None):
+    """
+    Cache key for a generation with the current model and sampling parameters.
+    """
+    return make_cache_key(comment_text, subreddit_name, additional_context, HF_MODEL, GENERATION_PARAMETERS)
+
+
+def _stream_model(prompt):
+    """
+    Stream tokens and hang up as soon as the response is complete, so discarded tokens aren't generated.
+    """
+    started = time.monotonic()
+    first_token_at = None
+    cleaner = StreamingCleaner(prompt, CONTENT_MODERATION['MAX_RESPONSE_LENGTH'],
+                               GENERATION_PARAMETERS['stop'])
+    stream = get_inference_client().text_generation(prompt, stream=True, **GENERATION_PARAMETERS)
     try:
-        # Generate response using Hugging Face model
-        response = client.text_generation(
-            prompt,
-            max_new_tokens=300,
-            temperature=0.7,
-            do_sample=True,
-            stop_sequences=["\n\n", "User:", "Comment:", "A Reddit user"]
-        )
-
-        # Clean up the response
-        # The response might contain the prompt, so we extract just the generated part
-        if "Response:" in response:
-            response = response.split("Response:")[-1].strip()
-        elif "A Reddit user" in response:
-            # If it echoed the prompt, take everything after
-            parts = response.split("A Reddit user")
-            if len(parts) > 1:
-                response = parts[0].strip()
-
-        return response
+        for token in stream:
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            if cleaner.feed(token):
+                break
+    finally:
+        # Closing the stream drops the connection, which stops generation on the server
+        stream.close()
+    get_generation_service().record_stream(HF_MODEL, started, first_token_at, time.monotonic(), cleaner)
+    # An empty answer (e.g. the model only echoed the prompt) counts as a failed generation
+    return cleaner.text() or None
+
+
+def _log_generation_error(error):
+    """
+    Log a failed generation; call from the `except` block.
+    Errors the endpoint reports (overloaded, bad request, timeout) are expected under load
+    and get a one-line warning; anything else is a bug and keeps its traceback.
+    """
+    from huggingface_hub.errors import InferenceTimeoutError, TextGenerationError
+    from huggingface_hub.utils import HfHubHTTPError
+    if isinstance(error, (HfHubHTTPError, TextGenerationError, InferenceTimeoutError)):
+        logger.warning(f"Hugging Face generation failed: {error}")
+    else:
+        logger.exception(f"Error generating response with Hugging Face: {error}")
+
+
+def _call_model(prompt):
+    try:
+        if GENERATION_SERVICE['STREAM']:
+            return _stream_model(prompt)
+        return clean_generated_text(get_inference_client().text_generation(prompt, **GENERATION_PARAMETERS)) or None
     except Exception as e:
-        print(f"Error generating response with Hugging Face: {e}")
-        # Fallback to rule-based response
-        return get_destination_specific_response(comment_text) or random.choice(GENERIC_RESPONSES)
+        _log_generation_error(e)
+        return None
+
+
+def request_generation(prompt, on_late_result=None):
+    """
+    Call the Hugging Face model on the generation pool; returns the cleaned text,
+    or None if the call failed or missed its deadline.
+    """
+    return get_generation_service().run(_call_model, prompt, model=HF_MODEL, on_late_result=on_late_result)
+
+
+def generate_contextual_response(comment_text, subreddit_name, additional_context=None, destination_terms=None):
+    """
+    Generate a contextual response using Hugging Face model based on the comment and subreddit.
+    """
+    if not HF_ENABLED:
+        # Fallback to rule-based responses if HF is not enabled
+        return fallback_response(comment_text, destination_terms, reason='disabled')
+
+    prompt = build_prompt(comment_text, subreddit_name, additional_context)
+
+    # Generate response using Hugging Face model, reusing an earlier generation for the same comment
+    if GENERATION_CACHE['ENABLED']:
+        key = generation_cache_key(comment_text, subreddit_name, additional_context)
+        cache = get_generation_cache()
+        # A generation that finishes after its deadline is still cached for the next attempt
+        response = cache.get_or_create(key, lambda: request_generation(prompt, lambda text: cache.put(key, text)))
+    else:
+        response = request_generation(prompt)
+
+    # Fallback to rule-based response if generation failed
+    if response is None:
+        return fallback_response(comment_text, destination_terms)
+    metrics.GENERATIONS.inc(source='model')
+    return response
+
+
+_async_client = None
+
+
+async def _stream_model_async(prompt):
+    """
+    Async counterpart of _stream_model.
+    """
+    started = time.monotonic()
+    first_token_at = None
+    cleaner = StreamingCleaner(prompt, CONTENT_MODERATION['MAX_RESPONSE_LENGTH'],
+                               GENERATION_PARAMETERS['stop'])
+    stream = await _async_client.text_generation(prompt, stream=True, **GENERATION_PARAMETERS)
+    try:
+        async for token in stream:
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            if cleaner.feed(token):
+                break
+    finally:
+        await stream.aclose()
+    get_generation_service().record_stream(HF_MODEL, started, first_token_at, time.monotonic(), cleaner)
+    return cleaner.text() or None
+
+
+async def request_generation_async(prompt):
+    """
+    Non-blocking variant of request_generation for the asyncio runtime.
+    """
+    global _async_client
+    import asyncio
+    if _async_client is None:
+        from huggingface_hub import AsyncInferenceClient
+        _async_client = AsyncInferenceClient(token=HF_TOKEN, model=HF_BASE_URL or HF_MODEL,
+                                             timeout=GENERATION_SERVICE['REQUEST_TIMEOUT'])
+    started = time.monotonic()
+    timed_out = False
+    try:
+        if GENERATION_SERVICE['STREAM']:
+            return await asyncio.wait_for(_stream_model_async(prompt), GENERATION_SERVICE['DEADLINE_SECONDS'])
+        response = await asyncio.wait_for(_async_client.text_generation(prompt, **GENERATION_PARAMETERS),
+                                          GENERATION_SERVICE['DEADLINE_SECONDS'])
+        return clean_generated_text(response) or None
+    except asyncio.TimeoutError:
+        timed_out = True
+        logger.warning(f"Generation with {HF_MODEL} exceeded its deadline; using a fallback response.")
+        return None
+    except Exception as e:
+        _log_generation_error(e)
+        return None
+    finally:
+        get_generation_service().record(HF_MODEL, time.monotonic() - started, timed_out)
+
+
+async def generate_contextual_response_async(comment_text, subreddit_name, additional_context=None,
+                                             destination_terms=None):
+    """
+    Non-blocking variant of generate_contextual_response for the asyncio runtime.
+    """
+    if not HF_ENABLED:
+        return fallback_response(comment_text, destination_terms, reason='disabled')
+
+    prompt = build_prompt(comment_text, subreddit_name, additional_context)
+    if GENERATION_CACHE['ENABLED']:
+        key = generation_cache_key(comment_text, subreddit_name, additional_context)
+        response = await get_generation_cache().get_or_create_async(key, lambda: request_generation_async(prompt))
+    else:
+        response = await request_generation_async(prompt)
+    if response is None:
+        return fallback_response(comment_text, destination_terms)
+    metrics.GENERATIONS.inc(source='model')
+    return response
 
 
 def load_context_from_file(file_path):
@@ -243,31 +404,25 @@ def save_context_to_file(context, file_path):
         print(f"Error saving context: {e}")
 
 
-def get_destination_specific_response(comment_text):
+def get_destination_specific_response(comment_text, matched_terms=None):
     """
     Returns a destination-specific response based on keywords in the comment.
     This serves as a fallback when Hugging Face is not available.
+    `matched_terms` can carry destination keywords already found by the shared keyword matcher.
+    Destinations and their responses are defined in destinations.json (see destination_router.py).
+    """
+    return get_destination_router().choose_response(comment_text, matched_terms)
+
+
+def fallback_alternatives(comment_text, destination_terms=None):
+    """
+    Every template response that fits the comment: its destination's pool first, then the generic ones,
+    each in random order. Used to replace a response that duplicates a recent reply.
     """
-    comment_lower = comment_text.lower()
-
-    # Tokyo/Japan related
-    if 'tokyo' in comment_lower:
-        import random
-        return random.choice(TOKYO_RESPONSES)
-    elif 'japan' in comment_lower or 'kyoto' in comment_lower or 'osaka' in comment_lower:
-        import random
-        return random.choice(JAPAN_RESPONSES)
-    elif 'paris' in comment_lower:
-        import random
-        return random.choice(PARIS_RESPONSES)
-    elif ('europe' in comment_lower and ('trip' in comment_lower or 'travelling' in comment_lower or 'vacation' in comment_lower)) or 'european' in comment_lower:
-        import random
-        return random.choice(EUROPE_RESPONSES)
-    elif any(place in comment_lower for place in ['thailand', 'bali', 'vietnam', 'cambodia', 'malaysia', 'indonesia']):
-        import random
-        return random.choice(SEA_RESPONSES)
-    elif 'solo' in comment_lower and ('travel' in comment_lower or 'trip' in comment_lower):
-        import random
-        return random.choice(SOLO_TRAVEL_RESPONSES)
-
-    return None
\ No newline at end of file
+    router = get_destination_router()
+    position = router.route(comment_text, destination_terms)
+    destination_pool = list(router.responses[position]) if position is not None else []
+    generic_pool = list(GENERIC_RESPONSES)
+    random.shuffle(destination_pool)
+    random.shuffle(generic_pool)
+    return destination_pool + generic_pool
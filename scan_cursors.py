@@ -0,0 +1,137 @@
+"""
+Persistent high-water-mark cursors for incremental comment scanning.
+Each feed (a subreddit, or a combined 'a+b' listing) remembers the newest
+comment it has processed, so the next poll only fetches comments after it.
+"""
+
+import os
+import json
+import time
+import logging
+
+from advanced_config import SCAN_SETTINGS
+from comment_feed import MAX_PAGE_SIZE, fetch_comment_page, iter_comment_records, iter_praw_comment_records
+
+logger = logging.getLogger(__name__)
+
+
+class CursorStore:
+    """
+    JSON-file backed map of feed name -> {'fullname', 'created_utc', 'updated_at'}.
+    """
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or SCAN_SETTINGS['CURSOR_FILE']
+        self._cursors = {}
+        if os.path.isfile(self.file_path):
+            try:
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    self._cursors = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read scan cursors from {self.file_path}: {e}. Starting fresh.")
+
+    def get(self, feed_name):
+        return self._cursors.get(feed_name.lower())
+
+    def update(self, feed_name, record):
+        """
+        Move the cursor of a feed to `record` and persist all cursors atomically.
+        """
+        self._cursors[feed_name.lower()] = {
+            'fullname': record.name,
+            'created_utc': record.created_utc,
+            'updated_at': time.time(),
+        }
+        self._save()
+
+    def touch(self, feed_name):
+        """
+        Mark a feed's cursor as still valid without moving it (a quiet feed), and persist it.
+        """
+        cursor = self.get(feed_name)
+        if cursor is None:
+            return
+        cursor['updated_at'] = time.time()
+        self._save()
+
+    def _save(self):
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._cursors, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.file_path)
+
+
+_cursor_store = None
+
+
+def get_cursor_store():
+    """
+    Shared cursor store, loaded on first use.
+    """
+    global _cursor_store
+    if _cursor_store is None:
+        _cursor_store = CursorStore()
+    return _cursor_store
+
+
+def newer_than_cursor(records, cursor):
+    """
+    Take records (newest first) until the cursor comment or anything older shows up.
+    Returns (records, reached_cursor).
+    """
+    unseen = []
+    for record in records:
+        if record.name == cursor['fullname'] or record.created_utc < cursor['created_utc']:
+            return unseen, True
+        unseen.append(record)
+    return unseen, False
+
+
+def page_back_to_cursor(records_iter, cursor, feed_path):
+    """
+    Walk backward from the newest comment until we meet the cursor; log anything we could not reach.
+    """
+    unseen, reached = newer_than_cursor(records_iter, cursor)
+    if not reached:
+        oldest = unseen[-1].created_utc if unseen else time.time()
+        gap_seconds = max(oldest - cursor['created_utc'], 0)
+        logger.warning(f"Scan gap in r/{feed_path}: could not page back to the last cursor; "
+                       f"about {gap_seconds / 60:.1f} minutes of comments before "
+                       f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(oldest))} UTC were not scanned.")
+    return unseen
+
+
+def fetch_unseen_comments(reddit_instance, feed_path, first_poll_limit, cursor_store=None):
+    """
+    Fetch only comments newer than the feed's cursor (newest first).
+
+    The normal poll is a single `before=<cursor>` request. If that page is full,
+    or the cursor looks stale (e.g. its comment was deleted), it falls back to
+    paging backward from the newest comment until the cursor is reached, up to
+    CATCHUP_MAX_PAGES pages. Without a cursor the newest `first_poll_limit`
+    comments are returned. The caller moves the cursor once the batch is processed.
+    """
+    cursor_store = cursor_store or get_cursor_store()
+    cursor = cursor_store.get(feed_path)
+    catchup_limit = SCAN_SETTINGS['CATCHUP_MAX_PAGES'] * MAX_PAGE_SIZE
+
+    if SCAN_SETTINGS['MODE'] != 'raw':
+        # PRAW listings only page backward; stop as soon as we reach the cursor
+        records = iter_praw_comment_records(reddit_instance, feed_path, catchup_limit if cursor else first_poll_limit)
+        return page_back_to_cursor(records, cursor, feed_path) if cursor else list(records)
+
+    if cursor is None:
+        return list(iter_comment_records(reddit_instance, feed_path, first_poll_limit))
+
+    records, _, _ = fetch_comment_page(reddit_instance, feed_path, MAX_PAGE_SIZE, before=cursor['fullname'])
+    stale = time.time() - cursor.get('updated_at', 0) > SCAN_SETTINGS['CURSOR_STALE_SECONDS']
+    if len(records) < MAX_PAGE_SIZE and (records or not stale):
+        unseen, _ = newer_than_cursor(records, cursor)
+        return unseen
+
+    logger.info(f"Catching up r/{feed_path} from cursor {cursor['fullname']}")
+    unseen = page_back_to_cursor(iter_comment_records(reddit_instance, feed_path, catchup_limit), cursor, feed_path)
+    if not unseen:
+        # Quiet feed: the cursor is still valid, so don't re-check it every cycle
+        cursor_store.touch(feed_path)
+    return unseen
@@ -0,0 +1,46 @@
+"""
+Session reply counters for the travel engagement bot.
+The number of replies posted in the current session, overall and per post,
+kept in their own module so the synchronous loop, the pipeline workers and
+the asyncio runtime share one set of counters however the bot was started.
+"""
+
+
+class SessionCounters:
+    """
+    Replies posted in the current session: `comments` in total, `posts` by post ID.
+    """
+
+    def __init__(self):
+        self.comments = 0
+        self.posts = {}
+
+    def load(self, counters):
+        """
+        Start from the (comments, posts) pair restored by the history store.
+        """
+        self.comments, self.posts = counters
+
+    def reset(self):
+        self.comments = 0
+        self.posts = {}
+
+    def record(self, post_id):
+        self.comments += 1
+        self.posts[post_id] = self.posts.get(post_id, 0) + 1
+
+    def replies_to(self, post_id):
+        return self.posts.get(post_id, 0)
+
+
+_session_counters = None
+
+
+def get_session_counters():
+    """
+    Shared session counters, created on first use.
+    """
+    global _session_counters
+    if _session_counters is None:
+        _session_counters = SessionCounters()
+    return _session_counters
@@ -0,0 +1,85 @@
+"""
+Startup-time profile of the bot.
+`python reddit_bot.py --profile-startup` starts the bot in a child process with
+`python -X importtime`, stops it just before its first poll of Reddit, and
+reports the time to first poll and the modules that took longest to import.
+"""
+
+import os
+import re
+import sys
+import time
+
+# Set in the child process; the bot exits when it is about to poll for the first time
+PROFILE_ENV = 'BOT_PROFILE_STARTUP'
+ENABLED = PROFILE_ENV in os.environ
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def first_poll():
+    """
+    Called by the bot right before it polls Reddit; ends the profiled child process.
+    """
+    if ENABLED:
+        sys.stderr.write("startup-profile: reached first poll\n")
+        sys.stderr.flush()
+        raise SystemExit(0)
+
+
+def parse_importtime(lines):
+    """
+    Parse `-X importtime` output into (module, self_seconds, cumulative_seconds, depth) tuples.
+    """
+    entries = []
+    for line in lines:
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            entries.append((module, int(own) / 1e6, int(cumulative) / 1e6, len(indent) // 2))
+    return entries
+
+
+def profile_startup(script, args=(), top_n=15):
+    """
+    Run `script` with import timing until its first poll and return the measurements.
+    """
+    import subprocess
+    env = dict(os.environ, **{PROFILE_ENV: '1'})
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', script, *args], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+    lines = result.stderr.splitlines()
+    entries = parse_importtime(lines)
+    return {
+        'reached_first_poll': any(line.startswith('startup-profile: reached first poll') for line in lines),
+        'time_to_first_poll': elapsed,
+        'import_seconds': sum(own for _, own, _, _ in entries),
+        'modules': len(entries),
+        # Top-level imports only for the cumulative view, so packages aren't counted twice
+        'top_cumulative': sorted((entry for entry in entries if entry[3] == 0), key=lambda entry: -entry[2])[:top_n],
+        'top_self': sorted(entries, key=lambda entry: -entry[1])[:top_n],
+        'errors': [line for line in lines if not line.startswith('import time:')][-20:],
+    }
+
+
+def print_report(results):
+    if results['reached_first_poll']:
+        print(f"\nTime to first poll: {results['time_to_first_poll']:.3f}s (including interpreter startup)")
+    else:
+        print(f"\nThe bot exited after {results['time_to_first_poll']:.3f}s without reaching its first poll:")
+        for line in results['errors']:
+            print(f"  {line}")
+    print(f"Imports: {results['modules']} modules, {results['import_seconds']:.3f}s in total")
+    print("Slowest top-level imports (cumulative):")
+    for module, _, cumulative, _ in results['top_cumulative']:
+        print(f"  {cumulative * 1000:9.1f} ms  {module}")
+    print("Slowest modules (own time):")
+    for module, own, _, _ in results['top_self']:
+        print(f"  {own * 1000:9.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    script = sys.argv[1] if len(sys.argv) > 1 else 'reddit_bot.py'
+    print_report(profile_startup(script, sys.argv[2:]))
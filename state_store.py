@@ -0,0 +1,258 @@
+"""
+SQLite-backed state store for the travel engagement bot.
+Keeps replied comments, per-post reply counts and session counters in one
+local database so restarts and redeploys pick up exactly where the bot stopped.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import logging
+import threading
+
+from advanced_config import HISTORY_STORE, TRACKING_SETTINGS
+from reply_store import parse_history_line
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS replied_comments (
+    comment_id TEXT PRIMARY KEY,
+    subreddit TEXT,
+    post_id TEXT,
+    replied_at REAL,
+    excerpt TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_replied_comments_replied_at ON replied_comments (replied_at);
+CREATE INDEX IF NOT EXISTS idx_replied_comments_post ON replied_comments (post_id);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    comment_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS post_replies (
+    session_id INTEGER NOT NULL,
+    post_id TEXT NOT NULL,
+    reply_count INTEGER NOT NULL DEFAULT 0,
+    last_reply_at REAL,
+    PRIMARY KEY (session_id, post_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# How the fsync policy of HISTORY_STORE maps onto SQLite durability
+SYNCHRONOUS_MODES = {'always': 'FULL', 'interval': 'NORMAL', 'never': 'OFF'}
+
+
+class SQLiteStateStore:
+    """
+    Unified reply/session state in a WAL-mode SQLite database.
+
+    Implements the same calls as ReplyStore (membership, add, flush, close)
+    plus the per-post and session counters that used to live in module globals.
+    Writes from the reply path are queued and committed in batches.
+    """
+
+    def __init__(self, db_path=None, history_file=None, fsync_policy=None,
+                 batch_size=None, flush_interval=None):
+        self.db_path = db_path or HISTORY_STORE['SQLITE_FILE']
+        self.history_file = history_file or TRACKING_SETTINGS['HISTORY_FILE']
+        self.fsync_policy = fsync_policy or HISTORY_STORE['FSYNC_POLICY']
+        self.batch_size = batch_size if batch_size is not None else HISTORY_STORE['BUFFER_SIZE']
+        self.flush_interval = flush_interval if flush_interval is not None else HISTORY_STORE['FLUSH_INTERVAL']
+        if self.fsync_policy not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown fsync policy: {self.fsync_policy}")
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={SYNCHRONOUS_MODES[self.fsync_policy]}")
+        self._conn.executescript(SCHEMA)
+
+        self._pending = []
+        self._pending_ids = set()
+        self._last_flush = time.monotonic()
+
+        if self._get_meta('history_imported') is None:
+            imported = self.import_history_file(self.history_file)
+            if imported:
+                logger.info(f"Imported {imported} replied comments from {self.history_file}")
+        self._session_id = self._current_session()
+
+    # Helpers
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _current_session(self):
+        row = self._conn.execute("SELECT MAX(session_id) FROM sessions").fetchone()
+        if row[0] is not None:
+            return row[0]
+        cur = self._conn.execute("INSERT INTO sessions (started_at) VALUES (?)", (time.time(),))
+        return cur.lastrowid
+
+    # Migration
+
+    def import_history_file(self, file_path):
+        """
+        Import replied comment IDs from a `timestamp|id|subreddit|excerpt` history file.
+        Safe to run more than once; existing IDs are ignored.
+        """
+        def rows():
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    comment_id = parse_history_line(line)
+                    if comment_id is None:
+                        continue
+                    parts = line.rstrip('\n').split('|', 3)
+                    subreddit = parts[2] if len(parts) > 2 else ''
+                    excerpt = parts[3] if len(parts) > 3 else ''
+                    yield comment_id, subreddit, None, None, excerpt
+
+        with self._lock:
+            before = self._conn.execute("SELECT COUNT(*) FROM replied_comments").fetchone()[0]
+            self._conn.execute("BEGIN")
+            try:
+                if os.path.isfile(file_path):
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO replied_comments "
+                        "(comment_id, subreddit, post_id, replied_at, excerpt) VALUES (?, ?, ?, ?, ?)",
+                        rows())
+                self._set_meta('history_imported', time.time())
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.execute("SELECT COUNT(*) FROM replied_comments").fetchone()[0] - before
+
+    # Reply history
+
+    def __contains__(self, comment_id):
+        with self._lock:
+            if comment_id in self._pending_ids:
+                return True
+            row = self._conn.execute(
+                "SELECT 1 FROM replied_comments WHERE comment_id = ?", (comment_id,)).fetchone()
+            return row is not None
+
+    def __len__(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM replied_comments").fetchone()[0]
+            return count + len(self._pending_ids)
+
+    def add(self, comment_id, subreddit_name='', comment_body='', post_id=None):
+        """
+        Record a reply together with its per-post and session counter updates.
+        """
+        with self._lock:
+            if comment_id in self:
+                return
+            excerpt = (comment_body or '')[:50]
+            self._pending.append((comment_id, subreddit_name, post_id, time.time(), excerpt))
+            self._pending_ids.add(comment_id)
+            if (self.fsync_policy == 'always'
+                    or len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    def append(self, comment_id):
+        """
+        List-style alias kept for callers that treated the history as a list.
+        """
+        self.add(comment_id)
+
+    def flush(self, sync=False):
+        """
+        Commit all queued replies in a single transaction.
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            pending = self._pending
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO replied_comments "
+                    "(comment_id, subreddit, post_id, replied_at, excerpt) VALUES (?, ?, ?, ?, ?)",
+                    pending)
+                self._conn.executemany(
+                    "INSERT INTO post_replies (session_id, post_id, reply_count, last_reply_at) "
+                    "VALUES (?, ?, 1, ?) ON CONFLICT (session_id, post_id) "
+                    "DO UPDATE SET reply_count = reply_count + 1, last_reply_at = excluded.last_reply_at",
+                    [(self._session_id, post_id, replied_at)
+                     for _, _, post_id, replied_at, _ in pending if post_id])
+                self._conn.execute(
+                    "UPDATE sessions SET comment_count = comment_count + ? WHERE session_id = ?",
+                    (len(pending), self._session_id))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._pending = []
+            self._pending_ids = set()
+
+    def close(self):
+        """
+        Commit pending writes and close the database.
+        """
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Session counters
+
+    def load_counters(self):
+        """
+        Return (session_comments_count, posts_replied_to) for the current session.
+        """
+        with self._lock:
+            self.flush()
+            count = self._conn.execute(
+                "SELECT comment_count FROM sessions WHERE session_id = ?", (self._session_id,)).fetchone()[0]
+            posts = dict(self._conn.execute(
+                "SELECT post_id, reply_count FROM post_replies WHERE session_id = ?", (self._session_id,)))
+            return count, posts
+
+    def reset_counters(self):
+        """
+        Start a new session with empty per-post and session counters.
+        """
+        with self._lock:
+            self.flush()
+            cur = self._conn.execute("INSERT INTO sessions (started_at) VALUES (?)", (time.time(),))
+            self._session_id = cur.lastrowid
+
+    def stats(self):
+        """
+        Basic size information about the database.
+        """
+        size = os.path.getsize(self.db_path) if os.path.isfile(self.db_path) else 0
+        return {'backend': 'sqlite', 'entries': len(self), 'db_bytes': size, 'session_id': self._session_id}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate':
+        source = sys.argv[2] if len(sys.argv) > 2 else TRACKING_SETTINGS['HISTORY_FILE']
+        with SQLiteStateStore() as store:
+            imported = store.import_history_file(source)
+        print(f"Migration finished: imported {imported} replied comments from {source}.")
+    else:
+        print("Usage: python state_store.py migrate [history_file]")
@@ -0,0 +1,24 @@
+import os
+
+from activity_log import ActivityLog, import_history_file
+from reply_store import format_history_line
+
+
+def test_imported_history_respects_the_segment_size(tmp_path):
+    history = tmp_path / 'history.txt'
+    ids = [f"c{n:05d}" for n in range(2000)]
+    with open(history, 'w', encoding='utf-8') as f:
+        f.writelines(format_history_line(comment_id, 'travel', 'a comment about a trip') for comment_id in ids)
+
+    log = ActivityLog(str(tmp_path / 'log'), max_segment_bytes=10_000)
+    assert import_history_file(log, str(history)) == len(ids)
+    log.close()
+
+    sizes = [os.path.getsize(path) for path in log.segment_paths()]
+    assert len(sizes) > 10
+    # A segment may only overshoot the limit by the line that crossed it
+    assert max(sizes) < 10_000 + 200
+    # The index offsets line up with the segment files
+    offsets = [segment['start_offset'] for segment in log.segments]
+    assert offsets == [sum(sizes[:n]) for n in range(len(sizes))]
+    assert list(ActivityLog(str(tmp_path / 'log')).iter_ids()) == ids
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import prawcore
+
+import comment_feed
+from comment_feed import MAX_PAGE_SIZE, iter_praw_comment_records
+from request_scheduler import RequestScheduler
+
+
+class RecordingLimiter:
+    def __init__(self, events):
+        self.events = events
+
+    def acquire(self, cost=1, reason='api'):
+        self.events.append('acquire')
+        return 0.0
+
+
+def fake_comment(n):
+    return SimpleNamespace(id=f"c{n}", link_id='t3_p1', author=SimpleNamespace(name='someone'),
+                           subreddit=SimpleNamespace(display_name='travel'), created_utc=n, body='hello')
+
+
+class FakeListing:
+    """
+    Iterates like a PRAW ListingGenerator: a request per page of MAX_PAGE_SIZE comments.
+    """
+
+    def __init__(self, total, events, failures=0):
+        self.comments = [fake_comment(n) for n in range(total)]
+        self.events = events
+        self.failures = failures
+        self.position = 0
+
+    def __next__(self):
+        if self.position >= len(self.comments):
+            raise StopIteration
+        if self.position % MAX_PAGE_SIZE == 0:
+            if self.failures:
+                self.failures -= 1
+                raise prawcore.exceptions.RequestException(OSError('reset'), (), {})
+            self.events.append('fetch')
+        self.position += 1
+        return self.comments[self.position - 1]
+
+
+def read_listing(monkeypatch, total, failures=0):
+    events = []
+    listing = FakeListing(total, events, failures)
+    reddit = SimpleNamespace(subreddit=lambda path: SimpleNamespace(comments=lambda limit: listing))
+    scheduler = RequestScheduler(limiter=RecordingLimiter(events), base_delay=0, max_delay=0)
+    monkeypatch.setattr(comment_feed, 'get_request_scheduler', lambda: scheduler)
+    return [record.id for record in iter_praw_comment_records(reddit, 'travel', total)], events
+
+
+def test_every_praw_page_is_paced_before_it_is_fetched(monkeypatch):
+    ids, events = read_listing(monkeypatch, 250)
+    assert ids == [f"c{n}" for n in range(250)]
+    assert events == ['acquire', 'fetch'] * 3
+
+
+def test_failed_praw_page_fetches_are_retried(monkeypatch):
+    ids, events = read_listing(monkeypatch, 50, failures=1)
+    assert len(ids) == 50
+    assert events == ['acquire', 'acquire', 'fetch']
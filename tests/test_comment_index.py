@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from comment_index import BloomFilter, CompactReplyIndex, decode_comment_id, encode_comment_id
+from reply_store import compact_history, format_history_line
+
+
+def random_ids(count, seed=0):
+    rng = random.Random(seed)
+    return list({decode_comment_id(rng.getrandbits(40)) for _ in range(count)})
+
+
+def make_index(tmp_path, **kwargs):
+    kwargs.setdefault('merge_threshold', 50)
+    kwargs.setdefault('fsync_policy', 'never')
+    return CompactReplyIndex(file_path=str(tmp_path / 'history.txt'), index_path=str(tmp_path / 'history.idx'),
+                             **kwargs)
+
+
+def test_comment_ids_round_trip():
+    for comment_id in ['0', 'a', 'k3x9q2', 'zzzzzzzzzzzz']:
+        assert decode_comment_id(encode_comment_id(comment_id)) == comment_id
+    assert encode_comment_id('not-base36') is None
+    # 13 base36 digits overflow 64 bits
+    assert encode_comment_id('z' * 13) is None
+
+
+@pytest.mark.parametrize('fill', [0.5, 1.0, 3.0])
+def test_bloom_filter_has_no_false_negatives(fill):
+    bloom = BloomFilter(1000, 0.01)
+    rng = random.Random(fill)
+    values = [rng.getrandbits(64) for _ in range(int(1000 * fill))]
+    for value in values:
+        bloom.add(value)
+    assert all(value in bloom for value in values)
+
+
+def test_bloom_filter_false_positive_rate_is_near_the_target():
+    bloom = BloomFilter(5000, 0.01)
+    for value in range(5000):
+        bloom.add(value)
+    false_positives = sum(value in bloom for value in range(1 << 40, (1 << 40) + 20000))
+    assert false_positives / 20000 < 0.03
+
+
+def test_every_added_id_is_found_across_merges(tmp_path):
+    ids = random_ids(500)
+    index = make_index(tmp_path)
+    # Merges every 50 IDs, growing past the filter's design capacity so it gets rebuilt
+    for comment_id in ids:
+        index.add(comment_id, 'travel', 'body')
+        index.flush()
+    assert index.stats()['bloom_bytes'] > BloomFilter(200, index.false_positive_rate).num_bits // 8
+    assert all(comment_id in index for comment_id in ids)
+    assert len(index) == len(ids)
+    assert not any(comment_id in index for comment_id in random_ids(500, seed=1) if comment_id not in ids)
+    index.close()
+
+
+def test_index_persists_across_reopen(tmp_path):
+    ids = random_ids(300)
+    with make_index(tmp_path) as index:
+        for comment_id in ids:
+            index.add(comment_id, 'travel', 'body')
+
+    reopened = make_index(tmp_path)
+    assert len(reopened) == len(ids)
+    assert all(comment_id in reopened for comment_id in ids)
+    assert reopened.stats()['delta_entries'] == 0
+    reopened.close()
+
+
+def test_lines_appended_after_the_last_merge_are_replayed(tmp_path):
+    ids = random_ids(120)
+    with make_index(tmp_path) as index:
+        for comment_id in ids[:100]:
+            index.add(comment_id, 'travel', 'body')
+    # Another writer (or a crash before the merge) leaves lines the index doesn't cover yet
+    with open(tmp_path / 'history.txt', 'a', encoding='utf-8') as f:
+        f.writelines(format_history_line(comment_id, 'travel', 'body') for comment_id in ids[100:])
+
+    reopened = make_index(tmp_path)
+    assert len(reopened) == len(ids)
+    assert all(comment_id in reopened for comment_id in ids)
+    reopened.close()
+
+
+def test_index_is_rebuilt_when_the_history_file_is_replaced(tmp_path):
+    ids = random_ids(200)
+    with make_index(tmp_path) as index:
+        for comment_id in ids:
+            index.add(comment_id, 'travel', 'body')
+    with open(tmp_path / 'history.txt', 'a', encoding='utf-8') as f:
+        f.write(format_history_line(ids[0], 'travel', 'duplicate'))
+    # Compaction writes a new file, so the index no longer matches its inode
+    assert compact_history(str(tmp_path / 'history.txt')) == (len(ids), 1)
+
+    reopened = make_index(tmp_path)
+    assert len(reopened) == len(ids)
+    assert all(comment_id in reopened for comment_id in ids)
+    reopened.close()
@@ -0,0 +1,62 @@
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import pipeline
+from pipeline import CommentPipeline, FeedBatch
+
+
+class FakeStore:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def released(monkeypatch):
+    released = []
+    monkeypatch.setattr(pipeline.bot, 'release_response', lambda record: released.append(record.id))
+    # Long enough that the test would time out if stop() waited out the reply spacing
+    monkeypatch.setitem(pipeline.ACTIVITY_SCHEDULE, 'MIN_RESPONSE_DELAY', 600)
+    monkeypatch.setitem(pipeline.ACTIVITY_SCHEDULE, 'MAX_RESPONSE_DELAY', 600)
+    return released
+
+
+def test_close_finishes_the_current_post_and_drops_the_queue(monkeypatch, released):
+    store = FakeStore()
+    comment_pipeline = CommentPipeline(None, store, settings={'GENERATION_WORKERS': 1})
+    posting, posted = threading.Event(), []
+
+    def slow_post(record, response, subreddit_name):
+        posting.set()
+        time.sleep(0.2)
+        # The store must still be open while the reply is recorded
+        assert not store.closed
+        posted.append(record.id)
+        return True
+
+    monkeypatch.setattr(comment_pipeline, '_post', slow_post)
+    records = [SimpleNamespace(id=f"c{n}", post_id='p1', subreddit='other') for n in range(4)]
+    batch = FeedBatch('travel', records)
+    # The first three were planned by the filter and generated; the last one is still waiting for the filter
+    comment_pipeline._in_flight = 3
+    comment_pipeline.start()
+    for record in records[:3]:
+        comment_pipeline.post_queue.put((batch, 'travel', record, 'reply'))
+    comment_pipeline.filter_queue.put((batch, {'travel': 'travel'}, records[3]))
+    assert posting.wait(5)
+
+    started = time.monotonic()
+    comment_pipeline.close()
+    assert time.monotonic() - started < 5
+    assert posted == ['c0']
+    assert sorted(released) == ['c0', 'c1', 'c2']
+    assert store.closed
+    assert comment_pipeline._in_flight == 0
+    # The dropped comments were never evaluated, so the feed's cursor stays put
+    assert batch.pending == 0 and batch.truncated
+    assert all(not thread.is_alive() for thread in threading.enumerate() if thread.name.startswith('pipeline-'))
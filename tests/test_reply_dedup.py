@@ -0,0 +1,113 @@
+import os
+import json
+import random
+
+import pytest
+
+import reply_dedup
+from reply_dedup import ReplyIndex, simhash
+
+# Real template responses: long enough that a one-word edit stays within a few bits
+with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'destinations.json'),
+          encoding='utf-8') as f:
+    POOLS = {destination['name']: destination['responses'] for destination in json.load(f)['destinations']}
+TOKYO = POOLS['tokyo'][0]
+PARIS = POOLS['paris'][0]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(reply_dedup.time, 'time', lambda: now[0])
+    return now
+
+
+def make_index(tmp_path, **kwargs):
+    kwargs.setdefault('window_seconds', 3600)
+    kwargs.setdefault('max_distance', 3)
+    return ReplyIndex(file_path=str(tmp_path / 'fingerprints.json'), **kwargs)
+
+
+def test_simhash_is_stable_and_similarity_preserving():
+    assert simhash(TOKYO) == simhash(TOKYO.upper())
+    assert (simhash(TOKYO) ^ simhash(TOKYO.replace("incredible", "amazing"))).bit_count() <= 3
+    assert (simhash(TOKYO) ^ simhash(PARIS)).bit_count() > 3
+
+
+def test_posted_reply_blocks_near_duplicates(tmp_path, clock):
+    index = make_index(tmp_path)
+    assert index.reserve('c1', TOKYO)
+    index.commit('c1', TOKYO)
+    assert not index.reserve('c2', TOKYO)
+    assert not index.reserve('c2', TOKYO.replace("incredible", "amazing"))
+    assert index.reserve('c2', PARIS)
+
+
+def test_entries_expire_at_the_window_boundary(tmp_path, clock):
+    index = make_index(tmp_path, window_seconds=60)
+    index.commit('c1', TOKYO)
+    clock[0] += 59
+    assert not index.reserve('c2', TOKYO)
+    clock[0] += 1
+    assert index.reserve('c2', TOKYO)
+    assert len(index) == 0
+
+
+def test_reservations_block_other_comments_until_released(tmp_path, clock):
+    index = make_index(tmp_path)
+    assert index.reserve('c1', TOKYO)
+    assert not index.reserve('c2', TOKYO)
+    # A failed post releases the text; nothing is left in the window
+    index.release('c1')
+    assert index.reserve('c2', TOKYO)
+    assert len(index) == 0
+
+
+def test_retrying_a_comment_reuses_its_own_reservation(tmp_path, clock):
+    index = make_index(tmp_path)
+    assert index.reserve('c1', TOKYO)
+    assert index.reserve('c1', TOKYO)
+
+
+def test_only_committed_replies_are_saved(tmp_path, clock):
+    index = make_index(tmp_path)
+    index.reserve('c1', PARIS)
+    index.commit('c2', TOKYO)
+    reloaded = make_index(tmp_path)
+    assert len(reloaded) == 1
+    assert not reloaded.reserve('c3', TOKYO)
+    assert reloaded.reserve('c3', PARIS)
+
+
+def test_expired_entries_are_not_reloaded(tmp_path, clock):
+    make_index(tmp_path, window_seconds=60).commit('c1', TOKYO)
+    clock[0] += 61
+    assert len(make_index(tmp_path, window_seconds=60)) == 0
+
+
+@pytest.mark.parametrize('max_distance', [0, 3, 5, 7])
+def test_banding_finds_every_fingerprint_within_max_distance(tmp_path, clock, max_distance):
+    index = make_index(tmp_path, max_distance=max_distance)
+    rng = random.Random(max_distance)
+    stored = [rng.getrandbits(64) for _ in range(200)]
+    for fingerprint in stored:
+        index._insert(clock[0], fingerprint)
+    for fingerprint in stored:
+        flipped = fingerprint
+        for bit in rng.sample(range(64), max_distance):
+            flipped ^= 1 << bit
+        assert index._find(flipped)
+        # Random fingerprints are ~32 bits apart, far beyond the limit
+        flipped = fingerprint
+        for bit in rng.sample(range(64), max_distance + 1):
+            flipped ^= 1 << bit
+        assert not index._find(flipped)
+
+
+def test_bands_cover_all_bits(tmp_path):
+    index = make_index(tmp_path, max_distance=4)
+    covered = 0
+    for shift, mask in index._bands:
+        assert covered & (mask << shift) == 0
+        covered |= mask << shift
+    assert covered == (1 << 64) - 1
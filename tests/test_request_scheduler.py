@@ -0,0 +1,28 @@
+import pytest
+
+from rate_limiter import TokenBucket
+from request_scheduler import RequestScheduler
+
+
+@pytest.fixture
+def limiter():
+    return TokenBucket(rate_per_second=10, capacity=10)
+
+
+def test_exhausted_window_waits_for_the_reset(limiter):
+    RequestScheduler(limiter=limiter).update_budget(0, 60)
+    # The burst saved up before the headers said the budget is gone must not go out
+    assert limiter.reserve() == pytest.approx(60, rel=0.01)
+
+
+def test_tokens_are_capped_at_the_remaining_budget(limiter):
+    RequestScheduler(limiter=limiter).update_budget(3, 60)
+    assert [limiter.reserve() for _ in range(3)] == [0, 0, 0]
+    assert limiter.reserve() > 0
+
+
+def test_budget_never_raises_the_configured_ceiling(limiter):
+    scheduler = RequestScheduler(limiter=limiter)
+    scheduler.update_budget(10_000, 1)
+    assert limiter.rate == scheduler.max_rate
+    assert limiter.stats()['tokens'] <= limiter.capacity